@@ -0,0 +1,12 @@
+"""Benchmark joining split cross-validation results."""
+
+import pandas as pd
+from cfr import batch
+
+
+def bench_join_xval(benchmark, xval_splits, tmp_path):
+    root, split_dirs = xval_splits
+    out_dir = tmp_path / 'joined'
+    benchmark(batch.join_xval_splits, out_dir, split_dirs)
+    xval = pd.read_csv(out_dir / 'xval.csv')
+    assert xval['fold'].nunique() == len(split_dirs)
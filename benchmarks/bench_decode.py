@@ -0,0 +1,26 @@
+"""Benchmark cross-validated pattern classification."""
+
+import numpy as np
+import pytest
+from cfr import decode
+
+
+@pytest.fixture(scope='module')
+def subject_patterns(synth):
+    """Study trials and noisy patterns for the first 12 lists of a subject."""
+    events, patterns = synth
+    study = events.query('subject == 1 and trial_type == "study" and list <= 12')
+    study = study.reset_index(drop=True)
+    rng = np.random.default_rng(1)
+    vectors = patterns['vector']['use'][study['item_index'].to_numpy()]
+    x = vectors * 10 + rng.normal(size=vectors.shape)
+    return study, x
+
+
+@pytest.mark.parametrize('clf', ['svm', 'logreg', 'plogreg'])
+def bench_classify_patterns(benchmark, subject_patterns, clf):
+    trials, x = subject_patterns
+    evidence = benchmark.pedantic(
+        decode.classify_patterns, (trials, x), {'clf': clf}, rounds=3
+    )
+    assert evidence.shape == (len(trials), 3)
@@ -0,0 +1,36 @@
+"""Benchmark defining model variants and evaluating likelihood."""
+
+import numpy as np
+import pytest
+from cfr import framework
+
+VARIANTS = {
+    'loc': (['loc'], None),
+    'loc-cat-use': (['loc', 'cat', 'use'], None),
+    'loc-cat-use_ff-use': (['loc', 'cat', 'use'], ['use']),
+}
+
+
+@pytest.mark.parametrize('variant', VARIANTS.keys())
+def bench_model_variant(benchmark, variant):
+    fcf, ff = VARIANTS[variant]
+    benchmark(framework.model_variant, fcf, ff, sublayers=True)
+
+
+@pytest.mark.parametrize('variant', VARIANTS.keys())
+def bench_likelihood(benchmark, synth, variant):
+    events, patterns = synth
+    fcf, ff = VARIANTS[variant]
+    param_def = framework.model_variant(fcf, ff, sublayers=True)
+    param = param_def.fixed.copy()
+    param.update({name: np.mean(bounds) for name, bounds in param_def.free.items()})
+    model = framework.CFRModel()
+    stats = benchmark(
+        model.likelihood,
+        events,
+        param,
+        param_def=param_def,
+        patterns=patterns,
+        study_keys=['item_index'],
+    )
+    assert np.isfinite(stats['logl']).all()
@@ -0,0 +1,70 @@
+"""Benchmark the statistics calculated when plotting a fit."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.spatial import distance
+from psifr import fr
+from cfr import task
+from cfr import synthetic
+
+
+@pytest.fixture(scope='module')
+def full(merged, pytestconfig):
+    """Data and a stand-in simulation, as concatenated by plot_fit_figs."""
+    n_subjects = pytestconfig.getoption('bench_subjects')
+    n_lists = pytestconfig.getoption('bench_lists')
+    events, _, _, _ = synthetic.generate_dataset(n_subjects, n_lists, seed=2)
+    sim = task.read_free_recall(events, block=False, block_category=False)
+    full = pd.concat((merged, sim), axis=0, keys=['Data', 'Model'])
+    full.index.rename(['source', 'trial'], inplace=True)
+    return full
+
+
+@pytest.fixture(scope='module')
+def distances(synth):
+    _, patterns = synth
+    return distance.squareform(distance.pdist(patterns['vector']['use'], 'correlation'))
+
+
+def within(x, y):
+    return x == y
+
+
+def across(x, y):
+    return x != y
+
+
+def stat_kws(distances):
+    """Statistics and options used by plot_fit_figs."""
+    edges = np.linspace(0.05, 0.95, 10)
+    dist = {'index_key': 'item_index', 'distances': distances}
+    cat_within = {'test_key': 'category', 'test': within}
+    cat_across = {'test_key': 'category', 'test': across}
+    return {
+        'use_rank': (fr.distance_rank, dist),
+        'use_rank_within': (fr.distance_rank, {**dist, **cat_within}),
+        'use_rank_across': (fr.distance_rank, {**dist, **cat_across}),
+        'lag_rank': (fr.lag_rank, {}),
+        'lag_rank_within': (fr.lag_rank, cat_within),
+        'lag_rank_across': (fr.lag_rank, cat_across),
+        'cat_crp': (fr.category_crp, {'category_key': 'category'}),
+        'use_crp': (fr.distance_crp, {**dist, 'edges': edges}),
+        'use_crp_within': (fr.distance_crp, {**dist, 'edges': edges, **cat_within}),
+        'use_crp_across': (fr.distance_crp, {**dist, 'edges': edges, **cat_across}),
+        'spc': (fr.spc, {}),
+        'pfr': (lambda x: fr.pnr(x).query('output == 1'), {}),
+        'lag_crp': (fr.lag_crp, {}),
+        'lag_crp_within': (fr.lag_crp, cat_within),
+        'lag_crp_across': (fr.lag_crp, cat_across),
+    }
+
+
+STATS = list(stat_kws(None).keys())
+
+
+@pytest.mark.parametrize('stat', STATS)
+def bench_fit_stat(benchmark, full, distances, stat):
+    f_stat, kws = stat_kws(distances)[stat]
+    res = benchmark(lambda: full.groupby('source').apply(f_stat, **kws))
+    assert res.index.levels[0].tolist() == ['Data', 'Model']
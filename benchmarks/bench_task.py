@@ -0,0 +1,24 @@
+"""Benchmark reading and labeling free recall data."""
+
+from cfr import task
+
+
+def bench_read_free_recall(benchmark, events_file):
+    data = benchmark(task.read_free_recall, events_file)
+    assert data['recall'].any()
+
+
+def bench_read_free_recall_noblock(benchmark, events_file):
+    benchmark(task.read_free_recall, events_file, block=False, block_category=False)
+
+
+def bench_label_block(benchmark, synth):
+    events, _ = synth
+    events = events.astype({'category': 'category'})
+    labeled = benchmark(task.label_block, events)
+    assert labeled['block_len'].min() >= 1
+
+
+def bench_label_block_category(benchmark, synth):
+    events, _ = synth
+    benchmark(task.label_block_category, events)
@@ -0,0 +1,91 @@
+"""Synthetic CFR-like data for benchmarks."""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from cfr import task
+from cfr import synthetic
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--bench-subjects',
+        type=int,
+        default=int(os.environ.get('CFR_BENCH_SUBJECTS', 10)),
+        help='Number of synthetic subjects (default: $CFR_BENCH_SUBJECTS or 10).',
+    )
+    parser.addoption(
+        '--bench-lists',
+        type=int,
+        default=int(os.environ.get('CFR_BENCH_LISTS', 30)),
+        help='Number of lists per subject (default: $CFR_BENCH_LISTS or 30).',
+    )
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # keep baselines with the benchmarks, wherever pytest is run from
+    storage = config.getoption('benchmark_storage', None)
+    if storage == 'file://./.benchmarks':
+        config.option.benchmark_storage = 'file://' + os.path.join(
+            BENCH_DIR, 'baselines'
+        )
+
+
+@pytest.fixture(scope='session')
+def synth(pytestconfig):
+    """Synthetic raw events and patterns."""
+    n_subjects = pytestconfig.getoption('bench_subjects')
+    n_lists = pytestconfig.getoption('bench_lists')
+    events, patterns, _, _ = synthetic.generate_dataset(n_subjects, n_lists, seed=42)
+    return events, patterns
+
+
+@pytest.fixture(scope='session')
+def events_file(synth, tmp_path_factory):
+    """Raw events saved to a CSV file."""
+    events, _ = synth
+    csv_file = tmp_path_factory.mktemp('data') / 'data.csv'
+    events.to_csv(csv_file, index=False)
+    return csv_file
+
+
+@pytest.fixture(scope='session')
+def merged(events_file):
+    """Scored free recall data."""
+    return task.read_free_recall(events_file)
+
+
+@pytest.fixture(scope='session')
+def xval_splits(synth, tmp_path_factory):
+    """Cross-validation results split up into one directory per fold."""
+    events, _ = synth
+    subjects = events['subject'].unique()
+    n_fold = 6
+    n_rep = 10
+    rng = np.random.default_rng(1)
+    root = tmp_path_factory.mktemp('xval')
+    split_dirs = []
+    for fold in range(1, n_fold + 1):
+        split_dir = root / f'split{fold}'
+        split_dir.mkdir()
+        (split_dir / 'parameters.json').write_text(json.dumps({'fixed': {'T': 0.1}}))
+        (split_dir / 'log_xval.txt').write_text(f'Running fold {fold}.\n')
+        search = pd.DataFrame(
+            {
+                'fold': fold,
+                'subject': np.repeat(subjects, n_rep),
+                'rep': np.tile(np.arange(n_rep), len(subjects)),
+                'logl_train': rng.normal(-1000, 50, n_rep * len(subjects)),
+            }
+        )
+        search.to_csv(split_dir / 'xval_search.csv', index=False)
+        xval = search.groupby('subject', as_index=False).first()
+        xval['logl_test'] = rng.normal(-200, 10, len(xval))
+        xval.to_csv(split_dir / 'xval.csv', index=False)
+        split_dirs.append(split_dir)
+    return root, split_dirs
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#
+# Benchmark likelihood evaluations per second for a model variant.
+
+import os
+import time
+import tempfile
+import argparse
+import numpy as np
+from cymr import cmr
+from cfr import framework
+
+
+def time_likelihood(model, subj_data, param_def, patterns, subj_param, n_eval):
+    """Time repeated likelihood evaluations as run during a search."""
+    start = time.perf_counter()
+    for i in range(n_eval):
+        logl = 0
+        for subject, (study, recall) in subj_data.items():
+            param = param_def.eval_dependent(subj_param[subject])
+            param = param_def.eval_dynamic(param, study, recall)
+            subject_logl, _ = model.likelihood_subject(
+                study, recall, param, param_def, patterns
+            )
+            logl += subject_logl
+    elapsed = time.perf_counter() - start
+    return n_eval * len(subj_data) / elapsed, logl
+
+
+def main(
+    data_file,
+    patterns_file,
+    fcf_features,
+    ff_features,
+    sublayers=True,
+    n_eval=20,
+    include=None,
+    seed=None,
+):
+    data, param_def, patterns = framework.configure_model(
+        data_file,
+        patterns_file,
+        fcf_features,
+        ff_features,
+        False,
+        sublayers,
+        None,
+        None,
+        include,
+    )
+
+    # sample a parameter set for each subject
+    rng = np.random.default_rng(seed)
+    subj_param = {}
+    for subject in data['subject'].unique():
+        param = param_def.fixed.copy()
+        for name, (lower, upper) in param_def.free.items():
+            param[name] = rng.uniform(lower, upper)
+        subj_param[subject] = param
+
+    # plain definition that evaluates weight expressions directly
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_file = os.path.join(tmp_dir, 'parameters.json')
+        param_def.to_json(json_file)
+        expr_def = cmr.read_config(json_file)
+
+    # prepare data once, as in a parameter search
+    model = cmr.CMR()
+    subj_data = {
+        subject: model.prepare_sim(data.loc[data['subject'] == subject])
+        for subject in subj_param.keys()
+    }
+    res = {}
+    for name, definition in [('expression', expr_def), ('basis', param_def)]:
+        rate, logl = time_likelihood(
+            model, subj_data, definition, patterns, subj_param, n_eval
+        )
+        res[name] = rate
+        print(f'{name:>10}: {rate:8.2f} evaluations/s (logl={logl:.4f})')
+    print(f'   speedup: {res["basis"] / res["expression"]:.2f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark likelihood evaluations with and without a weight basis."
+    )
+    parser.add_argument('data_file', help="Path to Psifr-format data file.")
+    parser.add_argument('patterns_file', help="Path to patterns file.")
+    parser.add_argument(
+        '--fcf-features', default='loc-cat-use', help="Item-context features."
+    )
+    parser.add_argument('--ff-features', default='none', help="Item-item features.")
+    parser.add_argument(
+        '--no-sublayers', dest='sublayers', action='store_false', help="Use one sublayer."
+    )
+    parser.add_argument(
+        '--n-eval', '-n', type=int, default=20, help="Number of evaluations to time."
+    )
+    parser.add_argument(
+        '--include', '-i', help="Dash-separated list of subjects to include."
+    )
+    parser.add_argument('--seed', '-s', type=int, help="Seed for sampling parameters.")
+    args = parser.parse_args()
+    main(
+        args.data_file,
+        args.patterns_file,
+        args.fcf_features,
+        args.ff_features,
+        args.sublayers,
+        args.n_eval,
+        args.include,
+        args.seed,
+    )
@@ -1,15 +1,11 @@
 #!/bin/bash
 #
 # Downsample images for the stimulus pool.
+#
+# Usage: cfr_downsample_images.sh src dest [n_jobs]
 
 src=$1
 dest=$2
+n_jobs=${3:-1}
 
-for cat in cel loc obj; do
-    for input in "$src/$cat/"*.jpg; do
-        filename=$(basename "$input")
-        output=$dest/$cat/$filename
-        echo "$input -> $output"
-        convert "$input" -resize 300x300 "$output"
-    done
-done
+cfr-resize-images "$src" "$dest" --size 300 --n-jobs "$n_jobs"
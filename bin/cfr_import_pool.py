@@ -4,22 +4,18 @@
 
 
 import argparse
-import numpy as np
 import pandas as pd
 from cfr import task
 
 
 def main(image_dir, map_file, output_dir, pool_file):
     pool = task.read_pool_cfr(image_dir)
-    task.save_pool_images(pool, output_dir)
-    pool = pool.drop(columns=['filepath'])
 
     # sort to match map order
     item_map = pd.read_csv(map_file)
-    pool_sorted = pool.copy()
-    for i, item in item_map['item'].iteritems():
-        pool_ind = pool['item'].str.upper().to_numpy() == item.upper()
-        pool_sorted.iloc[i, :] = pool.iloc[np.where(pool_ind)[0][0], :]
+    pool_sorted = task.sort_pool(pool, item_map['item'])
+    task.save_pool_images(pool_sorted, output_dir)
+    pool_sorted = pool_sorted.drop(columns=['filepath'])
     pool_sorted.to_csv(pool_file, index=False)
 
 
@@ -8,17 +8,28 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 from cymr import cmr
+from cfr import task
 from cfr import framework
 from psifr import fr
 
 
-def main(data_file, patterns_file, param1, sweep1, param2, sweep2, res_dir, n_rep=1):
+def main(
+    data_file,
+    patterns_file,
+    param1,
+    sweep1,
+    param2,
+    sweep2,
+    res_dir,
+    n_rep=1,
+    seed=None,
+):
 
     # run individual parameter search
     data = pd.read_csv(data_file)
     model = cmr.CMR()
     param_def = framework.model_variant(['loc', 'cat', 'use'], None)
-    patterns = cmr.load_patterns(patterns_file)
+    patterns = task.load_patterns(patterns_file)
 
     # fixed parameters
     fixed = {
@@ -51,6 +62,10 @@ def main(data_file, patterns_file, param1, sweep1, param2, sweep2, res_dir, n_re
     )
     del param_def.fixed[param1]
     del param_def.fixed[param2]
+    if seed is not None:
+        # cymr simulations draw from the global random state
+        seed = framework.init_seed(param_def, seed)
+        np.random.seed(framework.spawn_seed(seed, 1).generate_state(4))
     param_def.to_json(os.path.join(res_dir, 'parameters.json'))
 
     # run sweep
@@ -139,6 +154,7 @@ if __name__ == '__main__':
     parser.add_argument('sweep2')
     parser.add_argument('res_dir')
     parser.add_argument('--n-rep', '-n', type=int, default=1)
+    parser.add_argument('--seed', '-s', type=int)
     args = parser.parse_args()
     s1 = np.asarray(args.sweep1.split(','), dtype=float)
     s2 = np.asarray(args.sweep2.split(','), dtype=float)
@@ -151,4 +167,5 @@ if __name__ == '__main__':
         s2,
         args.res_dir,
         args.n_rep,
+        args.seed,
     )
@@ -54,7 +54,7 @@ def main(model_dir, model_version, model_name, n_jobs=1, subjects=None):
     subj_param = results.T.to_dict()
 
     # prepare simulation
-    patterns = cmr.load_patterns(pattern_file)
+    patterns = task.load_patterns(pattern_file)
     data = pd.read_csv(data_file)
     labeled = task.label_clean_trials(data)
     clean = labeled.query('clean').reset_index()
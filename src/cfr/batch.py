@@ -1,11 +1,27 @@
 """Utilities for running commands in batches."""
 
+import os
 from pathlib import Path
 import shutil
+import csv
+import heapq
+import itertools
+import shlex
+import hashlib
+import json
+import logging
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
 import numpy as np
 import pandas as pd
 import click
+from cymr import cmr
 from cfr import framework
+from cfr import task
+from cfr import reports
 
 
 def expand_variants(fcf_features, ff_features, sublayer_param, fixed_param):
@@ -39,6 +55,11 @@ def expand_variants(fcf_features, ff_features, sublayer_param, fixed_param):
     return fcf_list, ff_list, sub_list, fix_list
 
 
+def _quote(arg):
+    """Quote a command line argument, such as a path with spaces."""
+    return shlex.quote(str(arg))
+
+
 def command_fit_cmr(
     study,
     fit,
@@ -51,14 +72,17 @@ def command_fit_cmr(
     n_jobs=48,
     tol=0.00001,
     n_sim_reps=50,
+    n_converge=None,
 ):
     """Generate command line arguments for fitting CMR."""
     study_dir, data_file, patterns_file = framework.get_study_paths(study)
-    inputs = f'{data_file} {patterns_file}'
+    inputs = f'{_quote(data_file)} {_quote(patterns_file)}'
     res_name = framework.generate_model_name(
         fcf_features, ff_features, sublayers, subpar, fixed
     )
     opts = f'-t {tol:.6f} -n {n_reps} -j {n_jobs} -r {n_sim_reps}'
+    if n_converge is not None:
+        opts += f' -c {n_converge}'
 
     if sublayers:
         opts = f'--sublayers {opts}'
@@ -66,12 +90,13 @@ def command_fit_cmr(
         opts = f'--no-sublayers {opts}'
 
     if subpar:
-        opts += f' -p {subpar}'
+        opts += f' -p {_quote(subpar)}'
     if fixed:
-        opts += f' -f {fixed}'
+        opts += f' -f {_quote(fixed)}'
     full_dir = study_dir / study / 'fits' / fit / res_name
 
-    print(f'cfr-fit-cmr {inputs} {fcf_features} {ff_features} {full_dir} {opts}')
+    features = f'{_quote(fcf_features)} {_quote(ff_features)}'
+    return f'cfr-fit-cmr {inputs} {features} {_quote(full_dir)} {opts}'
 
 
 @click.command()
@@ -108,6 +133,12 @@ def command_fit_cmr(
     default=1,
     help="number of experiment replications to simulate",
 )
+@click.option(
+    "--n-converge",
+    "-c",
+    type=int,
+    help="stop searches for a subject after the best fit is found this many times",
+)
 def plan_fit_cmr(
     study,
     fit,
@@ -123,7 +154,7 @@ def plan_fit_cmr(
         fcf_features, ff_features, sublayer_param, fixed_param
     )
     for fcf, ff, sub, fix in zip(fcf_list, ff_list, sub_list, fix_list):
-        command_fit_cmr(
+        command = command_fit_cmr(
             study,
             fit,
             fcf,
@@ -133,6 +164,7 @@ def plan_fit_cmr(
             fix,
             **kwargs,
         )
+        print(command)
 
 
 def command_xval_cmr(
@@ -148,18 +180,21 @@ def command_xval_cmr(
     n_reps=10,
     n_jobs=48,
     tol=0.00001,
+    n_converge=None,
 ):
     """Generate command line arguments for fitting CMR."""
     study_dir, data_file, patterns_file = framework.get_study_paths(study)
-    inputs = f'{data_file} {patterns_file}'
+    inputs = f'{_quote(data_file)} {_quote(patterns_file)}'
     res_name = framework.generate_model_name(
         fcf_features, ff_features, sublayers, subpar, fixed
     )
     opts = f'-t {tol:.6f} -n {n_reps} -j {n_jobs}'
+    if n_converge is not None:
+        opts += f' -c {n_converge}'
     if n_folds is not None:
         opts += f' -d {n_folds}'
     if fold_key is not None:
-        opts += f' -k {fold_key}'
+        opts += f' -k {_quote(fold_key)}'
 
     if sublayers:
         opts = f'--sublayers {opts}'
@@ -167,12 +202,13 @@ def command_xval_cmr(
         opts = f'--no-sublayers {opts}'
 
     if subpar:
-        opts += f' -p {subpar}'
+        opts += f' -p {_quote(subpar)}'
     if fixed:
-        opts += f' -f {fixed}'
+        opts += f' -f {_quote(fixed)}'
     full_dir = study_dir / study / 'fits' / fit / res_name
 
-    print(f'cfr-xval-cmr {inputs} {fcf_features} {ff_features} {full_dir} {opts}')
+    features = f'{_quote(fcf_features)} {_quote(ff_features)}'
+    return f'cfr-xval-cmr {inputs} {features} {_quote(full_dir)} {opts}'
 
 
 @click.command()
@@ -213,6 +249,12 @@ def command_xval_cmr(
     "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
 )
 @click.option("--tol", "-t", type=float, default=0.00001, help="search tolerance")
+@click.option(
+    "--n-converge",
+    "-c",
+    type=int,
+    help="stop searches for a subject after the best fit is found this many times",
+)
 def plan_xval_cmr(
     study,
     fit,
@@ -228,7 +270,7 @@ def plan_xval_cmr(
         fcf_features, ff_features, sublayer_param, fixed_param
     )
     for fcf, ff, sub, fix in zip(fcf_list, ff_list, sub_list, fix_list):
-        command_xval_cmr(
+        command = command_xval_cmr(
             study,
             fit,
             fcf,
@@ -238,15 +280,17 @@ def plan_xval_cmr(
             fix,
             **kwargs,
         )
+        print(command)
 
 
-def command_sim_cmr(study, fit, model, n_rep=1):
+def command_sim_cmr(study, fit, model, n_rep=1, n_jobs=1, check=True):
     """Generate command line arguments for simulating CMR."""
     study_dir, data_file, patterns_file = framework.get_study_paths(study)
     fit_dir = study_dir / study / 'fits' / fit / model
-    if not fit_dir.exists():
+    if check and not fit_dir.exists():
         raise IOError(f'Fit directory does not exist: {fit_dir}')
-    print(f'cfr-sim-cmr {data_file} {patterns_file} {fit_dir} -r {n_rep}')
+    paths = ' '.join(_quote(p) for p in [data_file, patterns_file, fit_dir])
+    return f'cfr-sim-cmr {paths} -r {n_rep} -j {n_jobs}'
 
 
 @click.command()
@@ -260,19 +304,28 @@ def command_sim_cmr(study, fit, model, n_rep=1):
     default=1,
     help="number of experiment replications to simulate",
 )
-def plan_sim_cmr(study, fit, models, n_sim_reps):
+@click.option(
+    "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
+)
+@click.option(
+    "--check/--no-check",
+    default=True,
+    help="check that fit directories exist (disable when planning fits too)",
+)
+def plan_sim_cmr(study, fit, models, n_sim_reps, n_jobs, check):
     """Print command lines for simulating multiple models."""
     for model in models.split(","):
-        command_sim_cmr(study, fit, model, n_sim_reps)
+        print(command_sim_cmr(study, fit, model, n_sim_reps, n_jobs, check))
 
 
-def command_plot_fit(study, fit, model, ext="svg"):
+def command_plot_fit(study, fit, model, ext="svg", check=True):
     """Generate command line arguments for plotting CMR simulations."""
     study_dir, data_file, patterns_file = framework.get_study_paths(study)
     fit_dir = study_dir / study / 'fits' / fit / model
-    if not fit_dir.exists():
+    if check and not fit_dir.exists():
         raise IOError(f'Fit directory does not exist: {fit_dir}')
-    print(f'cfr-plot-fit -e {ext} {data_file} {patterns_file} {fit_dir}')
+    paths = ' '.join(_quote(p) for p in [data_file, patterns_file, fit_dir])
+    return f'cfr-plot-fit -e {_quote(ext)} {paths}'
 
 
 @click.command()
@@ -280,62 +333,1246 @@ def command_plot_fit(study, fit, model, ext="svg"):
 @click.argument("fit")
 @click.argument("models")
 @click.option("--ext", "-e", default="svg", help="figure file type (default: svg)")
+@click.option(
+    "--check/--no-check",
+    default=True,
+    help="check that fit directories exist (disable when planning fits too)",
+)
 def plan_plot_fit(study, fit, models, **kwargs):
     """Print command lines for plotting fit for multiple models."""
     for model in models.split(","):
-        command_plot_fit(study, fit, model, **kwargs)
+        print(command_plot_fit(study, fit, model, **kwargs))
+
+
+PLAN_COMMANDS = {
+    'cfr-fit-cmr': (framework.fit_cmr, 'res_dir'),
+    'cfr-xval-cmr': (framework.xval_cmr, 'res_dir'),
+    'cfr-sim-cmr': (framework.sim_cmr, 'fit_dir'),
+    'cfr-plot-fit': (reports.plot_fit, 'fit_dir'),
+}
+
+PLAN_DEPENDS = {
+    'cfr-sim-cmr': ['cfr-fit-cmr'],
+    'cfr-plot-fit': ['cfr-sim-cmr', 'cfr-fit-cmr'],
+}
+
+
+def parse_plan_command(command):
+    """
+    Parse a planned command line.
+
+    Parameters
+    ----------
+    command : str
+        Command line, as printed by the cfr-plan-* commands.
+
+    Returns
+    -------
+    program : str
+        Name of the program to run.
+
+    model_dir : str
+        Model directory the command reads from or writes to. Undefined
+        for programs that are not part of the fitting workflow.
+
+    n_jobs : int
+        Number of cores used by the command.
+    """
+    args = shlex.split(command)
+    if not args:
+        raise ValueError('Command is empty.')
+    program = os.path.basename(args[0])
+    if program not in PLAN_COMMANDS:
+        return program, None, 1
+
+    # parse options without checking that paths exist yet
+    cmd, dir_arg = PLAN_COMMANDS[program]
+    ctx = click.Context(cmd, info_name=program)
+    opts, _, _ = cmd.make_parser(ctx).parse_args(args[1:])
+    if dir_arg not in opts:
+        raise ValueError(f'Model directory missing from command: {command}')
+    model_dir = os.path.normpath(opts[dir_arg])
+    n_jobs = int(opts.get('n_jobs', 1))
+    return program, model_dir, n_jobs
+
+
+def plan_jobs(commands):
+    """
+    Define jobs and dependencies for a set of planned commands.
+
+    Simulations depend on fits of the same model, and plots depend on
+    simulations of the same model, or on the fit if there are no
+    planned simulations. Commands without a planned dependency are
+    assumed to have their inputs already.
+
+    Parameters
+    ----------
+    commands : list of str
+        Command lines to run.
+
+    Returns
+    -------
+    jobs : pandas.DataFrame
+        Command, program, model directory, number of cores, and list of
+        jobs that must finish first (:code:`depends`) for each job.
+    """
+    commands = [c.strip() for c in commands]
+    commands = [c for c in commands if c and not c.startswith('#')]
+    records = []
+    for command in commands:
+        program, model_dir, n_jobs = parse_plan_command(command)
+        records.append(
+            {
+                'command': command,
+                'program': program,
+                'model_dir': model_dir,
+                'n_jobs': n_jobs,
+            }
+        )
+    jobs = pd.DataFrame(
+        records, columns=['command', 'program', 'model_dir', 'n_jobs']
+    )
+    if jobs['command'].duplicated().any():
+        raise ValueError('Plan contains duplicate commands.')
+
+    depends = []
+    for job in jobs.itertuples():
+        job_depends = []
+        for program in PLAN_DEPENDS.get(job.program, []):
+            match = jobs.index[
+                (jobs['program'] == program) & (jobs['model_dir'] == job.model_dir)
+            ]
+            if len(match) > 0:
+                job_depends = match.tolist()
+                break
+        depends.append(job_depends)
+    jobs['depends'] = depends
+    return jobs
+
+
+def init_plan_db(db_file, jobs):
+    """Create or update a job database for a plan."""
+    con = sqlite3.connect(db_file)
+    with con:
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                command TEXT PRIMARY KEY,
+                program TEXT,
+                model_dir TEXT,
+                n_jobs INTEGER,
+                status TEXT,
+                start_time REAL,
+                runtime REAL,
+                max_rss INTEGER,
+                returncode INTEGER
+            )
+            """
+        )
+        for job in jobs.itertuples():
+            con.execute(
+                "INSERT OR IGNORE INTO jobs "
+                "(command, program, model_dir, n_jobs, status) "
+                "VALUES (?, ?, ?, ?, 'pending')",
+                (job.command, job.program, job.model_dir, job.n_jobs),
+            )
+    return con
+
+
+def run_command(command, log_file=None):
+    """
+    Run a command and measure its runtime and peak memory.
+
+    Returns
+    -------
+    returncode : int
+        Exit code of the command.
+
+    runtime : float
+        Wall time in seconds.
+
+    max_rss : int or None
+        Peak resident set size of the command in kilobytes, or None if
+        resource usage of single processes is not available on this
+        platform.
+    """
+    start = time.perf_counter()
+    if log_file is not None:
+        with open(log_file, 'w') as f:
+            proc = subprocess.Popen(
+                shlex.split(command), stdout=f, stderr=subprocess.STDOUT
+            )
+    else:
+        proc = subprocess.Popen(shlex.split(command))
+
+    if not hasattr(os, 'wait4'):
+        proc.wait()
+        return proc.returncode, time.perf_counter() - start, None
+
+    # wait directly to get resource usage of the child process; other
+    # jobs may be running, so usage of all children cannot be used
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    max_rss = usage.ru_maxrss
+    if sys.platform == 'darwin':
+        # macOS reports bytes instead of kilobytes
+        max_rss //= 1024
+    return proc.returncode, time.perf_counter() - start, max_rss
+
+
+def run_plan(commands, db_file, n_cores=1, log_dir=None, rerun_failed=True):
+    """
+    Run planned commands on a local worker pool.
+
+    Jobs start once the jobs they depend on have finished and enough
+    cores are free; each job reserves the number of cores set by its
+    :code:`-j` option, up to the total budget. Status, runtime, and
+    peak memory of each job are recorded in a SQLite database. If the
+    database already exists, jobs that finished successfully are not
+    run again, so an interrupted plan can be resumed.
+
+    Parameters
+    ----------
+    commands : list of str
+        Command lines to run.
+
+    db_file : str
+        Path to the SQLite job database.
+
+    n_cores : int, optional
+        Total number of cores to use for running jobs.
+
+    log_dir : str, optional
+        Directory to write the output of each job to. If not
+        specified, output is not redirected.
+
+    rerun_failed : bool, optional
+        If true, jobs that failed in a previous run are run again.
+
+    Returns
+    -------
+    status : pandas.Series
+        Final status of each job, indexed by command.
+    """
+    jobs = plan_jobs(commands)
+    con = init_plan_db(db_file, jobs)
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+
+    prev = dict(con.execute('SELECT command, status FROM jobs').fetchall())
+    status = {}
+    for job in jobs.itertuples():
+        job_status = prev[job.command]
+        if job_status == 'done' or (job_status == 'failed' and not rerun_failed):
+            status[job.Index] = job_status
+        else:
+            status[job.Index] = 'pending'
+    lock = threading.Lock()
+    finished = threading.Condition(lock)
+    n_free = n_cores
+
+    def update_job(command, **fields):
+        names = ', '.join(f'{name} = ?' for name in fields.keys())
+        values = list(fields.values()) + [command]
+        with sqlite3.connect(db_file) as job_con:
+            job_con.execute(f'UPDATE jobs SET {names} WHERE command = ?', values)
+
+    def run_job(ind, n_reserve):
+        nonlocal n_free
+        job = jobs.loc[ind]
+        log_file = None
+        if log_dir is not None:
+            log_file = os.path.join(log_dir, f'job{ind:03d}.txt')
+        job_status = 'failed'
+        try:
+            update_job(job['command'], status='running', start_time=time.time())
+            try:
+                returncode, runtime, max_rss = run_command(job['command'], log_file)
+            except OSError:
+                returncode, runtime, max_rss = -1, 0, 0
+            job_status = 'done' if returncode == 0 else 'failed'
+            update_job(
+                job['command'],
+                status=job_status,
+                runtime=runtime,
+                max_rss=max_rss,
+                returncode=returncode,
+            )
+        except Exception:
+            # record the failure so the scheduler does not wait on this job
+            logging.exception(f'Error running job: {job["command"]}')
+            job_status = 'failed'
+            try:
+                update_job(job['command'], status='failed')
+            except sqlite3.Error:
+                pass
+        finally:
+            with finished:
+                status[ind] = job_status
+                n_free += n_reserve
+                finished.notify()
+
+    threads = []
+    with finished:
+        while True:
+            # jobs that cannot run because a dependency failed
+            skipped = True
+            while skipped:
+                skipped = False
+                for ind, job_status in status.items():
+                    if job_status != 'pending':
+                        continue
+                    depends = jobs.loc[ind, 'depends']
+                    if any(status[d] in ['failed', 'skipped'] for d in depends):
+                        status[ind] = 'skipped'
+                        update_job(jobs.loc[ind, 'command'], status='skipped')
+                        skipped = True
+
+            # start ready jobs, in plan order, while cores are free
+            for ind, job_status in status.items():
+                if job_status != 'pending':
+                    continue
+                if not all(status[d] == 'done' for d in jobs.loc[ind, 'depends']):
+                    continue
+                n_reserve = min(jobs.loc[ind, 'n_jobs'], n_cores)
+                if n_reserve > n_free:
+                    continue
+                n_free -= n_reserve
+                status[ind] = 'running'
+                thread = threading.Thread(target=run_job, args=(ind, n_reserve))
+                thread.start()
+                threads.append(thread)
+
+            if 'running' not in status.values():
+                break
+            finished.wait()
+
+    for thread in threads:
+        thread.join()
+    con.close()
+    return pd.Series(
+        [status[ind] for ind in jobs.index], index=jobs['command'], name='status'
+    )
 
 
 @click.command()
-@click.argument("out_dir", type=click.Path())
-@click.argument("split_dirs", nargs=-1, type=click.Path(exists=True))
-def join_xval(out_dir, split_dirs):
-    """Join a split-up cross-validation."""
+@click.argument("plan_file", type=click.File("r"))
+@click.argument("db_file", type=click.Path())
+@click.option(
+    "--n-cores", "-j", type=int, default=1, help="total number of cores to use"
+)
+@click.option("--log-dir", "-l", type=click.Path(), help="directory for job output")
+@click.option(
+    "--rerun-failed/--no-rerun-failed",
+    default=True,
+    help="run jobs that failed in a previous run again",
+)
+def run_plan_cmd(plan_file, db_file, n_cores, log_dir, rerun_failed):
+    """Run planned commands, with fits before simulations and plots."""
+    status = run_plan(plan_file.readlines(), db_file, n_cores, log_dir, rerun_failed)
+    counts = status.value_counts()
+    print(', '.join(f'{n} {name}' for name, n in counts.items()))
+    if (status != 'done').any():
+        raise click.ClickException(f'Some jobs did not finish; see {db_file}.')
+
+
+def file_hash(path, cache=None):
+    """
+    Get a hash of a file, or of all files in a directory.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Path to a file or directory.
+
+    cache : dict, optional
+        Cache of hashes, keyed by path, modification time, and size.
+        Files that have not changed since they were hashed are not read
+        again.
+
+    Returns
+    -------
+    digest : str
+        SHA-256 hash of the file contents.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise IOError(f'Pipeline input does not exist: {path}')
+    if path.is_dir():
+        h = hashlib.sha256()
+        for file in sorted(p for p in path.rglob('*') if p.is_file()):
+            h.update(str(file.relative_to(path)).encode())
+            h.update(file_hash(file, cache).encode())
+        return h.hexdigest()
+
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    if cache is not None and key in cache:
+        return cache[key]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    if cache is not None:
+        cache[key] = digest
+    return digest
+
+
+def stage_key(inputs, options, cache=None):
+    """Get a key identifying the inputs and options of a pipeline stage."""
+    h = hashlib.sha256()
+    for path in inputs:
+        h.update(file_hash(path, cache).encode())
+    h.update(json.dumps(options, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def run_model_pipeline(
+    study,
+    fit,
+    fcf_features,
+    ff_features,
+    sublayers,
+    subpar,
+    fixed,
+    n_reps=1,
+    n_jobs=1,
+    tol=0.00001,
+    n_sim_reps=1,
+    sim_format='csv',
+    ext='svg',
+    force=False,
+    loaded=None,
+):
+    """
+    Fit, simulate, plot, and report a model, running only stale stages.
+
+    Each stage is keyed by hashes of its input files and its options,
+    and keys of completed stages are stored in pipeline.json in the
+    model directory. A stage is run if its outputs are missing or its
+    key has changed (fit.csv → sim.csv → figs → report.html). Outputs
+    from before the pipeline was used are adopted as current.
+
+    The fit is run in a separate process. Later stages run in this
+    process, reusing loaded data and patterns and passing simulated
+    data to plotting without reading it back from disk.
+
+    Parameters
+    ----------
+    study : str
+        Study code.
+
+    fit : str
+        Fit version directory name.
+
+    fcf_features, ff_features, sublayers, subpar, fixed
+        Model specification, as for cfr-plan-fit-cmr.
+
+    n_reps, n_jobs, tol
+        Search options for cfr-fit-cmr. The number of jobs does not
+        affect whether a fit is stale.
+
+    n_sim_reps : int, optional
+        Number of experiment replications to simulate.
+
+    sim_format : {'csv', 'npz'}, optional
+        File format for simulated data.
+
+    ext : str, optional
+        Figure file type.
+
+    force : bool, optional
+        If true, all stages are run.
+
+    loaded : dict, optional
+        Cache of loaded data, patterns, and file hashes, to share
+        between calls.
+
+    Returns
+    -------
+    ran : dict of (str: bool)
+        Whether each stage was run.
+    """
+    if loaded is None:
+        loaded = {}
+    hashes = loaded.setdefault('hashes', {})
+    study_dir, data_file, patterns_file = framework.get_study_paths(study)
+    res_name = framework.generate_model_name(
+        fcf_features, ff_features, sublayers, subpar, fixed
+    )
+    model_dir = Path(study_dir) / study / 'fits' / fit / res_name
+    fit_file = model_dir / 'fit.csv'
+    param_file = model_dir / 'parameters.json'
+    sim_file = model_dir / f'sim.{sim_format}'
+    fig_dir = model_dir / 'figs'
+    html_file = model_dir / 'report.html'
+
+    state_file = model_dir / 'pipeline.json'
+    if state_file.exists():
+        state = json.loads(state_file.read_text())
+    else:
+        state = {}
+
+    def is_stale(stage, key, outputs):
+        if force or not all(output.exists() for output in outputs):
+            return True
+        if stage not in state:
+            state[stage] = key
+            return False
+        return state[stage] != key
+
+    def record(stage, key):
+        state[stage] = key
+        model_dir.mkdir(parents=True, exist_ok=True)
+        state_file.write_text(json.dumps(state, indent=4))
+
+    def get_patterns():
+        if 'patterns' not in loaded:
+            loaded['patterns'] = task.load_patterns(patterns_file)
+        return loaded['patterns']
+
+    ran = {}
+
+    # fit
+    options = {
+        'fcf_features': fcf_features,
+        'ff_features': ff_features,
+        'sublayers': sublayers,
+        'subpar': subpar,
+        'fixed': fixed,
+        'n_reps': n_reps,
+        'tol': tol,
+    }
+    key = stage_key([data_file, patterns_file], options, hashes)
+    ran['fit'] = is_stale('fit', key, [fit_file, param_file])
+    if ran['fit']:
+        command = command_fit_cmr(
+            study,
+            fit,
+            fcf_features,
+            ff_features,
+            sublayers,
+            subpar,
+            fixed,
+            n_reps=n_reps,
+            n_jobs=n_jobs,
+            tol=tol,
+            n_sim_reps=0,
+        )
+        print(f'Fitting {res_name}.')
+        subprocess.run(shlex.split(command), check=True)
+        record('fit', key)
+
+    # simulate
+    key = stage_key(
+        [data_file, patterns_file, fit_file, param_file],
+        {'n_sim_reps': n_sim_reps},
+        hashes,
+    )
+    ran['sim'] = is_stale('sim', key, [sim_file])
+    sim = None
+    if ran['sim']:
+        print(f'Simulating {res_name}.')
+        if 'raw' not in loaded:
+            loaded['raw'] = pd.read_csv(data_file)
+        param_def = cmr.read_config(param_file)
+        subj_param = framework.read_fit_param(fit_file)
+        seed = param_def.options.get('seed')
+        if seed is not None:
+            seed = framework.spawn_seed(seed, 1)
+        sim = framework.simulate_fit(
+            loaded['raw'],
+            param_def,
+            get_patterns(),
+            subj_param,
+            n_sim_reps,
+            n_jobs,
+            seed,
+        )
+        task.write_events(sim, sim_file)
+        record('sim', key)
+
+    # plot
+    key = stage_key([data_file, patterns_file, sim_file], {'ext': ext}, hashes)
+    ran['plot'] = is_stale('plot', key, [fig_dir])
+    category = None
+    if ran['plot']:
+        print(f'Plotting {res_name}.')
+        if 'data' not in loaded:
+            loaded['data'] = task.read_free_recall(
+                data_file, block=False, block_category=False
+            )
+        if sim is None:
+            sim = sim_file
+        sim = task.read_free_recall(sim, block=False, block_category=False)
+        category = reports.plot_fit_figs(
+            loaded['data'], sim, get_patterns(), model_dir, ext
+        )
+        record('plot', key)
+
+    # report
+    key = stage_key([fit_file, fig_dir], {'ext': ext}, hashes)
+    ran['report'] = is_stale('report', key, [html_file])
+    if ran['report']:
+        print(f'Writing report for {res_name}.')
+        if category is None:
+            category = 'category' in task.read_event_columns(sim_file)
+        reports.write_fit_report(str(model_dir), category, ext)
+        record('report', key)
+
+    if not any(ran.values()):
+        print(f'All stages of {res_name} are up to date.')
+    return ran
+
+
+@click.command()
+@click.argument("study")
+@click.argument("fit")
+@click.argument("fcf_features")
+@click.argument("ff_features")
+@click.option("--sublayers/--no-sublayers", default=False)
+@click.option(
+    "--sublayer-param",
+    "-p",
+    help="parameters free to vary between sublayers (e.g., B_enc-B_rec)",
+)
+@click.option(
+    "--fixed-param",
+    "-f",
+    help="dash-separated list of values for fixed parameters (e.g., B_enc_cat=1)",
+)
+@click.option(
+    "--n-reps",
+    "-n",
+    type=int,
+    default=1,
+    help="number of times to replicate the search",
+)
+@click.option(
+    "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
+)
+@click.option("--tol", "-t", type=float, default=0.00001, help="search tolerance")
+@click.option(
+    "--n-sim-reps",
+    "-r",
+    type=int,
+    default=1,
+    help="number of experiment replications to simulate",
+)
+@click.option(
+    "--sim-format",
+    type=click.Choice(['csv', 'npz']),
+    default='csv',
+    help="file format for simulated data (default: csv)",
+)
+@click.option("--ext", "-e", default="svg", help="figure file type (default: svg)")
+@click.option("--force", is_flag=True, help="run all stages, even if up to date")
+def run_pipeline(
+    study,
+    fit,
+    fcf_features,
+    ff_features,
+    sublayers,
+    sublayer_param,
+    fixed_param,
+    **kwargs,
+):
+    """Fit, simulate, plot, and report models, running only stale stages."""
+    fcf_list, ff_list, sub_list, fix_list = expand_variants(
+        fcf_features, ff_features, sublayer_param, fixed_param
+    )
+    loaded = {}
+    for fcf, ff, sub, fix in zip(fcf_list, ff_list, sub_list, fix_list):
+        run_model_pipeline(
+            study, fit, fcf, ff, sublayers, sub, fix, loaded=loaded, **kwargs
+        )
+
+
+def add_log_file(log_file, mode='a'):
+    """Add a file to receive log messages, and return its handler."""
+    handler = logging.FileHandler(log_file, mode=mode)
+    handler.setFormatter(
+        logging.Formatter('%(asctime)s %(levelname)s:%(name)s:%(message)s')
+    )
+    logging.getLogger().addHandler(handler)
+    return handler
+
+
+def fit_model_family(
+    data_file,
+    patterns_file,
+    fit_dir,
+    variants,
+    intercept=False,
+    include=None,
+    n_reps=1,
+    n_jobs=1,
+    tol=0.00001,
+    n_converge=None,
+    converge_tol=0.01,
+    n_sim_reps=1,
+    sim_format='csv',
+    seed=None,
+):
+    """
+    Fit a family of model variants in one process, loading data once.
+
+    Searches for all variants are scheduled in one pool of workers.
+    Each model directory has the same outputs as cfr-fit-cmr. Given
+    the same seed, each variant gives the same results as a separate
+    cfr-fit-cmr run.
+
+    Parameters
+    ----------
+    data_file : str
+        Path to Psifr-format data file.
+
+    patterns_file : str
+        Path to patterns file.
+
+    fit_dir : str
+        Directory to write model directories in.
+
+    variants : list of tuple
+        Model specification (fcf_features, ff_features, sublayers,
+        sublayer_param, fixed_param) for each variant, as for
+        cfr-fit-cmr.
+
+    intercept : bool, optional
+        If true, include intercept parameters.
+
+    include : list of int, optional
+        Subjects to include. Default is all subjects.
+
+    n_reps, n_jobs, tol, n_converge, converge_tol
+        Search options, as for cfr-fit-cmr.
+
+    n_sim_reps : int, optional
+        Number of experiment replications to simulate for each variant
+        (0 to skip simulation).
+
+    sim_format : {'csv', 'npz'}, optional
+        File format for simulated data.
+
+    seed : int, optional
+        Seed for random number generation. If not specified, searches
+        and simulations are unseeded.
+
+    Returns
+    -------
+    model_dirs : dict of (str: pathlib.Path)
+        Directory for each model.
+    """
+    fit_dir = Path(fit_dir)
+    data, patterns = framework.load_model_data(data_file, patterns_file, include)
+
+    # save model information
+    param_defs = {}
+    seeds = {}
+    model_dirs = {}
+    for fcf, ff, sublayers, sub, fix in variants:
+        name = framework.generate_model_name(fcf, ff, sublayers, sub, fix)
+        param_def = framework.configure_variant(
+            fcf, ff, intercept, sublayers, sub, fix
+        )
+        if seed is not None:
+            seeds[name] = framework.init_seed(param_def, seed)
+        model_dirs[name] = fit_dir / name
+        model_dirs[name].mkdir(parents=True, exist_ok=True)
+        handler = add_log_file(model_dirs[name] / 'log_fit.txt', mode='w')
+        json_file = model_dirs[name] / 'parameters.json'
+        logging.info(f'Saving parameter definition to {json_file}.')
+        param_def.to_json(json_file)
+        logging.getLogger().removeHandler(handler)
+        handler.close()
+        param_defs[name] = param_def
+
+    # run individual subject fits for all models
+    n = data['subject'].nunique()
+    logging.info(
+        f'Running {n_reps} parameter optimization repeat(s) for {len(param_defs)} '
+        f'model(s) and {n} participant(s).'
+    )
+    logging.info(f'Using {n_jobs} core(s).')
+    fit_seeds = None
+    if seed is not None:
+        fit_seeds = {name: framework.spawn_seed(s, 0) for name, s in seeds.items()}
+    model = framework.CFRModel()
+    family = model.fit_family(
+        data,
+        param_defs,
+        patterns,
+        n_jobs=n_jobs,
+        n_rep=n_reps,
+        n_converge=n_converge,
+        converge_tol=converge_tol,
+        seeds=fit_seeds,
+        tol=tol,
+    )
+
+    for name, results in family.items():
+        model_dir = model_dirs[name]
+        handler = add_log_file(model_dir / 'log_fit.txt')
+
+        # full search information
+        res_file = model_dir / 'search.csv'
+        logging.info(f'Saving full search results to {res_file}.')
+        results.to_csv(res_file)
+
+        # best results
+        best = framework.get_best_results(results)
+        best_file = model_dir / 'fit.csv'
+        logging.info(f'Saving best fitting results to {best_file}.')
+        best.to_csv(best_file)
+
+        # simulate data based on best parameters
+        if n_sim_reps > 0:
+            logging.info(
+                f'Simulating {n_sim_reps} replication(s) with best-fitting parameters.'
+            )
+            sim = framework.simulate_fit(
+                data,
+                param_defs[name],
+                patterns,
+                best.T.to_dict(),
+                n_sim_reps,
+                n_jobs,
+                None if seed is None else framework.spawn_seed(seeds[name], 1),
+            )
+            sim_file = model_dir / f'sim.{sim_format}'
+            logging.info(f'Saving simulated data to {sim_file}.')
+            task.write_events(sim, sim_file)
+        logging.getLogger().removeHandler(handler)
+        handler.close()
+    return model_dirs
+
+
+@click.command()
+@click.argument("study")
+@click.argument("fit")
+@click.argument("fcf_features")
+@click.argument("ff_features")
+@click.option("--intercept/--no-intercept", default=False)
+@click.option("--sublayers/--no-sublayers", default=False)
+@click.option(
+    "--sublayer-param",
+    "-p",
+    help="parameters free to vary between sublayers (e.g., B_enc-B_rec)",
+)
+@click.option(
+    "--fixed-param",
+    "-f",
+    help="dash-separated list of values for fixed parameters (e.g., B_enc_cat=1)",
+)
+@click.option(
+    "--n-reps",
+    "-n",
+    type=int,
+    default=1,
+    help="number of times to replicate the search",
+)
+@click.option(
+    "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
+)
+@click.option("--tol", "-t", type=float, default=0.00001, help="search tolerance")
+@click.option(
+    "--n-converge",
+    "-c",
+    type=int,
+    help="stop searches for a subject after the best fit is found this many times",
+)
+@click.option(
+    "--converge-tol",
+    type=float,
+    default=0.01,
+    help="log-likelihood tolerance for matching the best fit",
+)
+@click.option(
+    "--n-sim-reps",
+    "-r",
+    type=int,
+    default=1,
+    help="number of experiment replications to simulate (0 to skip simulation)",
+)
+@click.option(
+    "--sim-format",
+    type=click.Choice(['csv', 'npz']),
+    default='csv',
+    help="file format for simulated data (default: csv)",
+)
+@click.option(
+    "--seed",
+    "-s",
+    type=int,
+    help="seed for reproducible searches and simulations (default: unseeded)",
+)
+@click.option(
+    "--include",
+    "-i",
+    help="dash-separated list of subject to include (default: all in data file)",
+)
+def fit_family(
+    study,
+    fit,
+    fcf_features,
+    ff_features,
+    intercept,
+    sublayers,
+    sublayer_param,
+    fixed_param,
+    include=None,
+    **kwargs,
+):
+    """Fit multiple models in one process, sharing data and workers."""
+    study_dir, data_file, patterns_file = framework.get_study_paths(study)
+    fit_dir = study_dir / study / 'fits' / fit
+    fit_dir.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        filename=fit_dir / 'log_family.txt',
+        filemode='w',
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s:%(name)s:%(message)s',
+    )
+    fcf_list, ff_list, sub_list, fix_list = expand_variants(
+        fcf_features, ff_features, sublayer_param, fixed_param
+    )
+    variants = [
+        (fcf, ff, sublayers, sub, fix)
+        for fcf, ff, sub, fix in zip(fcf_list, ff_list, sub_list, fix_list)
+    ]
+    if include is not None:
+        include = [int(s) for s in framework.split_arg(include)]
+    model_dirs = fit_model_family(
+        data_file,
+        patterns_file,
+        fit_dir,
+        variants,
+        intercept=intercept,
+        include=include,
+        **kwargs,
+    )
+    for model_dir in model_dirs.values():
+        print(f'Saved fit to {model_dir}.')
+
+
+def _key_value(x):
+    """Convert a key field for sorting, with numbers sorted numerically."""
+    try:
+        return 0, float(x)
+    except ValueError:
+        return 1, x
+
+
+def _read_rows(csv_file, key_names):
+    """Iterate over the rows of a CSV file with their key values."""
+    with open(csv_file, "r", newline="") as f:
+        columns = next(csv.reader([f.readline()]))
+        if not set(key_names).issubset(columns):
+            raise ValueError(f"File does not have {key_names} columns: {csv_file}")
+        key_index = [columns.index(name) for name in key_names]
+        for line in f:
+            if not line.strip():
+                continue
+            if not line.endswith("\n"):
+                line += "\n"
+            row = next(csv.reader([line]))
+            unit = tuple(row[i] for i in key_index)
+            key = tuple(_key_value(x) for x in unit)
+            yield key, unit, line
+
+
+def _is_sorted(csv_file, key_names):
+    """Check if the rows of a CSV file are sorted by key."""
+    prev = None
+    for key, _, _ in _read_rows(csv_file, key_names):
+        if prev is not None and key < prev:
+            return False
+        prev = key
+    return True
+
+
+def _sorted_rows(csv_file, key_names):
+    """
+    Iterate over the rows of a CSV file in order of key values.
+
+    Sorted files are read one row at a time. Unsorted files, such as
+    results from older versions of xval_cmr, are sorted in memory.
+    """
+    if _is_sorted(csv_file, key_names):
+        return _read_rows(csv_file, key_names)
+    print(
+        f"Warning: {csv_file} is not sorted by {', '.join(key_names)}; "
+        "sorting in memory."
+    )
+    return iter(sorted(_read_rows(csv_file, key_names), key=lambda x: x[0]))
+
+
+def _units_frame(units, key_names):
+    """Convert key values read from CSV files to a DataFrame."""
+    units = pd.DataFrame(units, columns=key_names)
+    for name in key_names:
+        if all(_key_value(x)[0] == 0 for x in units[name]):
+            units[name] = pd.to_numeric(units[name])
+    return units
+
+
+def _read_header(csv_file):
+    """Read the header line of a CSV file."""
+    with open(csv_file, "r", newline="") as f:
+        return f.readline()
+
+
+def _read_last_line(csv_file, block_size=4096):
+    """Read the last line of a file without reading the whole file."""
+    with open(csv_file, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        data = b""
+        while end > 0 and data.rstrip(b"\n").count(b"\n") < 1:
+            start = max(0, end - block_size)
+            f.seek(start)
+            data = f.read(end - start) + data
+            end = start
+    return data.rstrip(b"\n").split(b"\n")[-1].decode() + "\n"
+
+
+def _stage_merge(csv_files, out_file, key_names, append=False):
+    """
+    Merge CSV files into a temporary file next to the output.
+
+    Returns the merged units, the temporary file, and whether the
+    temporary file should be appended to the output (rather than
+    replacing it). The output file is not changed.
+    """
+    out_file = Path(out_file)
+    headers = {_read_header(csv_file) for csv_file in csv_files}
+    if append and out_file.exists():
+        headers.add(_read_header(out_file))
+    else:
+        append = False
+    if len(headers) > 1:
+        raise ValueError(f"Columns do not match when merging into {out_file}.")
+    header = headers.pop()
+
+    # check if new rows can go after existing rows
+    streams = [_sorted_rows(csv_file, key_names) for csv_file in csv_files]
+    merged = ((*row, True) for row in heapq.merge(*streams, key=lambda x: x[0]))
+    first = next(merged, None)
+    if first is None:
+        raise ValueError(f"No rows to merge into {out_file}.")
+    merged = itertools.chain([first], merged)
+    rewrite = False
+    if append:
+        columns = next(csv.reader([header]))
+        row = next(csv.reader([_read_last_line(out_file)]))
+        last_key = tuple(_key_value(row[columns.index(name)]) for name in key_names)
+        if first[0] <= last_key or not _is_sorted(out_file, key_names):
+            # merge with the existing rows
+            rewrite = True
+            existing = ((*row, False) for row in _sorted_rows(out_file, key_names))
+            merged = heapq.merge(merged, existing, key=lambda x: x[0])
+
+    tmp_file = out_file.with_name(out_file.name + ".tmp")
+    units = []
+    prev = None
+    try:
+        with open(tmp_file, "w", newline="") as f:
+            if not append or rewrite:
+                f.write(header)
+            for key, unit, line, is_new in merged:
+                if key == prev:
+                    raise ValueError(
+                        f"Duplicate {', '.join(key_names)} in {out_file}: {unit}"
+                    )
+                prev = key
+                if is_new:
+                    units.append(unit)
+                f.write(line)
+    except Exception:
+        os.remove(tmp_file)
+        raise
+    return units, tmp_file, append and not rewrite
+
+
+def _commit_merge(tmp_file, out_file, append):
+    """Replace or append to an output file with a staged merge."""
+    if append:
+        with open(out_file, "a", newline="") as f, open(tmp_file, "r") as g:
+            shutil.copyfileobj(g, f)
+        os.remove(tmp_file)
+    else:
+        os.replace(tmp_file, out_file)
+
+
+def merge_sorted_csv(csv_files, out_file, key_names, append=False):
+    """
+    Merge CSV files by key columns.
+
+    Rows are merged one at a time, so sorted files do not need to fit
+    in memory. Each file must have the same columns; files that are not
+    sorted by the key columns are sorted in memory. Rows are written
+    without parsing the other columns.
+
+    Parameters
+    ----------
+    csv_files : list of str
+        Paths to CSV files.
+
+    out_file : str
+        Path to the merged file.
+
+    key_names : list of str
+        Columns to sort by.
+
+    append : bool, optional
+        If true and the output file exists, add rows to it. If the new
+        rows all sort after the existing rows, they are added at the
+        end without rewriting the existing file. Otherwise, the existing
+        file is merged with the new files.
+
+    Returns
+    -------
+    units : list of tuple
+        Key values of the merged rows from the new files.
+    """
+    # write to a temporary file, so the output is only changed if valid
+    units, tmp_file, append = _stage_merge(csv_files, out_file, key_names, append)
+    _commit_merge(tmp_file, out_file, append)
+    return units
+
+
+def check_xval_coverage(xval):
+    """
+    Check that every subject was tested in every fold.
+
+    Parameters
+    ----------
+    xval : pandas.DataFrame
+        Cross-validation results with fold and subject columns.
+
+    Returns
+    -------
+    missing : pandas.DataFrame
+        Fold and subject of each missing unit.
+    """
+    xval = xval[["fold", "subject"]]
+    folds = xval["fold"].unique()
+    subjects = xval["subject"].unique()
+    expected = pd.MultiIndex.from_product([folds, subjects], names=["fold", "subject"])
+    observed = pd.MultiIndex.from_frame(xval)
+    missing = expected.difference(observed).to_frame(index=False)
+    return missing
+
+
+def join_xval_splits(out_dir, split_dirs, append=False, strict=False):
+    """
+    Join a cross-validation that was split into multiple runs.
+
+    Parameters
+    ----------
+    out_dir : str
+        Path to the directory to write the joined results to.
+
+    split_dirs : list of str
+        Paths to directories with results of each split.
+
+    append : bool, optional
+        If true, add the splits to existing joined results in the
+        output directory.
+
+    strict : bool, optional
+        If true, raise an error if any subject is missing from any
+        fold, instead of printing a warning.
+
+    Returns
+    -------
+    missing : pandas.DataFrame
+        Fold and subject of units missing from the joined results.
+    """
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
     param_file = out_dir / "parameters.json"
-    search_file = out_dir / "xval_search.csv"
-    xval_file = out_dir / "xval.csv"
     log_file = out_dir / "log_xval.txt"
-    log = ""
-    search_list = []
-    xval_list = []
+    split_dirs = [Path(split_dir) for split_dir in split_dirs]
     for split_dir in split_dirs:
-        print(f"Loading data from {split_dir}.")
-        split_dir = Path(split_dir)
-
-        # copy parameters file
-        if not param_file.exists():
-            split_param_file = split_dir / "parameters.json"
-            if split_param_file.exists():
-                shutil.copy(split_param_file, param_file)
-            else:
-                raise IOError(f"Parameters file does not exist: {split_param_file}")
-
-        # add to log
-        split_log_file = split_dir / "log_xval.txt"
-        if not split_log_file.exists():
-            raise IOError(f"Log file does not exist: {split_log_file}")
-        log += split_log_file.read_text()
-
-        # add to search
-        split_search_file = split_dir / "xval_search.csv"
-        if not split_search_file.exists():
-            raise IOError(f"Search file does not exist: {split_search_file}")
-        split_search = pd.read_csv(split_search_file)
-        search_list.append(split_search)
-
-        # add to xval
-        split_xval_file = split_dir / "xval.csv"
-        if not split_xval_file.exists():
-            raise IOError(f"X-val file does not exist: {split_xval_file}")
-        split_xval = pd.read_csv(split_xval_file)
-        xval_list.append(split_xval)
-
-    # write out concatenated files
-    print(f"Writing data to {out_dir}.")
-    log_file.write_text(log)
-    search = pd.concat(search_list, ignore_index=True)
-    search.sort_values(["fold", "subject", "rep"]).to_csv(search_file, index=False)
-    xval = pd.concat(xval_list, ignore_index=True)
-    xval.sort_values(["fold", "subject"]).to_csv(xval_file, index=False)
+        for name in ["log_xval.txt", "xval_search.csv", "xval.csv"]:
+            if not (split_dir / name).exists():
+                raise IOError(f"File does not exist: {split_dir / name}")
+
+    # copy parameters file
+    if not param_file.exists():
+        split_param_file = split_dirs[0] / "parameters.json"
+        if split_param_file.exists():
+            shutil.copy(split_param_file, param_file)
+        else:
+            raise IOError(f"Parameters file does not exist: {split_param_file}")
+
+    # merge split results by fold, subject, and rep; outputs are only
+    # changed once both merges are complete, consistent, and checked
+    print(f"Merging {len(split_dirs)} splits into {out_dir}.")
+    staged = []
+    try:
+        search_units, tmp_file, search_append = _stage_merge(
+            [split_dir / "xval_search.csv" for split_dir in split_dirs],
+            out_dir / "xval_search.csv",
+            ["fold", "subject", "rep"],
+            append,
+        )
+        staged.append((tmp_file, out_dir / "xval_search.csv", search_append))
+        xval_units, tmp_file, xval_append = _stage_merge(
+            [split_dir / "xval.csv" for split_dir in split_dirs],
+            out_dir / "xval.csv",
+            ["fold", "subject"],
+            append,
+        )
+        staged.append((tmp_file, out_dir / "xval.csv", xval_append))
+        if {unit[:2] for unit in search_units} != set(xval_units):
+            raise ValueError(
+                "Search and cross-validation results have different units."
+            )
+
+        # check coverage of the new units together with the existing keys
+        units = list(xval_units)
+        if append and (out_dir / "xval.csv").exists():
+            rows = _read_rows(out_dir / "xval.csv", ["fold", "subject"])
+            units.extend(unit for _, unit, _ in rows)
+        missing = check_xval_coverage(_units_frame(units, ["fold", "subject"]))
+        if not missing.empty:
+            message = (
+                f"{len(missing)} fold and subject units are missing from the "
+                f"joined results: {list(missing.itertuples(index=False, name=None))}"
+            )
+            if strict:
+                raise ValueError(message)
+            print(f"Warning: {message}")
+    except Exception:
+        for tmp_file, _, _ in staged:
+            os.remove(tmp_file)
+        raise
+    for tmp_file, out_file, file_append in staged:
+        _commit_merge(tmp_file, out_file, file_append)
+
+    # add to log
+    with open(log_file, "a" if append else "w") as f:
+        for split_dir in split_dirs:
+            f.write((split_dir / "log_xval.txt").read_text())
+    return missing
+
+
+@click.command()
+@click.argument("out_dir", type=click.Path())
+@click.argument("split_dirs", nargs=-1, type=click.Path(exists=True))
+@click.option(
+    "--append/--no-append",
+    default=False,
+    help="add splits to existing joined results in OUT_DIR",
+)
+@click.option(
+    "--strict/--no-strict",
+    default=False,
+    help="fail if any subject is missing from any fold",
+)
+def join_xval(out_dir, split_dirs, append, strict):
+    """Join a split-up cross-validation."""
+    join_xval_splits(out_dir, split_dirs, append, strict)
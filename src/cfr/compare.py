@@ -0,0 +1,327 @@
+"""Compare models using information criteria and cross-validation."""
+
+import numpy as np
+import pandas as pd
+from scipy import special
+from cfr import framework
+
+
+def stat_matrix(res, stat, models=None):
+    """
+    Arrange a statistic as a [subjects x models] array.
+
+    Parameters
+    ----------
+    res : pandas.DataFrame
+        Results indexed by model and subject, as from read_model_fits
+        or read_model_xvals. If there are multiple rows for a subject,
+        such as cross-validation folds, they are summed.
+
+    stat : str
+        Column to arrange.
+
+    models : list of str, optional
+        Order of models. Default is the order of first appearance.
+
+    Returns
+    -------
+    values : numpy.ndarray
+        [subjects x models] array of the statistic. Missing
+        combinations are NaN.
+
+    subjects : numpy.ndarray
+        Subject for each row.
+
+    models : numpy.ndarray
+        Model for each column.
+    """
+    model_index = res.index.get_level_values('model')
+    subject_index = res.index.get_level_values('subject')
+    if models is None:
+        model_codes, models = pd.factorize(model_index)
+    else:
+        models = pd.Index(models)
+        model_codes = models.get_indexer(model_index)
+    subject_codes, subjects = pd.factorize(subject_index, sort=True)
+    include = model_codes >= 0
+
+    values = np.zeros((len(subjects), len(models)))
+    count = np.zeros((len(subjects), len(models)), int)
+    rows = subject_codes[include]
+    cols = model_codes[include]
+    np.add.at(values, (rows, cols), res[stat].to_numpy()[include])
+    np.add.at(count, (rows, cols), 1)
+    values[count == 0] = np.nan
+    return values, np.asarray(subjects), np.asarray(models)
+
+
+def information_criteria(logl, n, k):
+    """
+    Calculate AIC and Akaike weights for all subjects and models.
+
+    Parameters
+    ----------
+    logl, n, k : numpy.ndarray
+        [subjects x models] arrays of log likelihood, number of data
+        points, and number of free parameters.
+
+    Returns
+    -------
+    aic : numpy.ndarray
+        Corrected Akaike information criterion.
+
+    waic : numpy.ndarray
+        Akaike weight of each model for each subject.
+    """
+    a = framework.aic(logl, n, k)
+    return a, framework.waic(a, axis=1)
+
+
+def logl_diff(logl, reference=None):
+    """
+    Log-likelihood differences relative to a reference model.
+
+    Parameters
+    ----------
+    logl : numpy.ndarray
+        [subjects x models] array of log likelihood.
+
+    reference : int, optional
+        Column of the reference model. Default is the model with the
+        highest mean log likelihood.
+
+    Returns
+    -------
+    diff : numpy.ndarray
+        [subjects x models] array of differences from the reference.
+    """
+    if reference is None:
+        reference = np.argmax(np.nanmean(logl, axis=0))
+    return logl - logl[:, [reference]]
+
+
+def bootstrap_mean(x, n_boot=10000, seed=None, chunk_size=1000):
+    """
+    Bootstrap distribution of means over subjects.
+
+    Resamples are represented as counts of each subject, so the means
+    for a chunk of resamples are calculated with one matrix product.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        [subjects x models] array of values.
+
+    n_boot : int, optional
+        Number of bootstrap resamples.
+
+    seed : int or numpy.random.Generator, optional
+        Seed for resampling.
+
+    chunk_size : int, optional
+        Number of resamples to calculate at once.
+
+    Returns
+    -------
+    boot : numpy.ndarray
+        [resamples x models] array of means.
+    """
+    rng = np.random.default_rng(seed)
+    n_subj = x.shape[0]
+    p = np.full(n_subj, 1 / n_subj)
+    boot = np.empty((n_boot, x.shape[1]))
+    for start in range(0, n_boot, chunk_size):
+        stop = min(start + chunk_size, n_boot)
+        counts = rng.multinomial(n_subj, p, size=stop - start)
+        boot[start:stop] = counts @ x / n_subj
+    return boot
+
+
+def percentile_ci(boot, ci=95):
+    """Lower and upper percentile confidence limits over resamples."""
+    tail = (100 - ci) / 2
+    return np.percentile(boot, [tail, 100 - tail], axis=0)
+
+
+def bms(lme, alpha0=1, tol=1e-6, max_iter=1000):
+    """
+    Random-effects Bayesian model selection.
+
+    Estimates a Dirichlet distribution over model frequencies in the
+    population using variational Bayes (Stephan et al. 2009), along
+    with the Bayesian omnibus risk that frequencies are all equal
+    (Rigoux et al. 2014).
+
+    Parameters
+    ----------
+    lme : numpy.ndarray
+        [subjects x models] array of log model evidence, such as
+        -AIC / 2 or cross-validated log likelihood.
+
+    alpha0 : float, optional
+        Prior Dirichlet concentration for each model.
+
+    tol : float, optional
+        Convergence tolerance for the concentration parameters.
+
+    max_iter : int, optional
+        Maximum number of iterations.
+
+    Returns
+    -------
+    alpha : numpy.ndarray
+        Posterior Dirichlet concentration for each model.
+
+    g : numpy.ndarray
+        [subjects x models] posterior probability of each model
+        generating each subject's data.
+
+    bor : float
+        Bayesian omnibus risk.
+    """
+    n_subj, n_model = lme.shape
+    prior = np.full(n_model, float(alpha0))
+    alpha = prior.copy()
+    for i in range(max_iter):
+        elogr = special.digamma(alpha) - special.digamma(alpha.sum())
+        log_u = lme + elogr
+        g = np.exp(log_u - special.logsumexp(log_u, axis=1, keepdims=True))
+        alpha_new = prior + g.sum(axis=0)
+        converged = np.max(np.abs(alpha_new - alpha)) < tol
+        alpha = alpha_new
+        if converged:
+            break
+
+    # free energy under the random-effects and null models
+    elogr = special.digamma(alpha) - special.digamma(alpha.sum())
+    g = np.exp(lme + elogr - special.logsumexp(lme + elogr, axis=1, keepdims=True))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = -np.nansum(g * np.log(g))
+    neg_kl = (
+        special.gammaln(prior.sum())
+        - special.gammaln(prior).sum()
+        - special.gammaln(alpha.sum())
+        + special.gammaln(alpha).sum()
+        + np.sum((prior - alpha) * elogr)
+    )
+    f1 = np.sum(g * (lme + elogr)) + entropy + neg_kl
+    f0 = np.sum(special.logsumexp(lme, axis=1) - np.log(n_model))
+    bor = float(special.expit(f0 - f1))
+    return alpha, g, bor
+
+
+def exceedance_prob(alpha, n_sample=100000, seed=None, chunk_size=10000):
+    """
+    Probability that each model is the most frequent in the population.
+
+    Parameters
+    ----------
+    alpha : numpy.ndarray
+        Dirichlet concentration for each model.
+
+    n_sample : int, optional
+        Number of samples from the Dirichlet distribution.
+
+    seed : int or numpy.random.Generator, optional
+        Seed for sampling.
+
+    chunk_size : int, optional
+        Number of samples to draw at once.
+
+    Returns
+    -------
+    xp : numpy.ndarray
+        Exceedance probability of each model.
+    """
+    rng = np.random.default_rng(seed)
+    wins = np.zeros(len(alpha), int)
+    for start in range(0, n_sample, chunk_size):
+        n = min(chunk_size, n_sample - start)
+        r = rng.dirichlet(alpha, size=n)
+        wins += np.bincount(np.argmax(r, axis=1), minlength=len(alpha))
+    return wins / n_sample
+
+
+def compare_models(
+    res, stat='aic', models=None, n_boot=10000, n_sample=100000, ci=95, seed=None
+):
+    """
+    Compare a set of models fit to the same subjects.
+
+    Parameters
+    ----------
+    res : pandas.DataFrame
+        Results indexed by model and subject. For AIC, must include
+        :code:`logl`, :code:`n`, and :code:`k`, as from read_model_fits.
+        For cross-validation, must include :code:`logl_test`, as from
+        read_model_xvals; test log likelihood is summed over folds.
+
+    stat : {'aic', 'xval'}, optional
+        Statistic to compare models on.
+
+    models : list of str, optional
+        Order of models. Default is the order of first appearance.
+
+    n_boot : int, optional
+        Number of bootstrap resamples of subjects.
+
+    n_sample : int, optional
+        Number of Dirichlet samples for exceedance probability.
+
+    ci : float, optional
+        Width of bootstrap confidence intervals, in percent.
+
+    seed : int or numpy.random.SeedSequence, optional
+        Seed for resampling.
+
+    Returns
+    -------
+    comp : pandas.DataFrame
+        For each model, the mean statistic (AIC or test log likelihood)
+        and mean difference from the best model with bootstrap
+        confidence limits; for AIC, the mean Akaike weight with
+        confidence limits; and the expected population frequency
+        (:code:`freq`), exceedance probability (:code:`xp`), and
+        protected exceedance probability (:code:`pxp`) from
+        random-effects Bayesian model selection.
+    """
+    if stat == 'aic':
+        logl, subjects, models = stat_matrix(res, 'logl', models)
+        n, _, _ = stat_matrix(res, 'n', models)
+        k, _, _ = stat_matrix(res, 'k', models)
+        value, weight = information_criteria(logl, n, k)
+        lme = -value / 2
+        diff = value - value[:, [np.argmin(value.mean(axis=0))]]
+    elif stat == 'xval':
+        value, subjects, models = stat_matrix(res, 'logl_test', models)
+        weight = None
+        lme = value
+        diff = logl_diff(value)
+    else:
+        raise ValueError(f'Invalid stat: {stat}')
+    if np.isnan(value).any():
+        raise ValueError(f'Missing {stat} results for some subjects and models.')
+
+    # bootstrap over subjects; all statistics use the same resamples
+    seed = np.random.SeedSequence(seed)
+    boot_seed, xp_seed = seed.spawn(2)
+    arrays = [value, diff] if weight is None else [value, diff, weight]
+    boot = bootstrap_mean(np.hstack(arrays), n_boot, np.random.default_rng(boot_seed))
+    boot = np.split(boot, len(arrays), axis=1)
+    names = ['aic' if stat == 'aic' else 'logl_test', 'diff', 'waic']
+    comp = pd.DataFrame(index=pd.Index(models, name='model'))
+    for name, array, array_boot in zip(names, arrays, boot):
+        lower, upper = percentile_ci(array_boot, ci)
+        comp[name] = array.mean(axis=0)
+        comp[f'{name}_lower'] = lower
+        comp[f'{name}_upper'] = upper
+
+    # random-effects model selection
+    alpha, _, bor = bms(lme)
+    xp = exceedance_prob(alpha, n_sample, np.random.default_rng(xp_seed))
+    comp['freq'] = alpha / alpha.sum()
+    comp['xp'] = xp
+    comp['pxp'] = (1 - bor) * xp + bor / len(models)
+    comp.attrs['bor'] = bor
+    comp.attrs['n_subject'] = len(subjects)
+    return comp
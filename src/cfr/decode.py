@@ -11,6 +11,7 @@ from sklearn import svm
 from sklearn import model_selection as ms
 import sklearn.linear_model as lm
 from sklearn import preprocessing
+from sklearn import multiclass
 from sklearn.base import BaseEstimator, ClassifierMixin
 from sklearn.utils.validation import check_X_y, check_array, check_is_fitted
 from sklearn.utils.multiclass import unique_labels
@@ -211,7 +212,12 @@ def classify_patterns(
     if clf == 'svm':
         clf = svm.SVC(probability=True, C=C)
     elif clf == 'logreg':
-        clf = lm.LogisticRegression(max_iter=1000, multi_class=multi_class, C=C)
+        # multi_class was removed from scikit-learn; lbfgs is multinomial
+        clf = lm.LogisticRegression(max_iter=1000, C=C)
+        if multi_class == 'ovr':
+            clf = multiclass.OneVsRestClassifier(clf)
+        elif multi_class not in ['auto', 'multinomial']:
+            raise ValueError(f'Unknown multi-class method: {multi_class}')
     elif clf == 'plogreg':
         clf = LogReg(l=1 / C, max_iter=1000)
     else:
@@ -454,7 +460,7 @@ def _decode_context_subject(
     param_def = cmr.read_config(config_file)
 
     logger.info(f'Loading model patterns from {patterns_file}.')
-    patterns = cmr.load_patterns(patterns_file)
+    patterns = task.load_patterns(patterns_file)
 
     logger.info('Recording network states.')
     model = cmr.CMR()
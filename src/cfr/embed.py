@@ -0,0 +1,257 @@
+"""Embed item names as vectors and write them as model patterns."""
+
+import os
+import hashlib
+import numpy as np
+from scipy import stats
+import h5py
+from cfr import task
+
+USE_URL = "https://tfhub.dev/google/universal-sentence-encoder/4"
+
+
+class HashingEncoder:
+    """
+    Deterministic encoder based on hashed character n-grams.
+
+    Does not capture meaning, but is fast and has no dependencies, so
+    it can stand in for a language model when testing.
+
+    Parameters
+    ----------
+    n_dim : int, optional
+        Number of dimensions of the embedding.
+
+    n : int, optional
+        Length of character n-grams.
+    """
+
+    def __init__(self, n_dim=512, n=3):
+        self.n_dim = n_dim
+        self.n = n
+        self.name = f'hash-{n_dim}-{n}'
+
+    def _tokens(self, item):
+        text = f' {item.lower()} '
+        words = item.lower().split()
+        grams = [text[i : i + self.n] for i in range(len(text) - self.n + 1)]
+        return words + grams
+
+    def __call__(self, items):
+        vectors = np.zeros((len(items), self.n_dim), dtype=np.float32)
+        for i, item in enumerate(items):
+            for token in self._tokens(item):
+                digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+                code = int.from_bytes(digest, 'little')
+                sign = 1 if code & 1 else -1
+                vectors[i, (code >> 1) % self.n_dim] += sign
+        norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norm[norm == 0] = 1
+        return vectors / norm
+
+
+class HubEncoder:
+    """
+    TensorFlow Hub encoder, such as the Universal Sentence Encoder.
+
+    Parameters
+    ----------
+    model : str, optional
+        Path to a saved model, or URL of a model to download.
+    """
+
+    def __init__(self, model=USE_URL):
+        try:
+            import tensorflow_hub as hub
+        except ModuleNotFoundError:
+            raise ImportError('TensorflowHub must be installed to run embedding.')
+        self.name = model.rstrip('/') if '://' in model else os.path.abspath(model)
+        self.embed = hub.load(model)
+
+    def __call__(self, items):
+        return self.embed(list(items)).numpy()
+
+
+def get_encoder(encoder):
+    """
+    Get an encoder by name.
+
+    Parameters
+    ----------
+    encoder : str
+        'hash' for a HashingEncoder; otherwise, a path or URL to a
+        TensorFlow Hub model.
+
+    Returns
+    -------
+    encoder : callable
+        Encoder that takes a list of items and returns an
+        [items x dimensions] array. Has a name attribute that
+        identifies the encoder in caches.
+    """
+    if encoder == 'hash':
+        return HashingEncoder()
+    return HubEncoder(encoder)
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of item vectors from an encoder.
+
+    Vectors are stored in an HDF5 file and appended as new items are
+    embedded.
+
+    Parameters
+    ----------
+    h5_file : str
+        Path to the cache file. Created if it does not exist.
+
+    encoder_name : str
+        Name of the encoder that produced the cached vectors. Used to
+        check that a cache is not reused with a different encoder.
+    """
+
+    def __init__(self, h5_file, encoder_name):
+        self.h5_file = h5_file
+        self.encoder_name = encoder_name
+        self.index = {}
+        if os.path.exists(h5_file):
+            with h5py.File(h5_file, 'r') as f:
+                cached_name = f.attrs['encoder']
+                if cached_name != encoder_name:
+                    raise ValueError(
+                        f'Cache {h5_file} is for encoder {cached_name}, '
+                        f'not {encoder_name}.'
+                    )
+                items = f['items'].asstr()[()]
+            self.index = {item: i for i, item in enumerate(items)}
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, items):
+        """Get vectors for cached items."""
+        ind = np.array([self.index[item] for item in items], dtype=int)
+        with h5py.File(self.h5_file, 'r') as f:
+            vectors = f['vectors']
+            if len(ind) == 0:
+                return np.zeros((0, vectors.shape[1]), dtype=vectors.dtype)
+            # HDF5 fancy indexing requires increasing indices
+            order = np.argsort(ind)
+            sorted_vectors = vectors[ind[order]]
+        out = np.empty_like(sorted_vectors)
+        out[order] = sorted_vectors
+        return out
+
+    def add(self, items, vectors):
+        """Add vectors for new items."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with h5py.File(self.h5_file, 'a') as f:
+            if 'items' not in f:
+                f.attrs['encoder'] = self.encoder_name
+                f.create_dataset(
+                    'items', (0,), maxshape=(None,), dtype=h5py.string_dtype()
+                )
+                f.create_dataset(
+                    'vectors',
+                    (0, vectors.shape[1]),
+                    maxshape=(None, vectors.shape[1]),
+                    dtype=np.float32,
+                    chunks=True,
+                )
+            start = f['items'].shape[0]
+            stop = start + len(items)
+            f['items'].resize((stop,))
+            f['vectors'].resize((stop, vectors.shape[1]))
+            f['items'][start:stop] = items
+            f['vectors'][start:stop] = vectors
+        for i, item in enumerate(items):
+            self.index[item] = start + i
+
+
+def embed_items(items, encoder, cache_file=None, batch_size=256):
+    """
+    Embed items, using cached vectors where available.
+
+    Parameters
+    ----------
+    items : list of str
+        Items to embed.
+
+    encoder : callable
+        Encoder that takes a list of items and returns an
+        [items x dimensions] array, as from get_encoder.
+
+    cache_file : str, optional
+        Path to a persistent cache. Only items missing from the cache
+        are embedded, and new vectors are added to the cache after each
+        batch.
+
+    batch_size : int, optional
+        Number of items to embed at once.
+
+    Returns
+    -------
+    vectors : numpy.ndarray
+        [items x dimensions] array of vectors.
+    """
+    items = list(items)
+    if cache_file is None:
+        batches = range(0, len(items), batch_size)
+        return np.vstack([encoder(items[i : i + batch_size]) for i in batches])
+
+    cache = EmbeddingCache(cache_file, encoder.name)
+    new_items = list(dict.fromkeys(item for item in items if item not in cache))
+    for i in range(0, len(new_items), batch_size):
+        batch = new_items[i : i + batch_size]
+        cache.add(batch, encoder(batch))
+    return cache.get(items)
+
+
+def embed_patterns(
+    h5_file, items, encoder, cache_file=None, batch_size=256, block_size=1024
+):
+    """
+    Embed items and write localist, category, and semantic patterns.
+
+    Parameters
+    ----------
+    h5_file : str
+        Path to hdf5 file to save patterns in.
+
+    items : list of str
+        Items to embed.
+
+    encoder : callable
+        Encoder to embed items with, as from get_encoder.
+
+    cache_file : str, optional
+        Path to a persistent cache of item vectors.
+
+    batch_size : int, optional
+        Number of items to embed at once.
+
+    block_size : int, optional
+        Number of rows of similarity matrices to calculate at once.
+
+    Returns
+    -------
+    vectors : numpy.ndarray
+        [items x dimensions] array of raw embedding vectors.
+    """
+    vectors = embed_items(items, encoder, cache_file, batch_size)
+    loc_patterns = task.IndexPattern.identity(len(items))
+    cat_patterns = task.IndexPattern.one_hot(np.zeros(len(items), int))
+    use_z = stats.zscore(vectors, axis=1) / np.sqrt(vectors.shape[1])
+    task.save_patterns(
+        h5_file,
+        items,
+        block_size=block_size,
+        loc=loc_patterns,
+        cat=cat_patterns,
+        use=use_z,
+    )
+    return vectors
@@ -2,18 +2,106 @@
 
 import os
 from pathlib import Path
+import re
+import ast
 import json
+import hashlib
+import numbers
 import logging
+import time
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from itertools import combinations
 from pkg_resources import resource_filename
 import numpy as np
+from scipy import optimize
 import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
 import click
 from cymr import cmr
 from cymr import fit
 from psifr import fr
 from cymr.cmr import CMRParameters
 from cfr import task
+from cfr import profiling
+
+
+def _split_terms(node, features):
+    """Split an expression node into (factors, feature) terms."""
+    names = {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+    if not names & set(features):
+        # no patterns in this branch; treat as a scalar factor
+        return [([ast.unparse(node)], None)]
+
+    if isinstance(node, ast.Name):
+        return [([], node.id)]
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        terms = _split_terms(node.operand, features)
+        return [(['-1'] + factors, feature) for factors, feature in terms]
+
+    if isinstance(node, ast.BinOp):
+        left = _split_terms(node.left, features)
+        if isinstance(node.op, ast.Add):
+            return left + _split_terms(node.right, features)
+        elif isinstance(node.op, ast.Sub):
+            right = _split_terms(node.right, features)
+            return left + [(['-1'] + factors, feature) for factors, feature in right]
+        elif isinstance(node.op, ast.Mult):
+            right = _split_terms(node.right, features)
+            terms = []
+            for l_factors, l_feature in left:
+                for r_factors, r_feature in right:
+                    if l_feature is not None and r_feature is not None:
+                        raise ValueError('Product of patterns is not linear.')
+                    feature = l_feature if l_feature is not None else r_feature
+                    terms.append((l_factors + r_factors, feature))
+            return terms
+        elif isinstance(node.op, ast.Div):
+            right = _split_terms(node.right, features)
+            if len(right) != 1 or right[0][1] is not None:
+                raise ValueError('Division by a pattern is not linear.')
+            divisor = f'1 / ({right[0][0][0]})'
+            return [(factors + [divisor], feature) for factors, feature in left]
+    raise ValueError(f'Unsupported pattern expression: {ast.unparse(node)}')
+
+
+def linear_weight_terms(expr, features):
+    """
+    Decompose a weight expression into a linear basis of patterns.
+
+    Parameters
+    ----------
+    expr : str
+        Expression defining the weights of one region.
+
+    features : list of str
+        Names of patterns that may be referenced in the expression.
+
+    Returns
+    -------
+    terms : list of (str, str) or None
+        Scaling expression and pattern name for each term. A pattern
+        name of None indicates a constant added to all weights. If the
+        expression is not a weighted sum of patterns, returns None.
+
+    Examples
+    --------
+    >>> from cfr.framework import linear_weight_terms
+    >>> linear_weight_terms('Aff + Dff * (s_loc * loc + s_cat * cat)', ['loc', 'cat'])
+    [('Aff', None), ('Dff * s_loc', 'loc'), ('Dff * s_cat', 'cat')]
+    """
+    try:
+        tree = ast.parse(expr, mode='eval')
+        split = _split_terms(tree.body, features)
+    except (SyntaxError, ValueError):
+        return None
+
+    terms = [(' * '.join(factors) or '1', feature) for factors, feature in split]
+    if all(feature is None for _, feature in terms):
+        return None
+    return terms
 
 
 class WeightParameters(CMRParameters):
@@ -60,6 +148,157 @@ class WeightParameters(CMRParameters):
         probability by output position. [0, Inf]
     """
 
+    def __init__(self):
+        super().__init__()
+        self._basis = {}
+        self._buffers = {}
+
+    def set_weights(self, connect, regions):
+        """Set weights on model patterns."""
+        super().set_weights(connect, regions)
+        self._basis = {}
+
+    def weight_basis(self, patterns):
+        """
+        Linear basis representation of each weight matrix.
+
+        Parameters
+        ----------
+        patterns : dict of str: (dict of str: numpy.ndarray)
+            Patterns that weight expressions may reference.
+
+        Returns
+        -------
+        basis : dict of str: (dict of region: list)
+            For each connection and region, a list of (scaling
+            expression, pattern name) terms. Regions that cannot be
+            expressed as a weighted sum of patterns are None.
+        """
+        basis = {}
+        for connect, regions in self.weights.items():
+            layer_type = 'similarity' if connect == 'ff' else 'vector'
+            features = list(patterns[layer_type].keys())
+            basis[connect] = {
+                region: linear_weight_terms(expr, features)
+                for region, expr in regions.items()
+            }
+        return basis
+
+    def _compiled_basis(self, connect, region, features):
+        """Get compiled scaling expressions for a weight region."""
+        key = (connect, region, tuple((f, np.shape(m)) for f, m in features.items()))
+        if key not in self._basis:
+            terms = linear_weight_terms(self.weights[connect][region], list(features))
+            if terms is not None:
+                terms = [
+                    (compile(coef, '<weight>', 'eval'), feature)
+                    for coef, feature in terms
+                ]
+            self._basis[key] = terms
+        return self._basis[key]
+
+    def _get_buffers(self, key, shape):
+        """Get preallocated output and scratch arrays for a region."""
+        if key not in self._buffers or self._buffers[key][0].shape != shape:
+            self._buffers[key] = (np.empty(shape), np.empty(shape))
+        return self._buffers[key]
+
+    def eval_weights(self, patterns, param=None, item_index=None):
+        """
+        Evaluate weights based on parameters and patterns.
+
+        Weights that are a weighted sum of patterns are calculated from
+        a linear basis, with scaled patterns added into a preallocated
+        buffer. Other weights are evaluated from their expressions. The
+        basis is cached for each set of pattern names and shapes.
+
+        Returned basis weights are views of buffers that are
+        overwritten by the next call with the same region and shape.
+        Callers must not keep them; copy any weights that need to
+        persist.
+
+        Parameters
+        ----------
+        patterns : dict of str: (dict of str: numpy.ndarray)
+            Patterns to use when evaluating weights.
+
+        param : dict, optional
+            Parameters to use when evaluating weights.
+
+        item_index : numpy.ndarray, optional
+            Item indices to include in the patterns.
+
+        Returns
+        -------
+        weights : dict of str: (dict of str: numpy.ndarray)
+            Weight matrices for each region in each connection matrix.
+        """
+        if param is None:
+            return super().eval_weights(patterns, param, item_index)
+
+        weights = {}
+        for connect, regions in self.weights.items():
+            weights[connect] = {}
+            if connect in ['fc', 'cf']:
+                layer_type = 'vector'
+            elif connect == 'ff':
+                layer_type = 'similarity'
+            else:
+                raise ValueError(f'Invalid connection: {connect}.')
+            features = patterns[layer_type]
+
+            # slice each pattern once for all regions
+            sliced = {}
+
+            def get_pattern(feature):
+                if feature not in sliced:
+                    mat = features[feature]
+                    if item_index is None:
+                        sliced[feature] = np.asarray(mat)
+                    elif layer_type == 'vector':
+                        sliced[feature] = mat[item_index, :]
+                    else:
+                        sliced[feature] = mat[np.ix_(item_index, item_index)]
+                return sliced[feature]
+
+            for region, expr in regions.items():
+                terms = self._compiled_basis(connect, region, features)
+                coefs = None
+                if terms is not None:
+                    coefs = [eval(code, np.__dict__, param) for code, _ in terms]
+                    if any(np.ndim(c) != 0 for c in coefs):
+                        coefs = None
+
+                if coefs is None:
+                    # general expression evaluation
+                    data = {f: get_pattern(f) for f in features.keys()}
+                    data.update(param)
+                    weights[connect][region] = eval(expr, np.__dict__, data)
+                    continue
+
+                # fused scaled addition of basis patterns
+                mats = [
+                    get_pattern(feature) if feature is not None else None
+                    for _, feature in terms
+                ]
+                shape = next(m.shape for m in mats if m is not None)
+                out, scratch = self._get_buffers((connect, region), shape)
+                first = True
+                for c, mat in zip(coefs, mats):
+                    if mat is None:
+                        continue
+                    if first:
+                        np.multiply(mat, c, out=out)
+                        first = False
+                    else:
+                        np.multiply(mat, c, out=scratch)
+                        out += scratch
+                for c, mat in zip(coefs, mats):
+                    if mat is None:
+                        out += c
+                weights[connect][region] = out
+        return weights
+
     def set_scaling_param(self, scaling_type, weights, upper=1):
         """
         Add scaling parameters for patterns or similarity.
@@ -338,6 +577,34 @@ def read_fit_param(fit_file):
     return param
 
 
+SEARCH_TRACE = [
+    'nit',
+    'nfev_global',
+    'time_global',
+    'logl_global',
+    'nfev_local',
+    'time_local',
+    'logl_local',
+]
+
+
+def get_best_results(results):
+    """Get best results from a repeated search, without search traces."""
+    best = fit.get_best_results(results)
+    return best.drop(columns=SEARCH_TRACE, errors='ignore')
+
+
+def read_init_param(fit_dir):
+    """Read best-fitting parameters of a related model to start a search."""
+    if fit_dir is None:
+        return None
+    fit_file = os.path.join(fit_dir, 'fit.csv')
+    if not os.path.exists(fit_file):
+        raise IOError(f'Fit file not found: {fit_file}')
+    logging.info(f'Initializing searches around parameters in {fit_file}.')
+    return read_fit_param(fit_file)
+
+
 def read_fit_weights(param_file):
     """Read weights from a parameters file."""
     with open(param_file, 'r') as f:
@@ -346,11 +613,8 @@ def read_fit_weights(param_file):
     return weights
 
 
-def read_model_spec(def_file):
-    """Read model specification file as a series."""
-    with open(def_file, 'r') as f:
-        model_def = json.load(f)
-
+def spec_frame(model_def):
+    """Convert a model definition to a frame of parameter values and kinds."""
     value = {**model_def['fixed'], **model_def['free'], **model_def['dependent']}
     kind = {}
     for par in model_def['fixed'].keys():
@@ -364,39 +628,199 @@ def read_model_spec(def_file):
     return df.T
 
 
-def read_model_specs(fit_dir, models, model_names=None):
-    """Read model definitions for multiple models."""
+def read_model_spec(def_file):
+    """Read model specification file as a series."""
+    with open(def_file, 'r') as f:
+        model_def = json.load(f)
+    return spec_frame(model_def)
+
+
+SPEC_FILES = ['parameters.json', 'xval_parameters.json']
+INDEX_TABLES = {'fit': 'fit.csv', 'xval': 'xval.csv'}
+
+
+def _scan_files(model_dir):
+    """Get size and modification time of files in a directory."""
+    files = {}
+    with os.scandir(model_dir) as it:
+        for entry in it:
+            if entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = [stat.st_size, stat.st_mtime]
+    return files
+
+
+def _index_model(model_dir, files, prev=None):
+    """Index the spec and result tables of one model directory."""
+    entry = {'files': files}
+    for name in SPEC_FILES:
+        if name in files:
+            entry['spec_file'] = name
+            break
+    for key, name in [('spec', entry.get('spec_file')), *INDEX_TABLES.items()]:
+        if name not in files:
+            continue
+        if prev is not None and key in prev and prev['files'].get(name) == files[name]:
+            # unchanged since last indexed
+            entry[key] = prev[key]
+            continue
+
+        file_path = os.path.join(model_dir, name)
+        if key == 'spec':
+            with open(file_path, 'r') as f:
+                model_def = json.load(f)
+            entry[key] = {k: model_def[k] for k in ['fixed', 'free', 'dependent']}
+        else:
+            entry[key] = pd.read_csv(file_path).to_dict(orient='split', index=False)
+    return entry
+
+
+def index_fit_dir(fit_dir, index_file=None):
+    """
+    Index model specifications and results in a fit directory.
+
+    Each model directory is scanned once to record its files with
+    their sizes and modification times. Model specifications and fit
+    and cross-validation results are stored in the index, so they can
+    be read without accessing each model directory. If an index already
+    exists, files that have not changed are not read again.
+
+    Parameters
+    ----------
+    fit_dir : str
+        Path to a directory with model subdirectories.
+
+    index_file : str, optional
+        Path to the index file to write. Default is
+        :code:`fit_index.json` in the fit directory.
+
+    Returns
+    -------
+    index : dict
+        Index of all model directories.
+    """
+    if index_file is None:
+        index_file = os.path.join(fit_dir, 'fit_index.json')
+    prev_models = {}
+    if os.path.exists(index_file):
+        prev_models = read_fit_index(fit_dir, index_file)['models']
+
+    models = {}
+    with os.scandir(fit_dir) as it:
+        model_dirs = sorted(entry.path for entry in it if entry.is_dir())
+    for model_dir in model_dirs:
+        model = os.path.basename(model_dir)
+        files = _scan_files(model_dir)
+        models[model] = _index_model(model_dir, files, prev_models.get(model))
+    index = {
+        'fit_dir': os.path.abspath(fit_dir),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'models': models,
+    }
+    with open(index_file, 'w') as f:
+        json.dump(index, f)
+    return index
+
+
+def read_fit_index(fit_dir, index_file=None):
+    """Read an index written by index_fit_dir."""
+    if index_file is None:
+        index_file = os.path.join(fit_dir, 'fit_index.json')
+    if not os.path.exists(index_file):
+        raise IOError(f'Fit index not found: {index_file}')
+    with open(index_file, 'r') as f:
+        index = json.load(f)
+    return index
+
+
+def _indexed_model(index, model, key):
+    """Get indexed information for a model."""
+    entry = index['models'].get(model)
+    if entry is None or key not in entry:
+        name = 'parameters.json' if key == 'spec' else INDEX_TABLES[key]
+        raise IOError(f'File not found in fit index: {model}/{name}')
+    return entry[key]
+
+
+def read_model_specs(fit_dir, models, model_names=None, index=None):
+    """
+    Read model definitions for multiple models.
+
+    If index is specified, definitions are read from a fit index
+    instead of each model directory. Pass an index from
+    read_fit_index, or True to read the index in the fit directory.
+    """
     if model_names is None:
         model_names = models
+    if index is True:
+        index = read_fit_index(fit_dir)
 
-    spec_list = []
-    for model in models:
-        spec_file = os.path.join(fit_dir, model, 'parameters.json')
-        if not os.path.exists(spec_file):
-            spec_file = os.path.join(fit_dir, model, 'xval_parameters.json')
+    rows = []
+    for model, model_name in zip(models, model_names):
+        if index is not None:
+            model_def = _indexed_model(index, model, 'spec')
+        else:
+            spec_file = os.path.join(fit_dir, model, 'parameters.json')
             if not os.path.exists(spec_file):
-                raise IOError(f'Parameters file not found: {spec_file}')
-        spec = read_model_spec(spec_file)
-        spec_list.append(spec)
-    model_defs = pd.concat(spec_list, keys=model_names)
-    model_defs.index.rename(['model', 'param'], inplace=True)
+                spec_file = os.path.join(fit_dir, model, 'xval_parameters.json')
+                if not os.path.exists(spec_file):
+                    raise IOError(f'Parameters file not found: {spec_file}')
+            with open(spec_file, 'r') as f:
+                model_def = json.load(f)
+
+        # same order as spec_frame
+        for kind in ['fixed', 'free', 'dependent']:
+            for param, value in model_def[kind].items():
+                rows.append((model_name, param, value, kind))
+    model_index = pd.MultiIndex.from_tuples(
+        [row[:2] for row in rows], names=['model', 'param']
+    )
+    model_defs = pd.DataFrame(
+        [row[2:] for row in rows],
+        index=model_index,
+        columns=['value', 'kind'],
+        dtype=object,
+    )
     return model_defs
 
 
-def read_model_fits(fit_dir, models, model_names=None, param_map=None):
-    """Read fit results for multiple models."""
+def _read_model_tables(fit_dir, models, model_names, key, index):
+    """Read result tables for multiple models, indexed by model and subject."""
     if model_names is None:
         model_names = models
-
-    res_list = []
-    for model in models:
-        fit_file = os.path.join(fit_dir, model, 'fit.csv')
-        res_model = pd.read_csv(fit_file)
-        res_list.append(res_model)
-    res = pd.concat(res_list, axis=0, keys=model_names)
-    res = res.reset_index(level=1, drop=True)
+    if index is True:
+        index = read_fit_index(fit_dir)
+
+    if index is not None:
+        # build one frame from all indexed rows
+        records = []
+        model_index = []
+        for model, model_name in zip(models, model_names):
+            table = _indexed_model(index, model, key)
+            columns = table['columns']
+            records.extend(dict(zip(columns, row)) for row in table['data'])
+            model_index.extend([model_name] * len(table['data']))
+        res = pd.DataFrame.from_records(records, index=pd.Index(model_index))
+    else:
+        res_list = []
+        for model in models:
+            file_path = os.path.join(fit_dir, model, INDEX_TABLES[key])
+            res_list.append(pd.read_csv(file_path))
+        res = pd.concat(res_list, axis=0, keys=model_names)
+        res = res.reset_index(level=1, drop=True)
     res.index.rename('model', inplace=True)
     res = res.set_index('subject', append=True)
+    return res
+
+
+def read_model_fits(fit_dir, models, model_names=None, param_map=None, index=None):
+    """
+    Read fit results for multiple models.
+
+    If index is specified, results are read from a fit index; see
+    read_model_specs.
+    """
+    res = _read_model_tables(fit_dir, models, model_names, 'fit', index)
 
     # map overall parameters to subset parameters
     if param_map is not None:
@@ -408,43 +832,224 @@ def read_model_fits(fit_dir, models, model_names=None, param_map=None):
     return res
 
 
-def read_model_xvals(fit_dir, models, model_names=None):
-    """Read cross-validation results for multiple models."""
-    if model_names is None:
-        model_names = models
+def read_model_xvals(fit_dir, models, model_names=None, index=None):
+    """
+    Read cross-validation results for multiple models.
 
-    res_list = []
-    for model in models:
-        fit_file = os.path.join(fit_dir, model, 'xval.csv')
-        res_model = pd.read_csv(fit_file)
-        res_list.append(res_model)
-    res = pd.concat(res_list, axis=0, keys=model_names)
-    res = res.reset_index(level=1, drop=True)
-    res.index.rename('model', inplace=True)
-    res = res.set_index('subject', append=True)
-    return res
+    If index is specified, results are read from a fit index; see
+    read_model_specs.
+    """
+    return _read_model_tables(fit_dir, models, model_names, 'xval', index)
+
+
+@click.command()
+@click.argument("fit_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--index-file", "-o", help="index file (default: FIT_DIR/fit_index.json)")
+def index_fits(fit_dir, index_file):
+    """Index model specs and results in a fit directory."""
+    start = time.perf_counter()
+    index = index_fit_dir(fit_dir, index_file)
+    n_spec = sum('spec' in entry for entry in index['models'].values())
+    print(
+        f'Indexed {len(index["models"])} model directories ({n_spec} with specs) '
+        f'in {time.perf_counter() - start:.2f} s.'
+    )
+
+
+def find_sim_file(model_dir):
+    """Find the most recent simulated data file in a model directory."""
+    sim_files = [
+        os.path.join(model_dir, f'sim.{ext}')
+        for ext in ['npz', 'csv']
+        if os.path.exists(os.path.join(model_dir, f'sim.{ext}'))
+    ]
+    if not sim_files:
+        raise IOError(f'Simulation file not found in: {model_dir}')
+    return max(sim_files, key=os.path.getmtime)
+
+
+class SourceData:
+    """
+    Free recall data from multiple sources, loaded on demand.
+
+    Presents data from models and observed data as if concatenated
+    with a (source, trial) index, but reads each source only when it is
+    needed, so statistics can be calculated one source at a time.
+
+    Parameters
+    ----------
+    files : dict of (str: str or pandas.DataFrame)
+        Data file (or data) for each source, in order.
+
+    block, block_category : bool, optional
+        Label category blocks when reading data; see read_free_recall.
+
+    cache_size : int, optional
+        Number of loaded sources to keep in memory, with the least
+        recently used source dropped first. By default, sources are
+        read each time they are used.
+
+    Examples
+    --------
+    >>> data = SourceData({'Model': 'sim.npz', 'Data': 'data.csv'})
+    >>> spc = data.groupby('source').apply(fr.spc)
+    """
+
+    def __init__(self, files, block=False, block_category=False, cache_size=0):
+        self.files = dict(files)
+        self.block = block
+        self.block_category = block_category
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def names(self):
+        """Names of all sources."""
+        return list(self.files.keys())
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, name):
+        """Get data for one source."""
+        if name not in self.files:
+            raise KeyError(f'Unknown source: {name}')
+        if name in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(name)
+            return self._cache[name]
+
+        self.misses += 1
+        data = task.read_free_recall(
+            self.files[name], block=self.block, block_category=self.block_category
+        )
+        data.index.rename('trial', inplace=True)
+        if self.cache_size > 0:
+            self._cache[name] = data
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return data
+
+    def __iter__(self):
+        """Iterate over (source, data) pairs, as in a groupby."""
+        for name in self.names:
+            yield name, self[name]
+
+    def groupby(self, by, sort=True):
+        """Group by source; only grouping by source is supported."""
+        if by != 'source' and by != ['source']:
+            raise ValueError('Source data can only be grouped by source.')
+        return _SourceGroupBy(self, sort)
+
+    def apply(self, func, *args, names=None, **kwargs):
+        """
+        Apply a function to each source in turn.
+
+        Parameters
+        ----------
+        func : callable
+            Function that takes data for one source and returns a
+            DataFrame or Series. Additional arguments are passed to
+            the function.
+
+        names : list of str, optional
+            Sources to include, in order. Default is all sources.
+
+        Returns
+        -------
+        result : pandas.DataFrame or pandas.Series
+            Results for all sources, indexed by source, as from
+            calling groupby('source').apply on the concatenated data.
+        """
+        if names is None:
+            names = self.names
+        results = [func(self[name], *args, **kwargs) for name in names]
+        return pd.concat(results, keys=names, names=['source'])
+
+    def to_frame(self):
+        """Concatenate data from all sources."""
+        data = pd.concat([self[name] for name in self.names], keys=self.names)
+        data.index.rename(['source', 'trial'], inplace=True)
+        return data
+
+    def clear_cache(self):
+        """Drop all loaded sources from memory."""
+        self._cache.clear()
+
+
+class _SourceGroupBy:
+    """Grouping of source data, for groupby('source').apply."""
+
+    def __init__(self, source_data, sort=True):
+        self.source_data = source_data
+        self.names = source_data.names
+        if sort:
+            self.names = sorted(self.names)
+
+    def apply(self, func, *args, **kwargs):
+        return self.source_data.apply(func, *args, names=self.names, **kwargs)
+
+    def __iter__(self):
+        for name in self.names:
+            yield name, self.source_data[name]
 
 
 def read_model_sims(
-    data_file, fit_dir, models, model_names=None, block=False, block_category=False
+    data_file,
+    fit_dir,
+    models,
+    model_names=None,
+    block=False,
+    block_category=False,
+    lazy=False,
+    cache_size=0,
 ):
-    """Read simulated data for multiple models."""
+    """
+    Read simulated data for multiple models.
+
+    Parameters
+    ----------
+    data_file : str
+        Path to observed data.
+
+    fit_dir : str
+        Path to directory with model fits.
+
+    models : list of str
+        Model directories to read simulations from.
+
+    model_names : list of str, optional
+        Name of each model. Default is to use the directory names.
+
+    block, block_category : bool, optional
+        Label category blocks; see read_free_recall.
+
+    lazy : bool, optional
+        If true, return a SourceData object that reads each source
+        only when it is used, instead of reading all sources.
+
+    cache_size : int, optional
+        Number of sources to keep in memory when reading lazily.
+
+    Returns
+    -------
+    data : pandas.DataFrame or SourceData
+        Data for each model and the observed data (source "Data"),
+        indexed by source and trial.
+    """
     if model_names is None:
         model_names = models
 
-    data_list = []
-    obs_data = task.read_free_recall(
-        data_file, block=block, block_category=block_category
-    )
-    for model in models:
-        sim_file = os.path.join(fit_dir, model, 'sim.csv')
-        sim_data = task.read_free_recall(
-            sim_file, block=block, block_category=block_category
-        )
-        data_list.append(sim_data)
-    data_list.append(obs_data)
-    data = pd.concat(data_list, axis=0, keys=model_names + ['Data'])
-    data.index.rename(['source', 'trial'], inplace=True)
+    files = {
+        name: find_sim_file(os.path.join(fit_dir, model))
+        for model, name in zip(models, model_names)
+    }
+    files['Data'] = data_file
+    data = SourceData(files, block, block_category, cache_size)
+    if not lazy:
+        data = data.to_frame()
     return data
 
 
@@ -492,14 +1097,15 @@ def model_comp_weights(res, stat='aic'):
     else:
         raise ValueError(f'Invalid stat: {stat}')
 
-    # calculate statistic and place in a pivot table
+    # calculate statistic and place in a [subjects x models] array
     out[stat] = f_stat(res['logl'], res['n'], res['k'])
-    pivot_stat = out.reset_index().pivot(index='subject', columns='model', values=stat)
+    model_codes, models = pd.factorize(res.index.get_level_values('model'))
+    subject_codes, subjects = pd.factorize(res.index.get_level_values('subject'))
+    values = np.full((len(subjects), len(models)), np.nan)
+    values[subject_codes, model_codes] = out[stat].to_numpy()
 
     # calculate model weights
-    wstat = pivot_stat.copy()
-    wstat.iloc[:, :] = waic(pivot_stat.to_numpy())
-    out[f'w{stat}'] = wstat.unstack()
+    out[f'w{stat}'] = waic(values)[subject_codes, model_codes]
     return out
 
 
@@ -547,23 +1153,1069 @@ def apply_list_mask(data, mask):
     return masked
 
 
-def configure_model(
-    data_file,
-    patterns_file,
-    fcf_features,
-    ff_features,
-    intercept,
-    sublayers,
-    sublayer_param,
-    fixed_param,
-    include,
+def list_ranks(data):
+    """Rank of the list of each event within its subject, starting at 0."""
+    rank = data.groupby('subject')['list'].rank(method='dense')
+    return rank.to_numpy().astype(int) - 1
+
+
+def population_param(param_def, population, var_names=None):
+    """
+    Evaluate parameters for a population of free parameter sets.
+
+    Dependent parameters are evaluated once for the whole population
+    when their expressions support array inputs.
+
+    Parameters
+    ----------
+    param_def : cymr.parameters.Parameters
+        Parameter definitions.
+
+    population : numpy.ndarray
+        [parameters x candidates] array of free parameter values.
+
+    var_names : list of str, optional
+        Names of the parameters in each row of the population. Default
+        is the free parameters of param_def, in order.
+
+    Returns
+    -------
+    param_list : list of dict
+        Fixed, free, and dependent parameters for each candidate.
+    """
+    if var_names is None:
+        var_names = list(param_def.free.keys())
+    population = np.asarray(population, dtype=float)
+    n_cand = population.shape[1]
+    try:
+        param = param_def.fixed.copy()
+        param.update(dict(zip(var_names, population)))
+        param = param_def.eval_dependent(param)
+    except Exception:
+        # expressions that cannot take arrays are evaluated one at a time
+        param_list = []
+        for x in population.T:
+            cand = param_def.fixed.copy()
+            cand.update(dict(zip(var_names, x)))
+            param_list.append(param_def.eval_dependent(cand))
+        return param_list
+
+    param_list = []
+    for i in range(n_cand):
+        cand = {}
+        for name, val in param.items():
+            if np.ndim(val) == 1 and name not in param_def.fixed:
+                cand[name] = val[i]
+            else:
+                cand[name] = val
+        param_list.append(cand)
+    return param_list
+
+
+def map_fit_param(param, param_def):
+    """
+    Map fitted parameters from a related model onto free parameters.
+
+    Parameters
+    ----------
+    param : dict of (str: float)
+        Fitted parameters of a related model, including fixed, free,
+        and dependent parameters.
+
+    param_def : WeightParameters
+        Parameter definitions of the model to be fit.
+
+    Returns
+    -------
+    start : dict of (str: float)
+        Values for free parameters that could be matched. Values are
+        clipped to the bounds of each parameter.
+    """
+    # base parameters that sublayer parameters were copied from
+    base_param = {}
+    for sublayers in param_def.sublayer_param.values():
+        for sublayer, sub_param in sublayers.items():
+            for base, name in sub_param.items():
+                if isinstance(name, str):
+                    base_param[name] = base
+                    base_param[f'{name}_raw'] = base
+                    base_param[f'{base}_{sublayer}_raw'] = base
+
+    start = {}
+    for name, (lower, upper) in param_def.free.items():
+        if name in param and np.isfinite(param[name]):
+            val = param[name]
+        elif name in base_param and base_param[name] in param:
+            val = param[base_param[name]]
+        else:
+            # related model has separate sublayer values; use their mean
+            sub_vals = [
+                val for key, val in param.items() if re.match(rf'{name}_\w+_raw$', key)
+            ]
+            if not sub_vals:
+                sub_vals = [
+                    val
+                    for key, val in param.items()
+                    if re.match(rf'{name}_[A-Za-z0-9]+$', key)
+                ]
+            if not sub_vals:
+                continue
+            val = np.mean(sub_vals)
+        start[name] = float(np.clip(val, lower, upper))
+    return start
+
+
+def init_population(param_def, start, n_pop, spread=0.1, rng=None):
+    """
+    Sample a search population around starting parameters.
+
+    Parameters
+    ----------
+    param_def : cymr.parameters.Parameters
+        Parameter definitions with bounds of free parameters.
+
+    start : dict of (str: float)
+        Starting values of free parameters. The first member of the
+        population is placed at the start. Parameters without a
+        starting value are sampled uniformly within their bounds.
+
+    n_pop : int
+        Number of population members.
+
+    spread : float, optional
+        Standard deviation of samples around the start, as a fraction
+        of the range of each parameter.
+
+    rng : numpy.random.Generator, optional
+        Random number generator to use for sampling.
+
+    Returns
+    -------
+    population : numpy.ndarray
+        [members x parameters] array of initial parameter values.
+    """
+    rng = np.random.default_rng(rng)
+    n_pop = max(n_pop, 5)
+    var_names = list(param_def.free.keys())
+    population = np.empty((n_pop, len(var_names)))
+    for i, name in enumerate(var_names):
+        lower, upper = param_def.free[name]
+        if name in start:
+            samples = rng.normal(start[name], spread * (upper - lower), n_pop)
+            samples[0] = start[name]
+        else:
+            samples = rng.uniform(lower, upper, n_pop)
+        population[:, i] = np.clip(samples, lower, upper)
+    return population
+
+
+def restarts_converged(logl, n_converge, tol):
+    """Check if the best log likelihood has been reproduced by n searches."""
+    logl = np.asarray(logl, dtype=float)
+    if len(logl) < n_converge:
+        return False
+    n_best = np.count_nonzero(logl >= np.nanmax(logl) - tol)
+    return n_best >= n_converge
+
+
+class CFRModel(cmr.CMR):
+    """CMR model with search options used for CFR fits."""
+
+    def prepare_subjects(self, data, study_keys=None, recall_keys=None):
+        """
+        Convert data for each subject to list format.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            Data for all subjects.
+
+        study_keys : list of str, optional
+            Fields to include in study data.
+
+        recall_keys : list of str, optional
+            Fields to include in recall data.
+
+        Returns
+        -------
+        prepared : dict of (subject: tuple)
+            Study and recall data in list format, and the list number
+            of each list, for each subject.
+        """
+        prepared = {}
+        for subject, subject_data in data.groupby('subject'):
+            s_keys = None if study_keys is None else study_keys.copy()
+            r_keys = None if recall_keys is None else recall_keys.copy()
+            study, recall = self.prepare_sim(subject_data, s_keys, r_keys)
+
+            # merged data are split in list order
+            lists = np.sort(subject_data['list'].unique())
+            prepared[subject] = (study, recall, lists)
+        return prepared
+
+    def likelihood_lists(self, prepared, subj_param, param_def, patterns, lists):
+        """
+        Evaluate log likelihood for a subset of lists of prepared data.
+
+        Parameters
+        ----------
+        prepared : dict of (subject: tuple)
+            Data prepared by prepare_subjects.
+
+        subj_param : dict of (subject: dict of (str: float))
+            Parameters for each subject.
+
+        param_def : cymr.parameters.Parameters
+            Parameter definitions.
+
+        patterns : dict
+            Patterns to use in the model.
+
+        lists : dict of (subject: numpy.ndarray)
+            Numbers of lists to include for each subject.
+
+        Returns
+        -------
+        stats : pandas.DataFrame
+            Log likelihood (:code:`logl`) and number of data points
+            (:code:`n`) for each subject.
+        """
+        subjects = list(lists.keys())
+        logl = np.empty(len(subjects))
+        n = np.empty(len(subjects), int)
+        for i, subject in enumerate(subjects):
+            study, recall, subject_lists = prepared[subject]
+            index = np.flatnonzero(np.isin(subject_lists, lists[subject]))
+            study = {k: [v[j] for j in index] for k, v in study.items()}
+            recall = {k: [v[j] for j in index] for k, v in recall.items()}
+            param = param_def.eval_dependent(subj_param[subject])
+            param = param_def.eval_dynamic(param, study, recall)
+            logl[i], n[i] = self.likelihood_subject(
+                study, recall, param, param_def, patterns
+            )
+        stats = pd.DataFrame({'logl': logl, 'n': n}, index=subjects)
+        stats.index.rename('subject', inplace=True)
+        return stats
+
+    def prepare_lists(self, study, recall, param_def, patterns):
+        """
+        Prepare the items and patterns of each list of one subject.
+
+        If items are drawn from each list (the default scope), patterns
+        are sliced to the items of each list once, so they are not
+        sliced again each time a list is evaluated.
+
+        Parameters
+        ----------
+        study : dict of (str: list of numpy.array)
+            Information about the study phase in list format.
+
+        recall : dict of (str: list of numpy.array)
+            Information about recalled items in list format.
+
+        param_def : cymr.parameters.Parameters
+            Parameter definitions.
+
+        patterns : dict
+            Patterns to use in the model.
+
+        Returns
+        -------
+        lists : list of tuple
+            Patterns and pool, study, recall, and distraction item
+            indices for each list.
+        """
+        scope = param_def.options['scope']
+        item_index = np.arange(len(patterns['items']))
+        lists = []
+        for i in range(len(study['input'])):
+            item_pool, item_study, item_recall, item_distract = cmr.get_list_items(
+                item_index, study, recall, i, scope
+            )
+            list_patterns = patterns
+            if scope == 'list':
+                list_patterns = {'items': np.asarray(patterns['items'])[item_pool]}
+                if 'vector' in patterns:
+                    list_patterns['vector'] = {
+                        name: np.asarray(mat[item_pool, :])
+                        for name, mat in patterns['vector'].items()
+                    }
+                if 'similarity' in patterns:
+                    ind = np.ix_(item_pool, item_pool)
+                    list_patterns['similarity'] = {
+                        name: np.asarray(mat[ind])
+                        for name, mat in patterns['similarity'].items()
+                    }
+                item_pool = np.arange(len(item_pool))
+            lists.append(
+                (list_patterns, item_pool, item_study, item_recall, item_distract)
+            )
+        return lists
+
+    def likelihood_prepared(self, lists, param, param_def):
+        """
+        Log likelihood of one subject's data from prepared lists.
+
+        Parameters
+        ----------
+        lists : list of tuple
+            Lists prepared by prepare_lists.
+
+        param : dict of (str: float)
+            Parameters, with dynamic parameters already evaluated.
+
+        param_def : cymr.parameters.Parameters
+            Parameter definitions.
+
+        Returns
+        -------
+        logl : float
+            Total log likelihood.
+
+        n : int
+            Number of evaluated data points.
+        """
+        n_sub = len(param_def.sublayers['c'])
+        logl = 0
+        n = 0
+        for i, list_items in enumerate(lists):
+            list_patterns, item_pool, item_study, item_recall, item_distract = (
+                list_items
+            )
+            list_param = param_def.get_dynamic(param.copy(), i)
+            list_param = param_def.eval_dependent(list_param)
+            list_param = cmr.prepare_list_param(
+                len(item_study), n_sub, list_param, param_def, len(item_recall)
+            )
+            net = cmr.study_list(
+                param_def,
+                list_param,
+                item_pool,
+                item_study,
+                list_patterns,
+                item_distract,
+            )
+            p = net.p_recall(
+                ('task', 'item'),
+                item_recall,
+                net.c_sublayers,
+                list_param['B_rec'],
+                list_param['T'],
+                list_param['p_stop'],
+            )
+            n += p.size
+            if np.any(np.isnan(p)):
+                return np.nan, n
+            logl += np.sum(np.log(np.clip(p, 10e-6, 1)))
+        return logl, n
+
+    def likelihood_population(
+        self,
+        study,
+        recall,
+        population,
+        param_def,
+        patterns=None,
+        var_names=None,
+        lists=None,
+    ):
+        """
+        Log likelihood of one subject's data for a population of parameters.
+
+        Data and patterns are prepared once and shared by all
+        candidates, and dependent parameters are evaluated for the
+        whole population together where possible.
+
+        Parameters
+        ----------
+        study : dict of (str: list of numpy.array)
+            Information about the study phase in list format.
+
+        recall : dict of (str: list of numpy.array)
+            Information about recalled items in list format.
+
+        population : numpy.ndarray
+            [parameters x candidates] array of free parameter values.
+
+        param_def : cymr.parameters.Parameters
+            Parameter definitions.
+
+        patterns : dict, optional
+            Patterns to use in the model. Not needed if lists is
+            specified.
+
+        var_names : list of str, optional
+            Names of the parameters in each row of the population.
+
+        lists : list of tuple, optional
+            Lists prepared by prepare_lists. Prepared from study,
+            recall, and patterns if not specified.
+
+        Returns
+        -------
+        logl : numpy.ndarray
+            Log likelihood for each candidate.
+
+        n : numpy.ndarray
+            Number of evaluated data points for each candidate.
+        """
+        if lists is None:
+            lists = self.prepare_lists(study, recall, param_def, patterns)
+        param_list = population_param(param_def, population, var_names)
+        logl = np.empty(len(param_list))
+        n = np.empty(len(param_list), int)
+        for i, param in enumerate(param_list):
+            param = param_def.eval_dynamic(param, study, recall)
+            logl[i], n[i] = self.likelihood_prepared(lists, param, param_def)
+        return logl, n
+
+    def search_subject(
+        self,
+        subject_data,
+        param_def,
+        patterns=None,
+        study_keys=None,
+        recall_keys=None,
+        stats_def=None,
+        n_stats_rep=1,
+        method='de',
+        vectorized=False,
+        init_param=None,
+        init_spread=0.1,
+        global_tol=0.01,
+        local_method='L-BFGS-B',
+        n_local=1,
+        **kwargs,
+    ):
+        """
+        Fit a model to data for one subject and trace the search.
+
+        Parameters
+        ----------
+        subject_data : pandas.DataFrame
+            Data for one subject.
+
+        param_def : cymr.parameters.Parameters
+            Parameter definitions.
+
+        patterns : dict of (str: dict of (str: numpy.array)), optional
+            Patterns to use in the model.
+
+        study_keys : list of str, optional
+            Fields to include in study data.
+
+        recall_keys : list of str, optional
+            Fields to include in recall data.
+
+        stats_def : cymr.analysis.Statistics, optional
+            Statistics to use when evaluating the model fit. If
+            specified, the search is run by cymr and is not traced.
+
+        n_stats_rep : int, optional
+            Number of times to replicate generation and stat
+            evaluation.
+
+        method : {'de', 'hybrid', 'shgo'}, optional
+            Search method. The hybrid method runs differential
+            evolution with a tolerance of global_tol and without
+            polishing, then runs a bounded local search from the best
+            n_local members of the final population.
+
+        vectorized : bool, optional
+            If true, data and patterns are prepared once, and each
+            differential evolution generation is evaluated as one
+            population by likelihood_population. Candidates are
+            updated once per generation (deferred updating).
+
+        init_param : dict of (subject: dict of (str: float)), optional
+            Parameters of a related model. If the subject is included,
+            the differential evolution population is sampled around
+            them, with a standard deviation of init_spread times the
+            range of each parameter.
+
+        init_spread : float, optional
+            Spread of the initial population.
+
+        global_tol : float, optional
+            Tolerance of the global search stage of the hybrid method.
+
+        local_method : str, optional
+            Method for scipy.optimize.minimize in the local stage of the
+            hybrid method. Must support bounds (e.g., 'L-BFGS-B' or
+            'Nelder-Mead').
+
+        n_local : int, optional
+            Number of candidates to run the local search from.
+
+        kwargs
+            Additional keyword arguments for differential evolution.
+
+        Returns
+        -------
+        param : dict of (str: float)
+            Best-fitting parameters.
+
+        logl : float
+            Log likelihood for the best-fitting parameters.
+
+        n : int
+            Number of data points evaluated.
+
+        k : int
+            Number of free parameters.
+
+        trace : dict of (str: float)
+            Search cost and log likelihood after each stage.
+        """
+        if init_param is not None and method in ['de', 'hybrid']:
+            subject = subject_data['subject'].iloc[0]
+            if subject in init_param:
+                start = map_fit_param(init_param[subject], param_def)
+                n_pop = kwargs.get('popsize', 15) * len(param_def.free)
+                kwargs['init'] = init_population(
+                    param_def, start, n_pop, init_spread, kwargs.get('seed')
+                )
+
+        if stats_def is not None or method not in ['de', 'hybrid']:
+            if method == 'shgo':
+                kwargs.pop('seed', None)
+            param, fit_stat, n, k = super().fit_subject(
+                subject_data,
+                param_def,
+                patterns,
+                study_keys,
+                recall_keys,
+                stats_def,
+                n_stats_rep,
+                method,
+                **kwargs,
+            )
+            return param, fit_stat, n, k, {}
+
+        study, recall = self.prepare_sim(subject_data, study_keys, recall_keys)
+        var_names = list(param_def.free.keys())
+
+        def eval_fit(x):
+            eval_param = param_def.fixed.copy()
+            eval_param.update(dict(zip(var_names, x)))
+            eval_param = param_def.eval_dependent(eval_param)
+            eval_param = param_def.eval_dynamic(eval_param, study, recall)
+            eval_logl, _ = self.likelihood_subject(
+                study, recall, eval_param, param_def, patterns
+            )
+            if np.isnan(eval_logl):
+                eval_logl = -10e6
+            return -eval_logl
+
+        if vectorized:
+            lists = self.prepare_lists(study, recall, param_def, patterns)
+
+            def eval_population(x):
+                logl, _ = self.likelihood_population(
+                    study, recall, x, param_def, var_names=var_names, lists=lists
+                )
+                logl[np.isnan(logl)] = -10e6
+                return -logl
+
+            def eval_fit(x):
+                return eval_population(np.asarray(x)[:, None])[0]
+
+        group_lb = [param_def.free[k][0] for k in var_names]
+        group_ub = [param_def.free[k][1] for k in var_names]
+        bounds = optimize.Bounds(group_lb, group_ub)
+        if method == 'hybrid':
+            kwargs['tol'] = global_tol
+            kwargs['polish'] = False
+
+        # global search
+        start = time.perf_counter()
+        if vectorized:
+            kwargs['updating'] = 'deferred'
+            res = optimize.differential_evolution(
+                eval_population, bounds, vectorized=True, **kwargs
+            )
+        else:
+            res = optimize.differential_evolution(eval_fit, bounds, **kwargs)
+        x = res['x']
+        trace = {
+            'nit': res['nit'],
+            'nfev_global': res['nfev'],
+            'time_global': time.perf_counter() - start,
+            'logl_global': -res['fun'],
+        }
+
+        if method == 'hybrid':
+            # local search from the best candidates
+            start = time.perf_counter()
+            order = np.argsort(res['population_energies'])[:n_local]
+            best_fun = res['fun']
+            nfev = 0
+            for ind in order:
+                local = optimize.minimize(
+                    eval_fit,
+                    res['population'][ind],
+                    method=local_method,
+                    bounds=bounds,
+                )
+                nfev += local['nfev']
+                if local['fun'] < best_fun:
+                    best_fun = local['fun']
+                    x = np.clip(local['x'], group_lb, group_ub)
+            trace.update(
+                {
+                    'nfev_local': nfev,
+                    'time_local': time.perf_counter() - start,
+                    'logl_local': -best_fun,
+                }
+            )
+
+        # get fitted parameters
+        param = param_def.fixed.copy()
+        param.update(dict(zip(var_names, x)))
+        param = param_def.eval_dependent(param)
+        param_dynamic = param_def.eval_dynamic(param, study, recall)
+        logl, n = self.likelihood_subject(
+            study, recall, param_dynamic, param_def, patterns
+        )
+        k = len(param_def.free)
+        return param, logl, n, k, trace
+
+    def fit_subject(self, subject_data, param_def, *args, **kwargs):
+        """
+        Fit a model to data for one subject.
+
+        See search_subject for options.
+        """
+        param, fit_stat, n, k, _ = self.search_subject(
+            subject_data, param_def, *args, **kwargs
+        )
+        return param, fit_stat, n, k
+
+    def _run_fit_subject(
+        self,
+        data,
+        subject,
+        param_def,
+        patterns=None,
+        study_keys=None,
+        recall_keys=None,
+        stats_def=None,
+        n_stats_rep=1,
+        method='de',
+        **kwargs,
+    ):
+        """Apply fitting to one subject, including search trace."""
+        subject_data = data.loc[data['subject'] == subject]
+        param, fit_stat, n, k, trace = self.search_subject(
+            subject_data,
+            param_def,
+            patterns,
+            study_keys,
+            recall_keys,
+            stats_def,
+            n_stats_rep,
+            method,
+            **kwargs,
+        )
+        if stats_def is None:
+            results = {**param, 'logl': fit_stat, 'n': n, 'k': k}
+        else:
+            results = {
+                **param, stats_def.options['error_stat']: fit_stat, 'n': n, 'k': k
+            }
+        results.update(trace)
+        return results
+
+    def _run_timed_fit_subject(self, data, subject, *args, **kwargs):
+        """Apply fitting to one subject and record the run time."""
+        start = time.perf_counter()
+        results = self._run_fit_subject(data, subject, *args, **kwargs)
+        return results, time.perf_counter() - start
+
+    def fit_indiv(
+        self,
+        data,
+        param_def,
+        patterns=None,
+        study_keys=None,
+        recall_keys=None,
+        stats_def=None,
+        n_stats_rep=1,
+        n_jobs=None,
+        method='de',
+        n_rep=1,
+        n_converge=None,
+        converge_tol=0.01,
+        seed=None,
+        profile=None,
+        **kwargs,
+    ):
+        """
+        Fit parameters to individual subjects.
+
+        If n_converge is set, searches for a subject stop once the best
+        log likelihood has been reproduced, within converge_tol, by
+        n_converge searches. Searches are scheduled so that the first
+        repeats of all subjects run before later repeats, and cores
+        freed by converged subjects are used for other subjects.
+        Otherwise, all n_rep searches are run for every subject.
+
+        If seed is set, each search uses a random number generator
+        spawned from the seed for its subject and repeat, so results
+        do not depend on scheduling.
+
+        If profile is set, searches are added to the profile (see
+        fit_family).
+
+        Returns
+        -------
+        results : pandas.DataFrame
+            Best-fitting parameters, log likelihood (:code:`logl`),
+            number of data points (:code:`n`), and number of free
+            parameters (:code:`k`) for each completed search.
+        """
+        custom = n_converge is not None or seed is not None or profile is not None
+        if stats_def is not None or not custom:
+            return super().fit_indiv(
+                data,
+                param_def,
+                patterns,
+                study_keys,
+                recall_keys,
+                stats_def,
+                n_stats_rep,
+                n_jobs,
+                method,
+                n_rep,
+                **kwargs,
+            )
+
+        results = self.fit_family(
+            data,
+            {None: param_def},
+            patterns,
+            study_keys,
+            recall_keys,
+            n_jobs,
+            method,
+            n_rep,
+            n_converge,
+            converge_tol,
+            None if seed is None else {None: seed},
+            profile,
+            **kwargs,
+        )
+        return results[None]
+
+    def fit_family(
+        self,
+        data,
+        param_defs,
+        patterns=None,
+        study_keys=None,
+        recall_keys=None,
+        n_jobs=None,
+        method='de',
+        n_rep=1,
+        n_converge=None,
+        converge_tol=0.01,
+        seeds=None,
+        profile=None,
+        **kwargs,
+    ):
+        """
+        Fit a family of model variants to individual subjects.
+
+        Searches for all variants, subjects, and repeats are run in one
+        pool of workers. Data for each subject and patterns are sent to
+        each worker once. Searches are scheduled so that the first
+        repeats of all variants and subjects run before later repeats.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            Data for all subjects.
+
+        param_defs : dict of (str: cymr.parameters.Parameters)
+            Parameter definitions for each variant.
+
+        patterns : dict, optional
+            Patterns to use in the model.
+
+        study_keys : list of str, optional
+            Fields to include in study data.
+
+        recall_keys : list of str, optional
+            Fields to include in recall data.
+
+        n_jobs : int, optional
+            Number of processes to run searches in.
+
+        method : str, optional
+            Search method. See search_subject.
+
+        n_rep : int, optional
+            Number of times to repeat the search for each subject.
+
+        n_converge : int, optional
+            If set, searches for a variant and subject stop once the
+            best log likelihood has been reproduced, within
+            converge_tol, by n_converge searches. Freed cores are used
+            for other searches.
+
+        converge_tol : float, optional
+            Log-likelihood tolerance for matching the best fit.
+
+        seeds : dict of (str: int or numpy.random.SeedSequence), optional
+            Base seed for each variant. Each search uses a random number
+            generator spawned from the seed for its subject and repeat,
+            so results do not depend on scheduling or on the other
+            variants in the family.
+
+        profile : cfr.profiling.RunProfile, optional
+            If specified, the wall time, search trace, and peak memory
+            of each search and the utilization of workers are added.
+
+        Returns
+        -------
+        results : dict of (str: pandas.DataFrame)
+            Search results for each variant, as returned by fit_indiv.
+        """
+        subjects = data['subject'].unique()
+        subject_data = {
+            subject: data.loc[data['subject'] == subject] for subject in subjects
+        }
+        units = [
+            (variant, subject, rep)
+            for rep in range(n_rep)
+            for variant in param_defs.keys()
+            for subject in subjects
+        ]
+        pending = deque(units)
+        converged = set()
+        results = {}
+        run_time = {(variant, subject): [] for variant, subject, _ in units}
+
+        def next_unit():
+            while pending:
+                variant, subject, rep = pending.popleft()
+                if (variant, subject) not in converged:
+                    return variant, subject, rep
+            return None
+
+        def unit_args(variant, subject, rep):
+            return (
+                self,
+                subject,
+                param_defs[variant],
+                study_keys,
+                recall_keys,
+                None,
+                1,
+                method,
+            )
+
+        def unit_kwargs(variant, subject, rep):
+            if seeds is None:
+                return kwargs
+            unit_seed = spawn_seed(seeds[variant], subject, rep)
+            return {**kwargs, 'seed': np.random.default_rng(unit_seed)}
+
+        def add_result(variant, subject, rep, res, elapsed, info):
+            results[(variant, subject, rep)] = res
+            run_time[(variant, subject)].append(elapsed)
+            if profile is not None:
+                unit = {'subject': subject, 'rep': rep, 'wall_time': elapsed, **info}
+                if variant is not None:
+                    unit['variant'] = variant
+                profile.add_unit(unit, res)
+            if n_converge is None:
+                return
+            logl = [
+                v['logl']
+                for (m, s, r), v in results.items()
+                if m == variant and s == subject
+            ]
+            if (variant, subject) not in converged and restarts_converged(
+                logl, n_converge, converge_tol
+            ):
+                converged.add((variant, subject))
+                label = f'Subject {subject}'
+                if variant is not None:
+                    label = f'Model {variant} subject {subject}'
+                logging.info(
+                    f'{label} converged after {len(logl)} of {n_rep} search(es).'
+                )
+
+        n_jobs = effective_n_jobs(n_jobs)
+        pool_start = time.perf_counter()
+        pool = worker_pool(n_jobs, subject_data=subject_data, patterns=patterns)
+        with pool as executor:
+            if executor is None:
+                unit = next_unit()
+                while unit is not None:
+                    output = _run_fit_unit(*unit_args(*unit), **unit_kwargs(*unit))
+                    add_result(*unit, *output)
+                    unit = next_unit()
+            else:
+                running = {}
+                while True:
+                    while len(running) < n_jobs:
+                        unit = next_unit()
+                        if unit is None:
+                            break
+                        future = executor.submit(
+                            _run_fit_unit, *unit_args(*unit), **unit_kwargs(*unit)
+                        )
+                        running[future] = unit
+                    if not running:
+                        break
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        add_result(*running.pop(future), *future.result())
+        if profile is not None:
+            busy = sum(sum(t) for t in run_time.values())
+            profile.add_pool(n_jobs, time.perf_counter() - pool_start, busy)
+
+        # log the searches that were skipped
+        if n_converge is not None:
+            n_total = len(units)
+            n_skipped = n_total - len(results)
+            saved = sum(
+                (n_rep - len(t)) * np.mean(t) for t in run_time.values() if len(t) > 0
+            )
+            logging.info(
+                f'Adaptive restarts skipped {n_skipped} of {n_total} search(es), '
+                f'saving an estimated {saved:.1f} core-seconds.'
+            )
+
+        family = {}
+        for variant in param_defs.keys():
+            keys = [
+                (s, r)
+                for s in subjects
+                for r in range(n_rep)
+                if (variant, s, r) in results
+            ]
+            d = {key: results[(variant, *key)] for key in keys}
+            variant_results = pd.DataFrame(d).T
+            variant_results.index.rename(['subject', 'rep'], inplace=True)
+            family[variant] = variant_results.astype({'n': int, 'k': int})
+        return family
+
+
+_worker_inputs = {}
+
+
+def _init_worker_inputs(inputs):
+    """Store inputs shared by all tasks in a worker."""
+    _worker_inputs.clear()
+    _worker_inputs.update(inputs)
+
+
+def worker_inputs():
+    """Get the inputs shared with tasks by worker_pool."""
+    return _worker_inputs
+
+
+@contextmanager
+def worker_pool(n_jobs, **inputs):
+    """
+    Run tasks that share large inputs, such as data and patterns.
+
+    Inputs are sent to each worker process once, when it starts, and
+    tasks get them using worker_inputs. With one job, tasks run in the
+    current process, and the inputs are cleared when the context exits
+    so they are not kept after the run.
+
+    Parameters
+    ----------
+    n_jobs : int
+        Number of worker processes.
+
+    inputs
+        Inputs to share with all tasks.
+
+    Yields
+    ------
+    executor : concurrent.futures.ProcessPoolExecutor or None
+        Executor to submit tasks to, or None if tasks should be called
+        directly in the current process.
+    """
+    if n_jobs == 1:
+        _init_worker_inputs(inputs)
+        try:
+            yield None
+        finally:
+            _worker_inputs.clear()
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_init_worker_inputs, initargs=(inputs,)
+        ) as executor:
+            yield executor
+
+
+def _run_fit_unit(model, subject, param_def, *args, **kwargs):
+    """Run one search using data stored in the worker."""
+    inputs = worker_inputs()
+    start = time.time()
+    res, elapsed = model._run_timed_fit_subject(
+        inputs['subject_data'][subject],
+        subject,
+        param_def,
+        inputs['patterns'],
+        *args,
+        **kwargs,
+    )
+    return res, elapsed, profiling.unit_info(start, time.time())
+
+
+def load_model_data(data_file, patterns_file, include=None):
+    """
+    Load data and network patterns for fitting or simulating models.
+
+    Parameters
+    ----------
+    data_file : str
+        Path to Psifr-format data file.
+
+    patterns_file : str
+        Path to patterns file.
+
+    include : list of int, optional
+        Subjects to include. Default is all subjects in the data file.
+
+    Returns
+    -------
+    data : pandas.DataFrame
+        Data with an item index for looking up patterns.
+
+    patterns : dict
+        Network patterns.
+    """
+    logging.info(f'Loading data from {data_file}.')
+    data = pd.read_csv(data_file)
+    if include is not None:
+        data = data.loc[data['subject'].isin(include)]
+
+    logging.info(f'Loading network patterns from {patterns_file}.')
+    patterns = task.load_patterns(patterns_file)
+
+    # make sure item index is defined for looking up weight patterns
+    if 'item_index' not in data.columns:
+        data['item_index'] = fr.pool_index(data['item'], patterns['items'])
+        study = fr.filter_data(data, trial_type='study')
+        if study['item_index'].isna().any():
+            raise ValueError('Patterns not found for one or more items.')
+    return data, patterns
+
+
+def configure_variant(
+    fcf_features, ff_features, intercept, sublayers, sublayer_param, fixed_param
 ):
-    """Configure a model based on commandline input."""
-    # unpack lists
+    """Configure parameter definitions based on commandline input."""
     fcf_features = split_arg(fcf_features)
     ff_features = split_arg(ff_features)
-    if include is not None:
-        include = [int(s) for s in split_arg(include)]
     sublayer_param = split_arg(sublayer_param)
     fixed_param_list = split_arg(fixed_param)
     fixed_param = {}
@@ -572,12 +2224,6 @@ def configure_model(
             param_name, val = expr.split('=')
             fixed_param[param_name] = float(val)
 
-    # load data to simulate
-    logging.info(f'Loading data from {data_file}.')
-    data = pd.read_csv(data_file)
-    if include is not None:
-        data = data.loc[data['subject'].isin(include)]
-
     # set parameter definitions based on model framework
     param_def = model_variant(
         fcf_features,
@@ -587,15 +2233,27 @@ def configure_model(
         intercept=intercept,
         fixed_param=fixed_param,
     )
-    logging.info(f'Loading network patterns from {patterns_file}.')
-    patterns = cmr.load_patterns(patterns_file)
+    return param_def
 
-    # make sure item index is defined for looking up weight patterns
-    if 'item_index' not in data.columns:
-        data['item_index'] = fr.pool_index(data['item'], patterns['items'])
-        study = fr.filter_data(data, trial_type='study')
-        if study['item_index'].isna().any():
-            raise ValueError('Patterns not found for one or more items.')
+
+def configure_model(
+    data_file,
+    patterns_file,
+    fcf_features,
+    ff_features,
+    intercept,
+    sublayers,
+    sublayer_param,
+    fixed_param,
+    include,
+):
+    """Configure a model based on commandline input."""
+    if include is not None:
+        include = [int(s) for s in split_arg(include)]
+    data, patterns = load_model_data(data_file, patterns_file, include)
+    param_def = configure_variant(
+        fcf_features, ff_features, intercept, sublayers, sublayer_param, fixed_param
+    )
     return data, param_def, patterns
 
 
@@ -628,12 +2286,81 @@ def configure_model(
     "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
 )
 @click.option("--tol", "-t", type=float, default=0.00001, help="search tolerance")
+@click.option(
+    "--vectorized/--no-vectorized",
+    default=False,
+    help="evaluate each search generation as one population",
+)
+@click.option(
+    "--n-converge",
+    "-c",
+    type=int,
+    help="stop searches for a subject after the best fit is found this many times",
+)
+@click.option(
+    "--converge-tol",
+    type=float,
+    default=0.01,
+    help="log-likelihood tolerance for matching the best fit",
+)
+@click.option(
+    "--init-from",
+    type=click.Path(exists=True),
+    help="fit directory of a related model to start searches from",
+)
+@click.option(
+    "--init-spread",
+    type=float,
+    default=0.1,
+    help="spread of the initial population, as a fraction of parameter ranges",
+)
+@click.option(
+    "--method",
+    type=click.Choice(['de', 'hybrid']),
+    default='de',
+    help="search method; hybrid runs a local search after a loose global search",
+)
+@click.option(
+    "--global-tol",
+    type=float,
+    default=0.01,
+    help="tolerance of the global stage of a hybrid search",
+)
+@click.option(
+    "--local-method",
+    type=click.Choice(['L-BFGS-B', 'Nelder-Mead']),
+    default='L-BFGS-B',
+    help="method for the local stage of a hybrid search",
+)
+@click.option(
+    "--n-local",
+    type=int,
+    default=1,
+    help="number of best global candidates to start local searches from",
+)
 @click.option(
     "--n-sim-reps",
     "-r",
     type=int,
     default=1,
-    help="number of experiment replications to simulate",
+    help="number of experiment replications to simulate (0 to skip simulation)",
+)
+@click.option(
+    "--sim-format",
+    type=click.Choice(['csv', 'npz']),
+    default='csv',
+    help="file format for simulated data (default: csv)",
+)
+@click.option(
+    "--seed",
+    "-s",
+    type=int,
+    help="seed for reproducible searches and simulations (default: unseeded)",
+)
+@click.option(
+    "--profile/--no-profile",
+    default=False,
+    help="record timing and memory use in profile.json",
 )
 @click.option(
     "--include",
@@ -653,7 +2380,19 @@ def fit_cmr(
     n_reps=1,
     n_jobs=1,
     tol=0.00001,
+    vectorized=False,
+    n_converge=None,
+    converge_tol=0.01,
+    init_from=None,
+    init_spread=0.1,
+    method='de',
+    global_tol=0.01,
+    local_method='L-BFGS-B',
+    n_local=1,
     n_sim_reps=1,
+    sim_format='csv',
+    seed=None,
+    profile=False,
     include=None,
 ):
     """Run a parameter search to fit a model and simulate data."""
@@ -666,20 +2405,25 @@ def fit_cmr(
         format='%(asctime)s %(levelname)s:%(name)s:%(message)s',
     )
 
+    run_profile = profiling.RunProfile('cfr-fit-cmr', n_jobs) if profile else None
+
     # set up data and model based on script input
-    data, param_def, patterns = configure_model(
-        data_file,
-        patterns_file,
-        fcf_features,
-        ff_features,
-        intercept,
-        sublayers,
-        sublayer_param,
-        fixed_param,
-        include,
-    )
+    with profiling.stage(run_profile, 'configure_model'):
+        data, param_def, patterns = configure_model(
+            data_file,
+            patterns_file,
+            fcf_features,
+            ff_features,
+            intercept,
+            sublayers,
+            sublayer_param,
+            fixed_param,
+            include,
+        )
 
     # save model information
+    if seed is not None:
+        seed = init_seed(param_def, seed)
     json_file = os.path.join(res_dir, 'parameters.json')
     logging.info(f'Saving parameter definition to {json_file}.')
     param_def.to_json(json_file)
@@ -690,16 +2434,28 @@ def fit_cmr(
         f'Running {n_reps} parameter optimization repeat(s) for {n} participant(s).'
     )
     logging.info(f'Using {n_jobs} core(s).')
-    model = cmr.CMR()
-    results = model.fit_indiv(
-        data,
-        param_def,
-        patterns=patterns,
-        n_jobs=n_jobs,
-        method='de',
-        n_rep=n_reps,
-        tol=tol,
-    )
+    init_param = read_init_param(init_from)
+    model = CFRModel()
+    with profiling.stage(run_profile, 'fit_indiv'):
+        results = model.fit_indiv(
+            data,
+            param_def,
+            patterns=patterns,
+            n_jobs=n_jobs,
+            method=method,
+            n_rep=n_reps,
+            tol=tol,
+            vectorized=vectorized,
+            n_converge=n_converge,
+            converge_tol=converge_tol,
+            init_param=init_param,
+            init_spread=init_spread,
+            global_tol=global_tol,
+            local_method=local_method,
+            n_local=n_local,
+            seed=None if seed is None else spawn_seed(seed, 0),
+            profile=run_profile,
+        )
 
     # full search information
     res_file = os.path.join(res_dir, 'search.csv')
@@ -707,28 +2463,35 @@ def fit_cmr(
     results.to_csv(res_file)
 
     # best results
-    best = fit.get_best_results(results)
+    best = get_best_results(results)
     best_file = os.path.join(res_dir, 'fit.csv')
     logging.info(f'Saving best fitting results to {best_file}.')
     best.to_csv(best_file)
 
     # simulate data based on best parameters
-    subj_param = best.T.to_dict()
-    study_data = data.loc[(data['trial_type'] == 'study')]
-    logging.info(
-        f'Simulating {n_sim_reps} replication(s) with best-fitting parameters.'
-    )
-    sim = model.generate(
-        study_data,
-        {},
-        subj_param=subj_param,
-        param_def=param_def,
-        patterns=patterns,
-        n_rep=n_sim_reps,
-    )
-    sim_file = os.path.join(res_dir, 'sim.csv')
-    logging.info(f'Saving simulated data to {sim_file}.')
-    sim.to_csv(sim_file, index=False)
+    if n_sim_reps > 0:
+        subj_param = best.T.to_dict()
+        logging.info(
+            f'Simulating {n_sim_reps} replication(s) with best-fitting parameters.'
+        )
+        with profiling.stage(run_profile, 'generate'):
+            sim = simulate_fit(
+                data,
+                param_def,
+                patterns,
+                subj_param,
+                n_sim_reps,
+                n_jobs,
+                None if seed is None else spawn_seed(seed, 1),
+            )
+        sim_file = os.path.join(res_dir, f'sim.{sim_format}')
+        logging.info(f'Saving simulated data to {sim_file}.')
+        task.write_events(sim, sim_file)
+
+    if run_profile is not None:
+        profile_file = os.path.join(res_dir, 'profile.json')
+        logging.info(f'Saving run profile to {profile_file}.')
+        run_profile.save(profile_file)
 
 
 @click.command()
@@ -771,6 +2534,69 @@ def fit_cmr(
     "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
 )
 @click.option("--tol", "-t", type=float, default=0.00001, help="search tolerance")
+@click.option(
+    "--vectorized/--no-vectorized",
+    default=False,
+    help="evaluate each search generation as one population",
+)
+@click.option(
+    "--n-converge",
+    "-c",
+    type=int,
+    help="stop searches for a subject after the best fit is found this many times",
+)
+@click.option(
+    "--converge-tol",
+    type=float,
+    default=0.01,
+    help="log-likelihood tolerance for matching the best fit",
+)
+@click.option(
+    "--init-from",
+    type=click.Path(exists=True),
+    help="fit directory of a related model to start searches from",
+)
+@click.option(
+    "--init-spread",
+    type=float,
+    default=0.1,
+    help="spread of the initial population, as a fraction of parameter ranges",
+)
+@click.option(
+    "--method",
+    type=click.Choice(['de', 'hybrid']),
+    default='de',
+    help="search method; hybrid runs a local search after a loose global search",
+)
+@click.option(
+    "--global-tol",
+    type=float,
+    default=0.01,
+    help="tolerance of the global stage of a hybrid search",
+)
+@click.option(
+    "--local-method",
+    type=click.Choice(['L-BFGS-B', 'Nelder-Mead']),
+    default='L-BFGS-B',
+    help="method for the local stage of a hybrid search",
+)
+@click.option(
+    "--n-local",
+    type=int,
+    default=1,
+    help="number of best global candidates to start local searches from",
+)
+@click.option(
+    "--seed",
+    "-s",
+    type=int,
+    help="seed for reproducible searches and simulations (default: unseeded)",
+)
+@click.option(
+    "--profile/--no-profile",
+    default=False,
+    help="record timing and memory use in profile.json",
+)
 @click.option(
     "--include",
     "-i",
@@ -791,6 +2617,17 @@ def xval_cmr(
     n_reps=1,
     n_jobs=1,
     tol=0.00001,
+    vectorized=False,
+    n_converge=None,
+    converge_tol=0.01,
+    init_from=None,
+    init_spread=0.1,
+    method='de',
+    global_tol=0.01,
+    local_method='L-BFGS-B',
+    n_local=1,
+    seed=None,
+    profile=False,
     include=None,
 ):
     """Evaluate a model using cross-validation."""
@@ -803,18 +2640,21 @@ def xval_cmr(
         format='%(asctime)s %(levelname)s:%(name)s:%(message)s',
     )
 
+    run_profile = profiling.RunProfile('cfr-xval-cmr', n_jobs) if profile else None
+
     # set up data and model based on script input
-    data, param_def, patterns = configure_model(
-        data_file,
-        patterns_file,
-        fcf_features,
-        ff_features,
-        intercept,
-        sublayers,
-        sublayer_param,
-        fixed_param,
-        include,
-    )
+    with profiling.stage(run_profile, 'configure_model'):
+        data, param_def, patterns = configure_model(
+            data_file,
+            patterns_file,
+            fcf_features,
+            ff_features,
+            intercept,
+            sublayers,
+            sublayer_param,
+            fixed_param,
+            include,
+        )
 
     if (n_folds is None and fold_key is None) or (
         n_folds is not None and fold_key is not None
@@ -822,6 +2662,8 @@ def xval_cmr(
         raise ValueError('Must specify one of either n_folds or fold_key.')
 
     # save model information
+    if seed is not None:
+        seed = init_seed(param_def, seed)
     json_file = os.path.join(res_dir, 'xval_parameters.json')
     logging.info(f'Saving parameter definition to {json_file}.')
     param_def.to_json(json_file)
@@ -844,51 +2686,74 @@ def xval_cmr(
         # interleave folds over lists
         folds = np.arange(1, n_folds + 1)
         list_fold = np.tile(folds, int(np.ceil(n_lists / n_folds)))
+        list_rank = list_ranks(data)
     xval_list = []
     search_list = []
-    model = cmr.CMR()
-    for fold in folds:
+    init_param = read_init_param(init_from)
+    model = CFRModel()
+
+    # convert data to list format once, for evaluating test lists
+    with profiling.stage(run_profile, 'prepare'):
+        prepared = model.prepare_subjects(data)
+    subject_lists = {
+        subject: np.sort(subject_data['list'].unique())
+        for subject, subject_data in data.groupby('subject')
+    }
+    for i, fold in enumerate(folds):
         # fit the training dataset
         if fold_key is not None:
             train_data = data[data[fold_key] != fold]
         else:
-            train_data = (
-                data.groupby('subject')
-                .apply(apply_list_mask, list_fold != fold)
-                .droplevel('subject')
+            train_data = data[list_fold[list_rank] != fold]
+        if run_profile is not None:
+            run_profile.tags['fold'] = fold
+        with profiling.stage(run_profile, 'fit_indiv'):
+            results = model.fit_indiv(
+                train_data,
+                param_def,
+                patterns=patterns,
+                n_jobs=n_jobs,
+                method=method,
+                n_rep=n_reps,
+                tol=tol,
+                vectorized=vectorized,
+                n_converge=n_converge,
+                converge_tol=converge_tol,
+                init_param=init_param,
+                init_spread=init_spread,
+                global_tol=global_tol,
+                local_method=local_method,
+                n_local=n_local,
+                seed=None if seed is None else spawn_seed(seed, 0, i),
+                profile=run_profile,
             )
-        results = model.fit_indiv(
-            train_data,
-            param_def,
-            patterns=patterns,
-            n_jobs=n_jobs,
-            method='de',
-            n_rep=n_reps,
-            tol=tol,
-        )
         search_list.append(results)
 
         # evaluate on left-out fold
-        best = fit.get_best_results(results)
+        best = get_best_results(results)
         subj_param = best.T.to_dict()
         if fold_key is not None:
             test_data = data[data[fold_key] == fold]
+            test_lists = {
+                subject: subject_data['list'].unique()
+                for subject, subject_data in test_data.groupby('subject')
+            }
         else:
-            test_data = (
-                data.groupby('subject')
-                .apply(apply_list_mask, list_fold == fold)
-                .droplevel('subject')
+            test_lists = {
+                subject: lists[list_fold[: len(lists)] == fold]
+                for subject, lists in subject_lists.items()
+            }
+        with profiling.stage(run_profile, 'likelihood'):
+            stats = model.likelihood_lists(
+                prepared, subj_param, param_def, patterns, test_lists
             )
-        stats = model.likelihood(
-            test_data, {}, subj_param, param_def, patterns=patterns
-        )
         xval = best.copy()
         xval['logl_train'] = xval['logl']
         xval['logl_test'] = stats['logl']
         xval['n_train'] = xval['n']
         xval['n_test'] = stats['n']
         m_train = train_data.groupby('subject')['list'].nunique()
-        m_test = test_data.groupby('subject')['list'].nunique()
+        m_test = pd.Series({subject: len(x) for subject, x in test_lists.items()})
         xval['logl_train_list'] = xval['logl_train'] / m_train
         xval['logl_test_list'] = xval['logl_test'] / m_test
         xval['m_train'] = m_train
@@ -896,9 +2761,10 @@ def xval_cmr(
         xval.drop(columns=['logl', 'n'], inplace=True)
         xval_list.append(xval)
 
-    # cross-validation summary
+    # cross-validation summary, sorted so that splits can be merged
     summary = pd.concat(xval_list, keys=folds)
     summary.index.rename(['fold', 'subject'], inplace=True)
+    summary.sort_index(inplace=True)
     xval_file = os.path.join(res_dir, 'xval.csv')
     logging.info(f'Saving best fitting results to {xval_file}.')
     summary.to_csv(xval_file)
@@ -906,25 +2772,176 @@ def xval_cmr(
     # full search information
     search = pd.concat(search_list, keys=folds)
     search.index.rename(['fold', 'subject', 'rep'], inplace=True)
+    search.sort_index(inplace=True)
     search_file = os.path.join(res_dir, f'xval_search.csv')
     logging.info(f'Saving full search results to {search_file}.')
     search.to_csv(search_file)
 
+    if run_profile is not None:
+        profile_file = os.path.join(res_dir, 'profile.json')
+        logging.info(f'Saving run profile to {profile_file}.')
+        run_profile.save(profile_file)
+
+
+def init_seed(param_def, seed=None):
+    """
+    Create a base seed sequence and record it in the model options.
+
+    If seed is None, fresh entropy is drawn and recorded, so that the
+    run can be reproduced later.
+    """
+    seed = np.random.SeedSequence(seed)
+    param_def.set_options(seed=seed.entropy)
+    return seed
+
+
+def _seed_key(value):
+    """Convert a unit identifier to a non-negative integer seed key."""
+    if isinstance(value, numbers.Integral) and value >= 0:
+        return int(value)
+    if isinstance(value, numbers.Real) and float(value).is_integer() and value >= 0:
+        return int(value)
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def spawn_seed(seed, *key):
+    """
+    Spawn a seed sequence for one unit of work.
+
+    Parameters
+    ----------
+    seed : int or numpy.random.SeedSequence
+        Base seed.
+
+    key : int or str
+        Values identifying the unit, such as subject and repeat.
+        Values other than non-negative integers, such as string subject
+        identifiers, are hashed to a stable integer.
+
+    Returns
+    -------
+    unit_seed : numpy.random.SeedSequence
+        Seed sequence for the unit. The same key always gives the same
+        sequence, as with SeedSequence.spawn, but units may be created
+        in any order.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    spawn_key = tuple(_seed_key(k) for k in key)
+    return np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key + spawn_key)
+
+
+def _simulate_unit(subject_data, subject, param, param_def, patterns, rep, seed):
+    """Simulate one replication of a subject with a fixed random state."""
+    # cymr samples from the global random state; restore it for the caller
+    state = np.random.get_state()
+    np.random.seed(seed.generate_state(4))
+    try:
+        model = cmr.CMR()
+        sim = model.generate(
+            subject_data,
+            {},
+            subj_param={subject: param},
+            param_def=param_def,
+            patterns=patterns,
+        )
+    finally:
+        np.random.set_state(state)
+    sim['list'] += rep * subject_data['list'].max()
+    return sim
+
+
+def simulate_fit(data, param_def, patterns, subj_param, n_rep=1, n_jobs=1, seed=None):
+    """
+    Simulate a dataset using fitted parameters.
+
+    Each replication of each subject is simulated separately, with a
+    random state determined by the seed, subject, and replication
+    number, so that results do not depend on the number of jobs.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Free recall data. Study trials are simulated.
+
+    param_def : cymr.parameters.Parameters
+        Parameter definitions.
+
+    patterns : dict
+        Patterns to use in the model.
+
+    subj_param : dict of (int: dict of (str: float))
+        Fitted parameters for each subject.
+
+    n_rep : int, optional
+        Number of times to replicate the experiment.
+
+    n_jobs : int, optional
+        Number of processes to run simulations in.
+
+    seed : int or numpy.random.SeedSequence, optional
+        Seed for simulations. If not specified, fresh entropy is used.
+
+    Returns
+    -------
+    sim : pandas.DataFrame
+        Simulated study and recall events.
+    """
+    study_data = data.loc[(data['trial_type'] == 'study')]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    subjects = study_data['subject'].unique()
+    units = [(subject, rep) for subject in subjects for rep in range(n_rep)]
+    subject_data = {
+        subject: study_data.loc[study_data['subject'] == subject]
+        for subject in subjects
+    }
+    sim_list = Parallel(n_jobs=n_jobs)(
+        delayed(_simulate_unit)(
+            subject_data[subject],
+            subject,
+            subj_param[subject],
+            param_def,
+            patterns,
+            rep,
+            spawn_seed(seed, subject, rep),
+        )
+        for subject, rep in units
+    )
+    sim = pd.concat(sim_list, axis=0, ignore_index=True)
+    return sim
+
 
 @click.command()
 @click.argument("data_file", type=click.Path(exists=True))
 @click.argument("patterns_file", type=click.Path(exists=True))
 @click.argument("fit_dir", type=click.Path(exists=True))
 @click.option("--n-rep", "-r", type=int, default=1)
-def sim_cmr(data_file, patterns_file, fit_dir, n_rep=1):
+@click.option(
+    "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
+)
+@click.option(
+    "--seed",
+    "-s",
+    type=int,
+    help="seed for random number generation (default: seed recorded with the fit)",
+)
+@click.option(
+    "--sim-format",
+    type=click.Choice(['csv', 'npz']),
+    default='csv',
+    help="file format for simulated data (default: csv)",
+)
+def sim_cmr(
+    data_file, patterns_file, fit_dir, n_rep=1, n_jobs=1, seed=None, sim_format='csv'
+):
     """Run a simulation using best-fitting parameters."""
     # load trials to simulate
     data = pd.read_csv(data_file)
-    study_data = data.loc[(data['trial_type'] == 'study')]
 
-    # get model, patterns, and weights
-    model = cmr.CMR()
-    patterns = cmr.load_patterns(patterns_file)
+    # get patterns and weights
+    patterns = task.load_patterns(patterns_file)
     param_file = os.path.join(fit_dir, 'parameters.json')
     param_def = cmr.read_config(param_file)
 
@@ -933,11 +2950,15 @@ def sim_cmr(data_file, patterns_file, fit_dir, n_rep=1):
     subj_param = read_fit_param(fit_file)
 
     # run simulation
-    sim = model.generate(study_data, {}, subj_param, param_def, patterns, n_rep=n_rep)
+    if seed is None:
+        seed = param_def.options.get('seed')
+    if seed is not None:
+        seed = spawn_seed(seed, 1)
+    sim = simulate_fit(data, param_def, patterns, subj_param, n_rep, n_jobs, seed)
 
     # save
-    sim_file = os.path.join(fit_dir, 'sim.csv')
-    sim.to_csv(sim_file, index=False)
+    sim_file = os.path.join(fit_dir, f'sim.{sim_format}')
+    task.write_events(sim, sim_file)
 
 
 def generate_model_name(
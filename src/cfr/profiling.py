@@ -0,0 +1,241 @@
+"""Record where time and memory go when fitting models."""
+
+import os
+import sys
+import json
+import time
+import platform
+import resource
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import click
+
+
+def max_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size of this process or its children, in MB."""
+    max_rss = resource.getrusage(who).ru_maxrss
+    # reported in bytes on macOS and kilobytes elsewhere
+    scale = 1024**2 if sys.platform == 'darwin' else 1024
+    return max_rss / scale
+
+
+def unit_info(start, end):
+    """Information about a unit of work run in the current process."""
+    return {
+        'pid': os.getpid(),
+        'start': start,
+        'end': end,
+        'max_rss_mb': max_rss_mb(),
+    }
+
+
+class RunProfile:
+    """
+    Timing and resource use of a fitting run.
+
+    Stages of the run are timed using the stage context manager, and
+    individual searches are added as units. Worker pools record their
+    wall time and the time spent running searches, to calculate worker
+    utilization.
+
+    Parameters
+    ----------
+    command : str
+        Name of the profiled command.
+
+    n_jobs : int, optional
+        Number of workers requested.
+    """
+
+    def __init__(self, command, n_jobs=1):
+        self.info = {
+            'command': command,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'host': platform.node(),
+            'cpu_count': os.cpu_count(),
+            'n_jobs': n_jobs,
+        }
+        self.stages = {}
+        self.units = []
+        self.pools = []
+        self.tags = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage of the run; repeated stages are summed."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0) + elapsed
+
+    def add_unit(self, unit, trace=None):
+        """
+        Add a search unit to the profile.
+
+        Parameters
+        ----------
+        unit : dict
+            Information about the unit, including its wall time
+            (:code:`wall_time`) and the information from unit_info.
+            Any current tags (e.g., fold) are added.
+
+        trace : dict, optional
+            Search trace with generations (:code:`nit`) and number of
+            likelihood evaluations (:code:`nfev_global`,
+            :code:`nfev_local`).
+        """
+        unit = {**self.tags, **unit}
+        if trace is not None:
+            nfev = trace.get('nfev_global', np.nan)
+            if 'nfev_local' in trace and not np.isnan(trace['nfev_local']):
+                nfev += trace['nfev_local']
+            unit['generations'] = trace.get('nit', np.nan)
+            unit['nfev'] = nfev
+            unit['evals_per_sec'] = nfev / unit['wall_time']
+        self.units.append(unit)
+
+    def add_pool(self, n_workers, wall_time, busy_time):
+        """Add a worker pool with its wall time and total busy time."""
+        self.pools.append(
+            {'n_workers': n_workers, 'wall_time': wall_time, 'busy_time': busy_time}
+        )
+
+    def to_dict(self):
+        """Summarize the profile."""
+        units = pd.DataFrame(self.units)
+        total = time.perf_counter() - self._start
+        prof = {**self.info, 'total_time': total, 'stages': self.stages}
+
+        # searches per subject
+        if not units.empty:
+            subjects = units.groupby('subject').agg(
+                wall_time=('wall_time', 'sum'),
+                n_search=('wall_time', 'size'),
+                nfev=('nfev', 'sum'),
+                generations=('generations', 'mean'),
+            )
+            subjects['evals_per_sec'] = subjects['nfev'] / subjects['wall_time']
+            prof['subjects'] = {
+                str(subject): row.to_dict() for subject, row in subjects.iterrows()
+            }
+            prof['searches'] = {
+                'n': len(units),
+                'wall_time': units['wall_time'].sum(),
+                'nfev': units['nfev'].sum(),
+                'evals_per_sec': units['nfev'].sum() / units['wall_time'].sum(),
+                'generations_mean': units['generations'].mean(),
+                'generations_max': units['generations'].max(),
+            }
+
+        # worker utilization
+        if self.pools:
+            capacity = sum(p['n_workers'] * p['wall_time'] for p in self.pools)
+            busy = sum(p['busy_time'] for p in self.pools)
+            prof['workers'] = {
+                'n_processes': int(units['pid'].nunique()) if not units.empty else 0,
+                'wall_time': sum(p['wall_time'] for p in self.pools),
+                'busy_time': busy,
+                'utilization': busy / capacity if capacity > 0 else np.nan,
+            }
+
+        # memory
+        prof['peak_rss_mb'] = {
+            'main': max_rss_mb(),
+            'children': max_rss_mb(resource.RUSAGE_CHILDREN),
+            'workers': units['max_rss_mb'].max() if not units.empty else np.nan,
+        }
+        prof['units'] = units.to_dict(orient='records')
+        return prof
+
+    def save(self, json_file):
+        """Save the profile to a JSON file."""
+        with open(json_file, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4, default=_json_default)
+
+
+def _json_default(obj):
+    """Convert NumPy values for JSON."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def stage(profile, name):
+    """Time a stage of a run if it is being profiled."""
+    return nullcontext() if profile is None else profile.stage(name)
+
+
+def read_profile(json_file):
+    """Read a profile from a JSON file."""
+    with open(json_file, 'r') as f:
+        prof = json.load(f)
+    return prof
+
+
+def profile_summary(profiles, names=None):
+    """
+    Summarize profiles to compare runs.
+
+    Parameters
+    ----------
+    profiles : list of dict
+        Profiles read using read_profile.
+
+    names : list of str, optional
+        Name of each run.
+
+    Returns
+    -------
+    summary : pandas.DataFrame
+        Total time, time in each stage, search statistics, worker
+        utilization, and peak memory for each run.
+    """
+    if names is None:
+        names = [str(i) for i in range(len(profiles))]
+    rows = []
+    for prof in profiles:
+        row = {
+            'command': prof['command'],
+            'n_jobs': prof['n_jobs'],
+            'total_time': prof['total_time'],
+        }
+        row.update({f'time_{k}': v for k, v in prof['stages'].items()})
+        if 'searches' in prof:
+            s = prof['searches']
+            row.update(
+                {
+                    'n_search': s['n'],
+                    'evals_per_sec': s['evals_per_sec'],
+                    'generations': s['generations_mean'],
+                }
+            )
+        if 'workers' in prof:
+            row['utilization'] = prof['workers']['utilization']
+        rss = prof['peak_rss_mb']
+        row['peak_rss_mb'] = np.nanmax(
+            [v if v is not None else np.nan for v in rss.values()]
+        )
+        rows.append(row)
+    summary = pd.DataFrame(rows, index=pd.Index(names, name='run'))
+    return summary
+
+
+@click.command()
+@click.argument("profile_files", nargs=-1, type=click.Path(exists=True))
+def summarize_profiles(profile_files):
+    """Compare profile.json files from multiple runs."""
+    profiles = []
+    names = []
+    for profile_file in profile_files:
+        if os.path.isdir(profile_file):
+            profile_file = os.path.join(profile_file, 'profile.json')
+        profiles.append(read_profile(profile_file))
+        names.append(os.path.basename(os.path.dirname(os.path.abspath(profile_file))))
+    summary = profile_summary(profiles, names)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(summary.T.to_string(float_format=lambda x: f'{x:.3g}'))
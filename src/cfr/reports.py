@@ -11,7 +11,6 @@ import click
 
 matplotlib.use('Agg')
 from psifr import fr
-from cymr import cmr
 from cfr import task
 from cfr import framework
 from cfr import figures
@@ -109,20 +108,54 @@ def plot_fit(data_file, patterns_file, fit_dir, ext):
     logging.info(f'Plotting fitted simulation data in {fit_dir}.')
 
     # load data and simulated data
-    sim_file = os.path.join(fit_dir, 'sim.csv')
+    sim_file = framework.find_sim_file(fit_dir)
     logging.info(f'Loading data from {data_file}.')
     data = task.read_free_recall(data_file, block=False, block_category=False)
     logging.info(f'Loading simulation from {sim_file}.')
     sim = task.read_free_recall(sim_file, block=False, block_category=False)
+    logging.info(f'Loading network patterns from {patterns_file}.')
+    patterns = task.load_patterns(patterns_file)
+
+    # make plots and report
+    category = plot_fit_figs(data, sim, patterns, fit_dir, ext)
+    write_fit_report(fit_dir, category, ext)
+
+
+def plot_fit_figs(data, sim, patterns, fit_dir, ext='svg'):
+    """
+    Plot statistics of data and a model simulation.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Free recall data in merged format.
+
+    sim : pandas.DataFrame
+        Simulated data in merged format.
+
+    patterns : dict
+        Network patterns, including semantic vectors.
+
+    fit_dir : str
+        Path to model fit directory. Figures are saved in a figs
+        subdirectory.
+
+    ext : str, optional
+        Figure file type.
+
+    Returns
+    -------
+    category : bool
+        True if category-based analyses were included.
+    """
     category = 'category' in sim.columns
 
     # prep semantic similarity
-    logging.info(f'Loading network patterns from {patterns_file}.')
-    patterns = cmr.load_patterns(patterns_file)
     distances = distance.squareform(
         distance.pdist(patterns['vector']['use'], 'correlation')
     )
     edges = np.linspace(0.05, 0.95, 10)
+    data = data.copy()
     data['item_index'] = fr.pool_index(data['item'], patterns['items'])
 
     # concatenate for analysis
@@ -316,7 +349,11 @@ def plot_fit(data_file, patterns_file, fit_dir, ext):
             **kwargs,
         )
 
-    # report
+    return category
+
+
+def write_fit_report(fit_dir, category, ext='svg'):
+    """Write an HTML report of figures and parameters for a model fit."""
     if category:
         curves = [
             'spc',
@@ -338,8 +375,12 @@ def plot_fit(data_file, patterns_file, fit_dir, ext):
         curves = ['spc', 'pfr', 'lag_crp', 'use_crp']
         points = {'lag_rank': ['lag_rank'], 'use_rank': ['use_rank']}
         grids = curves.copy()
+    prev_dir = os.getcwd()
     os.chdir(fit_dir)
-    render_fit_html('.', curves, points, grids)
+    try:
+        render_fit_html('.', curves, points, grids, ext)
+    finally:
+        os.chdir(prev_dir)
 
 
 def get_param_latex():
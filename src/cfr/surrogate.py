@@ -0,0 +1,614 @@
+"""Emulate expensive model evaluations with surrogate models."""
+
+import os
+import json
+import time
+import logging
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+import click
+from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import make_pipeline
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import ConstantKernel, Matern, WhiteKernel
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from cymr import cmr
+from cfr import task
+from cfr import framework
+from cfr import sweep
+
+
+def fit_surrogate(points, values, method='gp', seed=None):
+    """
+    Fit a surrogate model to evaluated parameter points.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        [points x parameters] array of parameter values.
+
+    values : numpy.ndarray
+        [points x outputs] array of values at each point, such as log
+        likelihood or summary statistics.
+
+    method : {'gp', 'rf'}, optional
+        Gaussian process or random forest regression.
+
+    seed : int or numpy.random.Generator, optional
+        Seed for optimizer restarts (gp) or bootstrap samples (rf).
+
+    Returns
+    -------
+    model : sklearn.pipeline.Pipeline
+        Fitted regression model, with parameters standardized before
+        fitting.
+    """
+    rng = np.random.default_rng(seed)
+    random_state = int(rng.integers(2**31))
+    if method == 'gp':
+        n_param = points.shape[1]
+        matern = Matern(length_scale=np.ones(n_param), nu=2.5)
+        noise = WhiteKernel(noise_level=1e-3, noise_level_bounds=(1e-10, 1e1))
+        kernel = ConstantKernel() * matern + noise
+        regressor = GaussianProcessRegressor(
+            kernel, normalize_y=True, n_restarts_optimizer=2, random_state=random_state
+        )
+    elif method == 'rf':
+        regressor = RandomForestRegressor(
+            n_estimators=200, min_samples_leaf=2, random_state=random_state
+        )
+    else:
+        raise ValueError(f'Invalid surrogate method: {method}')
+    model = make_pipeline(StandardScaler(), regressor)
+    values = np.asarray(values)
+    if values.ndim == 2 and values.shape[1] == 1:
+        # single outputs are expected as a vector
+        values = values.ravel()
+    model.fit(points, values)
+    return model
+
+
+def predict_surrogate(model, points):
+    """
+    Predict values and their uncertainty at parameter points.
+
+    Parameters
+    ----------
+    model : sklearn.pipeline.Pipeline
+        Model from fit_surrogate.
+
+    points : numpy.ndarray
+        [points x parameters] array of parameter values.
+
+    Returns
+    -------
+    mean : numpy.ndarray
+        [points x outputs] array of predicted values.
+
+    std : numpy.ndarray
+        [points x outputs] array of prediction uncertainty. For a
+        random forest, this is the standard deviation over trees.
+    """
+    scaled = model[:-1].transform(points)
+    regressor = model[-1]
+    if isinstance(regressor, GaussianProcessRegressor):
+        mean, std = regressor.predict(scaled, return_std=True)
+    else:
+        tree_pred = np.stack([tree.predict(scaled) for tree in regressor.estimators_])
+        mean = tree_pred.mean(axis=0)
+        std = tree_pred.std(axis=0)
+    mean = mean.reshape((len(points), -1))
+    std = std.reshape((len(points), -1))
+    return mean, std
+
+
+def stat_vector(stats, stat_names, n_point=None):
+    """
+    Concatenate summary statistics into one vector for each point.
+
+    Parameters
+    ----------
+    stats : dict
+        Statistics from summarize_sim (one point) or run_sweep (a set
+        of points indexed along the first dimension).
+
+    stat_names : list of str
+        Statistics to include, in order.
+
+    n_point : int, optional
+        Number of points in the statistics. If not specified, the
+        statistics are for a single point.
+
+    Returns
+    -------
+    vector : numpy.ndarray
+        [points x outputs] array of statistics.
+    """
+    n_point = 1 if n_point is None else n_point
+    arrays = [np.asarray(stats[name], dtype=float) for name in stat_names]
+    return np.hstack([a.reshape((n_point, -1)) for a in arrays])
+
+
+def stat_discrepancy(values, target):
+    """Mean squared difference from target statistics, ignoring missing values."""
+    diff = (values - target) ** 2
+    return np.nanmean(diff, axis=1)
+
+
+def fill_missing(values):
+    """Fill undefined statistics with the mean over points, or zero."""
+    values = np.array(values, dtype=float)
+    missing = np.isnan(values)
+    count = np.sum(~missing, axis=0)
+    total = np.where(missing, 0, values).sum(axis=0)
+    col_mean = np.divide(total, count, out=np.zeros(len(count)), where=count > 0)
+    values[missing] = np.take(col_mean, np.nonzero(missing)[1])
+    return values
+
+
+def emulate_search(
+    evaluate,
+    param_bounds,
+    objective=None,
+    n_init=32,
+    n_iter=4,
+    n_propose=8,
+    n_candidate=2000,
+    method='gp',
+    kappa=1.0,
+    seed=None,
+):
+    """
+    Search a parameter space using a surrogate model to propose points.
+
+    An initial Latin hypercube design is evaluated, and a surrogate is
+    fit to the results. On each iteration, a large sample of candidate
+    points is scored using the surrogate, and the candidates with the
+    highest upper confidence bound are evaluated. Real evaluations are
+    therefore concentrated in promising regions of the space.
+
+    Parameters
+    ----------
+    evaluate : callable
+        Function that takes a [points x parameters] array and returns
+        a [points x outputs] array of values.
+
+    param_bounds : dict of (str: tuple of float)
+        Lower and upper bounds of each parameter.
+
+    objective : callable, optional
+        Function that takes a [points x outputs] array and returns a
+        score to maximize for each point. Default is the first output.
+
+    n_init : int, optional
+        Number of points in the initial design.
+
+    n_iter : int, optional
+        Number of proposal iterations.
+
+    n_propose : int, optional
+        Number of points to evaluate on each iteration.
+
+    n_candidate : int, optional
+        Number of candidate points to score on each iteration.
+
+    method : {'gp', 'rf'}, optional
+        Surrogate model type.
+
+    kappa : float, optional
+        Weight on prediction uncertainty when scoring candidates.
+
+    seed : int or numpy.random.SeedSequence, optional
+        Seed for sampling and surrogate fitting.
+
+    Returns
+    -------
+    res : dict
+        Evaluated points (:code:`points`), values (:code:`values`),
+        the iteration each point was evaluated on (:code:`iteration`,
+        with 0 for the initial design), the surrogate fit to all points
+        (:code:`model`), and the time spent on real evaluations
+        (:code:`eval_time`) and surrogate fitting and prediction
+        (:code:`surrogate_time`).
+    """
+    if objective is None:
+
+        def objective(values):
+            return values[:, 0]
+
+    rng = np.random.default_rng(seed)
+    t = time.perf_counter()
+    points = sweep.sample_points(param_bounds, n_init, 'lhs', rng)
+    values = np.asarray(evaluate(points), dtype=float).reshape((len(points), -1))
+    eval_time = time.perf_counter() - t
+    surrogate_time = 0
+    iteration = np.zeros(len(points), int)
+    for i in range(n_iter):
+        t = time.perf_counter()
+        model = fit_surrogate(points, fill_missing(values), method, rng)
+        candidates = sweep.sample_points(param_bounds, n_candidate, 'lhs', rng)
+        mean, std = predict_surrogate(model, candidates)
+        score = objective(mean) + kappa * std.mean(axis=1)
+        order = np.argsort(-score)
+        proposed = candidates[order[:n_propose]]
+        surrogate_time += time.perf_counter() - t
+
+        t = time.perf_counter()
+        new_values = np.asarray(evaluate(proposed), dtype=float)
+        eval_time += time.perf_counter() - t
+        points = np.vstack([points, proposed])
+        values = np.vstack([values, new_values.reshape((len(proposed), -1))])
+        iteration = np.hstack([iteration, np.full(len(proposed), i + 1)])
+        best = np.nanmax(objective(values))
+        logging.info(f'Iteration {i + 1}: {len(points)} evaluated; best={best:.4f}.')
+
+    t = time.perf_counter()
+    model = fit_surrogate(points, fill_missing(values), method, rng)
+    surrogate_time += time.perf_counter() - t
+    res = {
+        'points': points,
+        'values': values,
+        'iteration': iteration,
+        'model': model,
+        'eval_time': eval_time,
+        'surrogate_time': surrogate_time,
+    }
+    return res
+
+
+def prune_bounds(
+    model, param_bounds, objective=None, n_candidate=10000, quantile=0.1, seed=None
+):
+    """
+    Narrow parameter bounds to the region a surrogate predicts is promising.
+
+    Parameters
+    ----------
+    model : sklearn.pipeline.Pipeline
+        Model from fit_surrogate.
+
+    param_bounds : dict of (str: tuple of float)
+        Lower and upper bounds of each parameter.
+
+    objective : callable, optional
+        Function that takes a [points x outputs] array and returns a
+        score to maximize. Default is the first output.
+
+    n_candidate : int, optional
+        Number of candidate points to score.
+
+    quantile : float, optional
+        Fraction of candidates with the highest predicted score to
+        include within the pruned bounds.
+
+    seed : int or numpy.random.Generator, optional
+        Seed for sampling candidates.
+
+    Returns
+    -------
+    pruned : dict of (str: tuple of float)
+        Bounds spanning the highest-scoring candidates.
+    """
+    candidates = sweep.sample_points(param_bounds, n_candidate, 'lhs', seed)
+    mean, _ = predict_surrogate(model, candidates)
+    score = mean[:, 0] if objective is None else objective(mean)
+    n_keep = max(int(np.ceil(quantile * n_candidate)), 1)
+    keep = candidates[np.argsort(-score)[:n_keep]]
+    pruned = {
+        name: (float(keep[:, j].min()), float(keep[:, j].max()))
+        for j, name in enumerate(param_bounds.keys())
+    }
+    return pruned
+
+
+def surrogate_report(model, test_points, test_values, eval_time, objective=None):
+    """
+    Compare surrogate predictions to full model evaluations.
+
+    Parameters
+    ----------
+    model : sklearn.pipeline.Pipeline
+        Model from fit_surrogate.
+
+    test_points : numpy.ndarray
+        [points x parameters] array of held-out points.
+
+    test_values : numpy.ndarray
+        [points x outputs] array of full evaluations at each point.
+
+    eval_time : float
+        Time in seconds taken to evaluate the test points.
+
+    objective : callable, optional
+        Function that takes a [points x outputs] array and returns a
+        score to maximize. Default is the first output.
+
+    Returns
+    -------
+    report : dict
+        Prediction accuracy (:code:`r2`, :code:`rmse`, the rank
+        correlation of objective scores, :code:`score_spearman`, and
+        whether the best test point was ranked first,
+        :code:`best_test_found`) and time per point for full
+        evaluation and surrogate prediction, with the resulting speedup.
+    """
+    if objective is None:
+
+        def objective(values):
+            return values[:, 0]
+
+    t = time.perf_counter()
+    mean, _ = predict_surrogate(model, test_points)
+    predict_time = time.perf_counter() - t
+
+    test_values = test_values.reshape(mean.shape)
+    defined = np.all(np.isfinite(test_values), axis=0)
+    r2 = r2_score(test_values[:, defined], mean[:, defined])
+    rmse = np.sqrt(np.nanmean((test_values - mean) ** 2))
+    score = objective(test_values)
+    pred_score = objective(mean)
+    spearman = pd.Series(score).corr(pd.Series(pred_score), method='spearman')
+    n_point = len(test_points)
+    report = {
+        'n_test': n_point,
+        'r2': float(r2),
+        'rmse': float(rmse),
+        'score_spearman': float(spearman),
+        'best_test_score': float(np.nanmax(score)),
+        'best_test_found': bool(np.nanargmax(score) == np.argmax(pred_score)),
+        'eval_time_per_point': eval_time / n_point,
+        'predict_time_per_point': predict_time / n_point,
+        'speedup': eval_time / predict_time if predict_time > 0 else np.inf,
+    }
+    return report
+
+
+def _point_logl(prepared, param_def, patterns, subj_param, lists):
+    """Total log likelihood for one parameter point."""
+    model = framework.CFRModel()
+    stats = model.likelihood_lists(prepared, subj_param, param_def, patterns, lists)
+    return stats['logl'].sum()
+
+
+def point_param(subj_param, param_names, point):
+    """Replace parameters for each subject with values from a point."""
+    return {
+        subject: {**param, **dict(zip(param_names, point))}
+        for subject, param in subj_param.items()
+    }
+
+
+@click.command()
+@click.argument("data_file", type=click.Path(exists=True))
+@click.argument("patterns_file", type=click.Path(exists=True))
+@click.argument("fit_dir", type=click.Path(exists=True))
+@click.argument("res_dir", type=click.Path())
+@click.option(
+    "--param",
+    "-p",
+    "param_specs",
+    multiple=True,
+    help="parameter range to search (e.g., B_enc=0:1)",
+)
+@click.option(
+    "--objective",
+    type=click.Choice(['logl', 'stats']),
+    default='logl',
+    help="emulate total log likelihood or simulated summary statistics",
+)
+@click.option(
+    "--method",
+    type=click.Choice(['gp', 'rf']),
+    default='gp',
+    help="Gaussian process or random forest surrogate",
+)
+@click.option("--n-init", type=int, default=32, help="points in initial design")
+@click.option("--n-iter", type=int, default=4, help="proposal iterations")
+@click.option("--n-propose", type=int, default=8, help="points per iteration")
+@click.option(
+    "--n-test", type=int, default=16, help="held-out points for accuracy report"
+)
+@click.option(
+    "--n-grid",
+    "-g",
+    type=int,
+    default=0,
+    help="points per dimension of a predicted sweep grid (stats only)",
+)
+@click.option("--quantile", type=float, default=0.1, help="fraction kept in pruning")
+@click.option("--n-rep", "-r", type=int, default=1)
+@click.option(
+    "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
+)
+@click.option(
+    "--seed",
+    "-s",
+    type=int,
+    help="seed for random number generation (default: recorded fresh entropy)",
+)
+def emulate_cmr(
+    data_file,
+    patterns_file,
+    fit_dir,
+    res_dir,
+    param_specs,
+    objective='logl',
+    method='gp',
+    n_init=32,
+    n_iter=4,
+    n_propose=8,
+    n_test=16,
+    n_grid=0,
+    quantile=0.1,
+    n_rep=1,
+    n_jobs=1,
+    seed=None,
+):
+    """Search parameters around a fit using a surrogate model."""
+    os.makedirs(res_dir, exist_ok=True)
+    log_file = os.path.join(res_dir, 'log_emulate.txt')
+    logging.basicConfig(
+        filename=log_file,
+        filemode='w',
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s:%(name)s:%(message)s',
+    )
+
+    # base model and parameters
+    param_def = cmr.read_config(os.path.join(fit_dir, 'parameters.json'))
+    subj_param = framework.read_fit_param(os.path.join(fit_dir, 'fit.csv'))
+    patterns = task.load_patterns(patterns_file)
+    data = pd.read_csv(data_file)
+    data = data.loc[data['subject'].isin(subj_param.keys())]
+
+    # searched parameter ranges
+    param_bounds = {}
+    for spec in param_specs:
+        name, values = sweep.parse_sweep_spec(spec)
+        param_bounds[name] = (float(np.min(values)), float(np.max(values)))
+    if not param_bounds:
+        raise ValueError('Must specify at least one parameter to search.')
+    param_names = list(param_bounds.keys())
+    seed = framework.init_seed(param_def, seed)
+    param_def.to_json(os.path.join(res_dir, 'parameters.json'))
+
+    # full model evaluation
+    n_eval = [0]
+    if objective == 'logl':
+        model = framework.CFRModel()
+        prepared = model.prepare_subjects(data)
+        lists = {subject: prep[2] for subject, prep in prepared.items()}
+
+        def evaluate(points):
+            logl = Parallel(n_jobs=n_jobs)(
+                delayed(_point_logl)(
+                    prepared,
+                    param_def,
+                    patterns,
+                    point_param(subj_param, param_names, point),
+                    lists,
+                )
+                for point in points
+            )
+            return np.asarray(logl)[:, None]
+
+        score = None
+        stat_layout = None
+    else:
+        stat_kws = sweep.stat_options(patterns)
+        data_stats = sweep.summarize_sim(data, **stat_kws)
+        stat_names = list(data_stats.keys())
+        target = stat_vector(data_stats, stat_names)
+        stat_layout = {}
+
+        def evaluate(points):
+            results = sweep.run_sweep(
+                data,
+                param_def,
+                patterns,
+                subj_param,
+                param_names,
+                points,
+                n_rep=n_rep,
+                n_jobs=n_jobs,
+                seed=framework.spawn_seed(seed, 1, n_eval[0]),
+            )
+            n_eval[0] += 1
+            stat_layout.update(
+                {
+                    k: v
+                    for k, v in results.items()
+                    if any(k.startswith(f'{name}_') for name in stat_names)
+                }
+            )
+            return stat_vector(results, stat_names, len(points))
+
+        def score(values):
+            return -stat_discrepancy(values, target)
+
+    # surrogate search
+    logging.info(f'Searching {param_names} with a {method} surrogate.')
+    res = emulate_search(
+        evaluate,
+        param_bounds,
+        score,
+        n_init=n_init,
+        n_iter=n_iter,
+        n_propose=n_propose,
+        method=method,
+        seed=framework.spawn_seed(seed, 0),
+    )
+    n_search = len(res['points'])
+    logging.info(
+        f'Evaluated {n_search} point(s) in {res["eval_time"]:.2f} s; '
+        f'surrogate took {res["surrogate_time"]:.2f} s.'
+    )
+    pruned = prune_bounds(
+        res['model'],
+        param_bounds,
+        score,
+        quantile=quantile,
+        seed=np.random.default_rng(framework.spawn_seed(seed, 2)),
+    )
+
+    # accuracy and speed against full evaluations
+    rng = np.random.default_rng(framework.spawn_seed(seed, 3))
+    test_points = sweep.sample_points(param_bounds, n_test, 'lhs', rng)
+    t = time.perf_counter()
+    test_values = evaluate(test_points)
+    test_time = time.perf_counter() - t
+    report = surrogate_report(res['model'], test_points, test_values, test_time, score)
+    best = np.nanargmax(res['values'][:, 0] if score is None else score(res['values']))
+    report.update(
+        {
+            'objective': objective,
+            'method': method,
+            'param_names': param_names,
+            'bounds': param_bounds,
+            'pruned_bounds': pruned,
+            'n_search': n_search,
+            'search_eval_time': res['eval_time'],
+            'surrogate_time': res['surrogate_time'],
+            'best_point': dict(zip(param_names, res['points'][best].tolist())),
+        }
+    )
+    report_file = os.path.join(res_dir, 'report.json')
+    logging.info(f'Saving accuracy report to {report_file}.')
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    np.savez(
+        os.path.join(res_dir, 'emulator.npz'),
+        param_names=np.asarray(param_names, dtype=str),
+        points=res['points'],
+        values=res['values'],
+        iteration=res['iteration'],
+        test_points=test_points,
+        test_values=test_values,
+    )
+
+    # predicted summary statistics on a dense grid
+    if objective == 'stats' and n_grid > 0:
+        coords = {
+            name: np.linspace(lower, upper, n_grid)
+            for name, (lower, upper) in param_bounds.items()
+        }
+        points, shape, _ = sweep.grid_points(coords)
+        mean, _ = predict_surrogate(res['model'], points)
+        results = {}
+        start = 0
+        for name in stat_names:
+            stat_shape = np.shape(data_stats[name])
+            size = int(np.prod(stat_shape))
+            results[name] = mean[:, start : start + size].reshape(shape + stat_shape)
+            start += size
+        results.update(stat_layout)
+        for j, name in enumerate(param_names):
+            results[f'param_{name}'] = points[:, j].reshape(shape)
+        results['param_names'] = np.asarray(param_names, dtype=str)
+        results['stat_names'] = np.asarray(stat_names, dtype=str)
+        sweep_file = os.path.join(res_dir, 'sweep.npz')
+        logging.info(f'Saving predicted sweep to {sweep_file}.')
+        sweep.save_sweep(results, sweep_file)
@@ -0,0 +1,465 @@
+"""Run parameter sweeps and summarize simulated recall."""
+
+import os
+import logging
+from concurrent.futures import as_completed
+import numpy as np
+from scipy.spatial import distance
+from scipy.stats import qmc
+import pandas as pd
+import click
+from psifr import fr
+from cymr import cmr
+from cfr import task
+from cfr import framework
+
+
+def grid_points(param_sweeps):
+    """
+    Define points on an N-dimensional parameter grid.
+
+    Parameters
+    ----------
+    param_sweeps : dict of (str: array_like)
+        Values to sweep over for each parameter.
+
+    Returns
+    -------
+    points : numpy.ndarray
+        [points x parameters] array of parameter values, with the last
+        parameter varying fastest.
+
+    shape : tuple of int
+        Shape of the grid.
+
+    coords : dict of (str: numpy.ndarray)
+        Values of each parameter along each grid dimension.
+    """
+    coords = {name: np.asarray(values) for name, values in param_sweeps.items()}
+    mesh = np.meshgrid(*coords.values(), indexing='ij')
+    points = np.column_stack([m.ravel() for m in mesh])
+    shape = tuple(len(values) for values in coords.values())
+    return points, shape, coords
+
+
+def sample_points(param_bounds, n_sample, method='lhs', seed=None):
+    """
+    Sample points in a parameter space.
+
+    Parameters
+    ----------
+    param_bounds : dict of (str: tuple of float)
+        Lower and upper bounds of each parameter.
+
+    n_sample : int
+        Number of points to sample. For Sobol sampling, should be a
+        power of two.
+
+    method : {'lhs', 'sobol'}, optional
+        Latin hypercube or scrambled Sobol sampling.
+
+    seed : int or numpy.random.Generator, optional
+        Seed for sampling.
+
+    Returns
+    -------
+    points : numpy.ndarray
+        [points x parameters] array of parameter values.
+    """
+    d = len(param_bounds)
+    rng = np.random.default_rng(seed)
+    if method == 'lhs':
+        sampler = qmc.LatinHypercube(d=d, rng=rng)
+    elif method == 'sobol':
+        sampler = qmc.Sobol(d=d, rng=rng)
+    else:
+        raise ValueError(f'Invalid sampling method: {method}')
+    lower = [bounds[0] for bounds in param_bounds.values()]
+    upper = [bounds[1] for bounds in param_bounds.values()]
+    return qmc.scale(sampler.random(n_sample), lower, upper)
+
+
+def summarize_sim(sim, distances=None, edges=None):
+    """
+    Reduce simulated data to summary statistics.
+
+    Curves are pooled over subjects; serial position curves are
+    averaged over subjects, and conditional response probabilities are
+    calculated from actual and possible transitions summed over
+    subjects.
+
+    Parameters
+    ----------
+    sim : pandas.DataFrame
+        Simulated study and recall events.
+
+    distances : numpy.ndarray, optional
+        Distances between items in the pool. If specified, a distance
+        CRP is included.
+
+    edges : numpy.ndarray, optional
+        Edges of distance bins.
+
+    Returns
+    -------
+    stats : dict of (str: pandas.Series)
+        Statistics indexed by input position (spc), lag (lag_crp), or
+        distance bin center (use_crp). Category CRP (cat_crp) is a
+        scalar.
+    """
+    study_keys = [key for key in ['category', 'item_index'] if key in sim.columns]
+    merged = fr.merge_free_recall(sim, study_keys=study_keys)
+
+    def pooled(crp, key):
+        summed = crp.groupby(key)[['actual', 'possible']].sum()
+        return summed['actual'] / summed['possible']
+
+    stats = {
+        'spc': fr.spc(merged).groupby('input')['recall'].mean(),
+        'lag_crp': pooled(fr.lag_crp(merged), 'lag'),
+    }
+    if 'category' in merged.columns:
+        crp = fr.category_crp(merged, category_key='category')
+        stats['cat_crp'] = crp['actual'].sum() / crp['possible'].sum()
+    if distances is not None:
+        crp = fr.distance_crp(merged, 'item_index', distances, edges)
+        stats['use_crp'] = pooled(crp, 'center')
+    return stats
+
+
+def stat_options(patterns, edges=None):
+    """
+    Options for summarize_sim based on the model patterns.
+
+    If patterns include semantic vectors (:code:`use`), correlation
+    distances between items are included so that a distance CRP will
+    be calculated.
+    """
+    if edges is None:
+        edges = np.linspace(0.05, 0.95, 10)
+    stat_kws = {}
+    if 'vector' in patterns and 'use' in patterns['vector']:
+        vectors = patterns['vector']['use']
+        stat_kws['distances'] = distance.squareform(
+            distance.pdist(vectors, 'correlation')
+        )
+        stat_kws['edges'] = edges
+    return stat_kws
+
+
+def _run_point(subj_param, n_rep, seed):
+    """Simulate one sweep point and summarize it."""
+    inputs = framework.worker_inputs()
+    sim = framework.simulate_fit(
+        inputs['study_data'],
+        inputs['param_def'],
+        inputs['patterns'],
+        subj_param,
+        n_rep,
+        seed=seed,
+    )
+    return summarize_sim(sim, **inputs['stat_kws'])
+
+
+def run_sweep(
+    data,
+    param_def,
+    patterns,
+    subj_param,
+    param_names,
+    points,
+    shape=None,
+    n_rep=1,
+    n_jobs=1,
+    seed=None,
+    edges=None,
+):
+    """
+    Simulate a set of parameter points and summarize each simulation.
+
+    Each point is simulated and reduced to summary statistics in a
+    worker process, so that only the statistics are kept in memory.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Data with study events to simulate.
+
+    param_def : cymr.parameters.Parameters
+        Parameter definitions.
+
+    patterns : dict
+        Patterns to use in the model.
+
+    subj_param : dict of (subject: dict of (str: float))
+        Base parameters for each subject. Swept parameters replace
+        these values.
+
+    param_names : list of str
+        Names of swept parameters.
+
+    points : numpy.ndarray
+        [points x parameters] array of parameter values.
+
+    shape : tuple of int, optional
+        Shape of the parameter grid. If not specified, points are
+        indexed along one dimension.
+
+    n_rep : int, optional
+        Number of times to replicate the experiment at each point.
+
+    n_jobs : int, optional
+        Number of processes to run points in.
+
+    seed : int or numpy.random.SeedSequence, optional
+        Seed for simulations. Each point uses an independent stream.
+
+    edges : numpy.ndarray, optional
+        Edges of semantic distance bins for the distance CRP.
+
+    Returns
+    -------
+    results : dict of (str: numpy.ndarray)
+        Each statistic as an array with the shape of the grid followed
+        by the shape of the statistic, along with the value of each
+        swept parameter at each point and the coordinates of each
+        statistic dimension (e.g., :code:`spc_input`).
+    """
+    study_data = data.loc[data['trial_type'] == 'study']
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    if shape is None:
+        shape = (len(points),)
+    stat_kws = stat_options(patterns, edges)
+
+    def point_param(point):
+        return {
+            subject: {**param, **dict(zip(param_names, point))}
+            for subject, param in subj_param.items()
+        }
+
+    args = [
+        (point_param(point), n_rep, framework.spawn_seed(seed, i))
+        for i, point in enumerate(points)
+    ]
+
+    # reduce each point as it completes
+    results = {}
+    stat_names = []
+
+    def add_point(i, stats):
+        for name, stat in stats.items():
+            if name not in results:
+                stat_names.append(name)
+                results[name] = np.full((len(points),) + np.shape(stat), np.nan)
+                if isinstance(stat, pd.Series):
+                    results[f'{name}_{stat.index.name}'] = stat.index.to_numpy()
+            results[name][i] = np.asarray(stat)
+
+    pool = framework.worker_pool(
+        n_jobs,
+        study_data=study_data,
+        param_def=param_def,
+        patterns=patterns,
+        stat_kws=stat_kws,
+    )
+    with pool as executor:
+        if executor is None:
+            for i, point_args in enumerate(args):
+                add_point(i, _run_point(*point_args))
+        else:
+            futures = {
+                executor.submit(_run_point, *point_args): i
+                for i, point_args in enumerate(args)
+            }
+            for n, future in enumerate(as_completed(futures)):
+                add_point(futures[future], future.result())
+                logging.info(f'Finished {n + 1} of {len(points)} point(s).')
+
+    # reshape to grid dimensions
+    for name in stat_names:
+        results[name] = results[name].reshape(shape + results[name].shape[1:])
+    for j, name in enumerate(param_names):
+        results[f'param_{name}'] = points[:, j].reshape(shape)
+    results['param_names'] = np.asarray(param_names, dtype=str)
+    results['stat_names'] = np.asarray(stat_names, dtype=str)
+    return results
+
+
+def save_sweep(results, sweep_file):
+    """Save sweep results to an NPZ file."""
+    np.savez(sweep_file, **results)
+
+
+def read_sweep(sweep_file):
+    """Read sweep results from an NPZ file."""
+    with np.load(sweep_file, allow_pickle=False) as f:
+        results = {key: f[key] for key in f.files}
+    return results
+
+
+def sweep_frame(results, stat):
+    """
+    Convert one statistic from sweep results to a DataFrame.
+
+    Parameters
+    ----------
+    results : dict of (str: numpy.ndarray)
+        Results from run_sweep or read_sweep.
+
+    stat : str
+        Name of the statistic to convert.
+
+    Returns
+    -------
+    frame : pandas.DataFrame
+        Statistic in long format, with a column for each swept
+        parameter and statistic dimension (e.g., lag).
+    """
+    param_names = results['param_names'].tolist()
+    values = results[stat]
+    n_grid = results[f'param_{param_names[0]}'].ndim
+    grid_shape = values.shape[:n_grid]
+    n_point = int(np.prod(grid_shape))
+    flat = values.reshape((n_point, -1))
+    frame = pd.DataFrame(
+        {name: results[f'param_{name}'].ravel() for name in param_names}
+    )
+    dim_keys = [key for key in results if key.startswith(f'{stat}_')]
+    if dim_keys:
+        dim_name = dim_keys[0][len(stat) + 1 :]
+        dim_values = results[dim_keys[0]]
+        frame = frame.loc[np.repeat(frame.index, len(dim_values))]
+        frame[dim_name] = np.tile(dim_values, n_point)
+        frame = frame.reset_index(drop=True)
+    frame[stat] = flat.ravel()
+    return frame
+
+
+def parse_sweep_spec(spec):
+    """
+    Parse a parameter sweep specification.
+
+    Specifications may be a list of values (B_enc=0.2,0.4,0.6), a
+    range of evenly spaced values (B_enc=0:1:11), or a range of values
+    to sample from (B_enc=0:1).
+    """
+    name, values = spec.split('=')
+    if ',' in values:
+        return name, np.array(values.split(','), dtype=float)
+    parts = values.split(':')
+    if len(parts) == 3:
+        return name, np.linspace(float(parts[0]), float(parts[1]), int(parts[2]))
+    elif len(parts) == 2:
+        return name, (float(parts[0]), float(parts[1]))
+    else:
+        return name, np.array([float(values)])
+
+
+@click.command()
+@click.argument("data_file", type=click.Path(exists=True))
+@click.argument("patterns_file", type=click.Path(exists=True))
+@click.argument("fit_dir", type=click.Path(exists=True))
+@click.argument("res_dir", type=click.Path())
+@click.option(
+    "--param",
+    "-p",
+    "param_specs",
+    multiple=True,
+    help="parameter to sweep (e.g., B_enc=0:1:11, B_enc=0.2,0.4, or B_enc=0:1)",
+)
+@click.option(
+    "--sample",
+    type=click.Choice(['grid', 'lhs', 'sobol']),
+    default='grid',
+    help="grid of values, or Latin hypercube or Sobol samples within ranges",
+)
+@click.option(
+    "--n-sample", "-m", type=int, default=64, help="number of points to sample"
+)
+@click.option("--n-rep", "-r", type=int, default=1)
+@click.option(
+    "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
+)
+@click.option(
+    "--seed",
+    "-s",
+    type=int,
+    help="seed for random number generation (default: recorded fresh entropy)",
+)
+def sweep_cmr(
+    data_file,
+    patterns_file,
+    fit_dir,
+    res_dir,
+    param_specs,
+    sample='grid',
+    n_sample=64,
+    n_rep=1,
+    n_jobs=1,
+    seed=None,
+):
+    """Simulate a parameter sweep around a fit and summarize recall."""
+    os.makedirs(res_dir, exist_ok=True)
+    log_file = os.path.join(res_dir, 'log_sweep.txt')
+    logging.basicConfig(
+        filename=log_file,
+        filemode='w',
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s:%(name)s:%(message)s',
+    )
+
+    # parameters to sweep
+    specs = dict(parse_sweep_spec(spec) for spec in param_specs)
+    if not specs:
+        raise ValueError('Must specify at least one parameter to sweep.')
+    param_names = list(specs.keys())
+    ranges = [name for name, values in specs.items() if isinstance(values, tuple)]
+    values = [name for name in param_names if name not in ranges]
+    if sample == 'grid' and ranges:
+        raise click.BadParameter(
+            f'Grid sweeps need a number of points for each range '
+            f'(e.g., {ranges[0]}=0:1:11), or use --sample lhs or sobol.',
+            param_hint="'--param'",
+        )
+    if sample != 'grid' and values:
+        raise click.BadParameter(
+            f'Sampled sweeps need a range without a number of points for each '
+            f'parameter (e.g., {values[0]}=0:1), or use --sample grid.',
+            param_hint="'--param'",
+        )
+
+    # base model and parameters
+    param_def = cmr.read_config(os.path.join(fit_dir, 'parameters.json'))
+    subj_param = framework.read_fit_param(os.path.join(fit_dir, 'fit.csv'))
+    patterns = task.load_patterns(patterns_file)
+    data = pd.read_csv(data_file)
+    data = data.loc[data['subject'].isin(subj_param.keys())]
+
+    # points to simulate
+    seed = framework.init_seed(param_def, seed)
+    if sample == 'grid':
+        points, shape, _ = grid_points(specs)
+    else:
+        rng = np.random.default_rng(framework.spawn_seed(seed, 0))
+        points = sample_points(specs, n_sample, sample, rng)
+        shape = None
+    param_def.to_json(os.path.join(res_dir, 'parameters.json'))
+    logging.info(f'Simulating {len(points)} point(s) using {n_jobs} core(s).')
+
+    # run sweep and save summary statistics
+    results = run_sweep(
+        data,
+        param_def,
+        patterns,
+        subj_param,
+        param_names,
+        points,
+        shape,
+        n_rep,
+        n_jobs,
+        framework.spawn_seed(seed, 1),
+    )
+    sweep_file = os.path.join(res_dir, 'sweep.npz')
+    logging.info(f'Saving sweep results to {sweep_file}.')
+    save_sweep(results, sweep_file)
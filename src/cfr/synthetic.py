@@ -0,0 +1,453 @@
+"""Generate synthetic CFR datasets of any size."""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from scipy import special
+import click
+from cfr import framework
+from cfr import task
+
+CATEGORIES = ['cel', 'loc', 'obj']
+
+# group means giving about 10 recalls of 24 items with moderate
+# contiguity and category clustering
+DEFAULT_PARAM = {
+    'Lfc': 0.2,
+    'Lcf': 0.2,
+    'P1': 1.5,
+    'P2': 1,
+    'B_enc': 0.7,
+    'B_start': 0.3,
+    'B_rec': 0.8,
+    'X1': 0.01,
+    'X2': 0.3,
+    'w0': 0.95,
+    'w1': 0.1,
+}
+
+
+def make_pool(n_item=256, categories=None, n_dim=300, cat_weight=1.0, seed=None):
+    """
+    Make an item pool with category structure in semantic vectors.
+
+    Parameters
+    ----------
+    n_item : int, optional
+        Number of items in each category.
+
+    categories : list of str, optional
+        Category labels. Default is the CFR categories.
+
+    n_dim : int, optional
+        Dimensionality of semantic vectors.
+
+    cat_weight : float, optional
+        Weight of a shared category vector relative to item-specific
+        noise. Larger values give greater within-category similarity.
+
+    seed : int or numpy.random.Generator, optional
+        Seed for generating vectors.
+
+    Returns
+    -------
+    pool : pandas.DataFrame
+        Item name, index, and category of each item.
+
+    patterns : dict
+        Localist (:code:`loc`), category (:code:`cat`), and semantic
+        (:code:`use`) patterns, in the format returned by
+        cymr.cmr.load_patterns.
+    """
+    rng = np.random.default_rng(seed)
+    if categories is None:
+        categories = CATEGORIES
+    category = np.repeat(categories, n_item)
+    items = np.array(
+        [f'{c.upper()}{i:04d}' for c in categories for i in range(1, n_item + 1)]
+    )
+    pool = pd.DataFrame(
+        {'item': items, 'item_index': np.arange(len(items)), 'category': category}
+    )
+
+    # semantic vectors scaled as in save_patterns_sem
+    cat = (category[:, None] == np.asarray(categories)).astype(float)
+    centers = rng.standard_normal((len(categories), n_dim))
+    use = cat_weight * cat @ centers + rng.standard_normal((len(items), n_dim))
+    use = (use - use.mean(1, keepdims=True)) / use.std(1, keepdims=True)
+    use /= np.sqrt(n_dim)
+
+    vector = {'loc': np.eye(len(items)), 'cat': cat, 'use': use}
+    similarity = {name: np.dot(x, x.T) for name, x in vector.items()}
+    patterns = {'items': items, 'vector': vector, 'similarity': similarity}
+    return pool, patterns
+
+
+def block_categories(list_length, categories, block_len, rng):
+    """Sample category blocks, without repeating a category in adjacent blocks."""
+    list_cat = []
+    prev = None
+    while len(list_cat) < list_length:
+        curr = rng.choice([c for c in categories if c != prev])
+        list_cat.extend([curr] * rng.integers(block_len[0], block_len[1] + 1))
+        prev = curr
+    return np.array(list_cat[:list_length])
+
+
+def make_study(
+    pool,
+    n_subject,
+    n_list,
+    list_length=24,
+    n_session=1,
+    block_len=(2, 6),
+    p_pure=0,
+    seed=None,
+):
+    """
+    Make study events for a CFR-like experiment.
+
+    Mixed lists have blocks of same-category items, and pure lists have
+    items from a single category. Items are drawn from each category
+    without replacement, reshuffling when a category is used up.
+
+    Parameters
+    ----------
+    pool : pandas.DataFrame
+        Item pool, as from make_pool.
+
+    n_subject : int
+        Number of subjects.
+
+    n_list : int
+        Number of lists for each subject.
+
+    list_length : int, optional
+        Number of items in each list.
+
+    n_session : int, optional
+        Number of sessions to divide lists into.
+
+    block_len : tuple of int, optional
+        Minimum and maximum length of category blocks in mixed lists.
+
+    p_pure : float, optional
+        Probability of each list being a pure list.
+
+    seed : int or numpy.random.Generator, optional
+        Seed for list generation.
+
+    Returns
+    -------
+    study : pandas.DataFrame
+        Study events.
+    """
+    rng = np.random.default_rng(seed)
+    categories = pool['category'].unique()
+    cat_index = {c: np.flatnonzero(pool['category'] == c) for c in categories}
+    n_trial = n_list * list_length
+    columns = {
+        'subject': np.repeat(np.arange(1, n_subject + 1), n_trial),
+        'list': np.tile(np.repeat(np.arange(1, n_list + 1), list_length), n_subject),
+        'trial_type': 'study',
+        'position': np.tile(np.arange(1, list_length + 1), n_list * n_subject),
+    }
+    item_index = np.empty(n_subject * n_trial, int)
+    list_type = np.empty(n_subject * n_list, object)
+    list_category = np.empty(n_subject * n_list, object)
+    for i in range(n_subject):
+        order = {c: rng.permutation(ind) for c, ind in cat_index.items()}
+        used = {c: 0 for c in categories}
+        for j in range(n_list):
+            k = i * n_list + j
+            if rng.random() < p_pure:
+                list_cat = np.repeat(rng.choice(categories), list_length)
+                list_type[k] = 'pure'
+                list_category[k] = list_cat[0]
+            else:
+                list_cat = block_categories(list_length, categories, block_len, rng)
+                list_type[k] = 'mixed'
+                list_category[k] = 'mixed'
+            for c in np.unique(list_cat):
+                include = list_cat == c
+                n = include.sum()
+                if used[c] + n > len(order[c]):
+                    order[c] = rng.permutation(cat_index[c])
+                    used[c] = 0
+                start = k * list_length
+                trials = start + np.flatnonzero(include)
+                item_index[trials] = order[c][used[c] : used[c] + n]
+                used[c] += n
+
+    study = pd.DataFrame(columns)
+    study['item'] = pool['item'].to_numpy()[item_index]
+    study['item_index'] = item_index
+    study['category'] = pool['category'].to_numpy()[item_index]
+    study['session'] = (study['list'] - 1) * n_session // n_list + 1
+    study['list_type'] = np.repeat(list_type, list_length)
+    study['list_category'] = np.repeat(list_category, list_length)
+    return study
+
+
+def subject_param(param_def, subjects, start=None, spread=0.2, seed=None):
+    """
+    Sample parameters for each subject around a group mean.
+
+    Subject parameters vary around the mean in logit units of the
+    range of each parameter, so they stay within bounds and vary less
+    near a bound.
+
+    Parameters
+    ----------
+    param_def : cymr.parameters.Parameters
+        Parameter definitions.
+
+    subjects : list
+        Subject identifiers.
+
+    start : dict of (str: float), optional
+        Group mean of free parameters, updating DEFAULT_PARAM.
+        Parameters without a value are placed at the center of their
+        range.
+
+    spread : float, optional
+        Standard deviation of subject parameters around the mean, in
+        logit units.
+
+    seed : int or numpy.random.Generator, optional
+        Seed for sampling.
+
+    Returns
+    -------
+    subj_param : dict of (subject: dict of (str: float))
+        Parameters for each subject, including fixed parameters.
+    """
+    rng = np.random.default_rng(seed)
+    start = {**DEFAULT_PARAM, **({} if start is None else start)}
+    subj_param = {subject: param_def.fixed.copy() for subject in subjects}
+    for name, (lower, upper) in param_def.free.items():
+        center = start.get(name, (lower + upper) / 2)
+        scaled = np.clip((center - lower) / (upper - lower), 1e-6, 1 - 1e-6)
+        z = special.logit(scaled) + rng.normal(0, spread, len(subjects))
+        values = lower + special.expit(z) * (upper - lower)
+        for subject, value in zip(subjects, values):
+            subj_param[subject][name] = value
+    return subj_param
+
+
+def fill_recall(sim, study):
+    """Fill item and list information for recall events from study events."""
+    item_keys = ['subject', 'list', 'item']
+    item_cols = [c for c in ['item_index', 'category'] if c in study]
+    list_cols = [
+        c for c in ['session', 'list_type', 'list_category'] if c in study.columns
+    ]
+    recall = sim.loc[sim['trial_type'] == 'recall', ['subject', 'list', 'item']]
+    items = study[item_keys + item_cols].drop_duplicates(item_keys)
+    lists = study[['subject', 'list'] + list_cols].drop_duplicates(['subject', 'list'])
+    recall = recall.merge(items, on=item_keys, how='left')
+    recall = recall.merge(lists, on=['subject', 'list'], how='left')
+    filled = sim.copy()
+    is_recall = filled['trial_type'].to_numpy() == 'recall'
+    for column in item_cols + list_cols:
+        values = filled[column].to_numpy(dtype=object)
+        values[is_recall] = recall[column].to_numpy()
+        filled[column] = values
+        filled[column] = filled[column].astype(study[column].dtype)
+    return filled
+
+
+def generate_dataset(
+    n_subject,
+    n_list,
+    fcf_features='loc-cat-use',
+    ff_features=None,
+    sublayers=True,
+    start=None,
+    spread=0.2,
+    n_item=256,
+    n_dim=300,
+    list_length=24,
+    n_session=1,
+    block_len=(2, 6),
+    p_pure=0,
+    n_jobs=1,
+    seed=None,
+):
+    """
+    Generate a synthetic free recall dataset using CMR.
+
+    Parameters
+    ----------
+    n_subject, n_list : int
+        Number of subjects and number of lists for each subject.
+
+    fcf_features, ff_features : str, optional
+        Model features, separated by dashes, as in fit_cmr.
+
+    sublayers : bool, optional
+        If true, use a context sublayer for each feature.
+
+    start, spread
+        Group mean and spread of subject parameters; see subject_param.
+
+    n_item, n_dim
+        Items in each category and semantic dimensions; see make_pool.
+
+    list_length, n_session, block_len, p_pure
+        List design; see make_study.
+
+    n_jobs : int, optional
+        Number of processes to simulate subjects in.
+
+    seed : int, optional
+        Seed for generating the pool, lists, parameters, and recalls.
+
+    Returns
+    -------
+    data : pandas.DataFrame
+        Study and recall events in CFR format.
+
+    patterns : dict
+        Item patterns.
+
+    param_def : cymr.parameters.Parameters
+        Parameter definitions.
+
+    subj_param : dict of (int: dict of (str: float))
+        Parameters used to simulate each subject.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(4)
+    pool_seed, study_seed, param_seed, sim_seed = seeds
+    pool_rng = np.random.default_rng(pool_seed)
+    pool, patterns = make_pool(n_item, n_dim=n_dim, seed=pool_rng)
+    study = make_study(
+        pool,
+        n_subject,
+        n_list,
+        list_length,
+        n_session,
+        block_len,
+        p_pure,
+        np.random.default_rng(study_seed),
+    )
+    fcf = framework.split_arg(fcf_features)
+    ff = framework.split_arg(ff_features)
+    param_def = framework.model_variant(fcf, ff, sublayers=sublayers)
+    subjects = study['subject'].unique()
+    subj_param = subject_param(
+        param_def, subjects, start, spread, np.random.default_rng(param_seed)
+    )
+    sim = framework.simulate_fit(
+        study, param_def, patterns, subj_param, 1, n_jobs, sim_seed
+    )
+    data = fill_recall(sim, study)
+    return data, patterns, param_def, subj_param
+
+
+def save_patterns(h5_file, patterns):
+    """Save generated patterns to a standard-format HDF5 file."""
+    vector = patterns['vector']
+    n_item, n_cat = vector['cat'].shape
+    task.save_patterns(
+        h5_file,
+        patterns['items'],
+        loc=task.IndexPattern.identity(n_item),
+        cat=task.IndexPattern.one_hot(np.argmax(vector['cat'], 1), n_cat),
+        use=vector['use'],
+    )
+
+
+@click.command()
+@click.argument("out_dir", type=click.Path())
+@click.option("--n-subject", "-n", type=int, default=40, help="number of subjects")
+@click.option("--n-list", "-l", type=int, default=30, help="lists per subject")
+@click.option("--list-length", type=int, default=24, help="items per list")
+@click.option("--n-session", type=int, default=1, help="sessions per subject")
+@click.option("--p-pure", type=float, default=0, help="probability of a pure list")
+@click.option("--n-item", type=int, default=256, help="items per category")
+@click.option("--n-dim", type=int, default=300, help="semantic vector dimensions")
+@click.option("--fcf-features", "-f", default="loc-cat-use", help="fcf features")
+@click.option("--ff-features", default="none", help="ff features")
+@click.option("--sublayers/--no-sublayers", default=True)
+@click.option(
+    "--fixed",
+    help="dash-separated list of values of subject parameter means (e.g., B_rec=0.8)",
+)
+@click.option(
+    "--spread", type=float, default=0.2, help="spread of subject parameters (logit)"
+)
+@click.option("--data-format", type=click.Choice(['csv', 'npz']), default='csv')
+@click.option(
+    "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
+)
+@click.option("--seed", "-s", type=int, help="seed for random number generation")
+def synth_data(
+    out_dir,
+    n_subject,
+    n_list,
+    list_length,
+    n_session,
+    p_pure,
+    n_item,
+    n_dim,
+    fcf_features,
+    ff_features,
+    sublayers,
+    fixed,
+    spread,
+    data_format,
+    n_jobs,
+    seed,
+):
+    """Generate a synthetic dataset with patterns for scaling tests."""
+    start = None
+    if fixed is not None:
+        start = {}
+        for expr in fixed.split('-'):
+            name, value = expr.split('=')
+            start[name] = float(value)
+    data, patterns, param_def, subj_param = generate_dataset(
+        n_subject,
+        n_list,
+        fcf_features,
+        ff_features,
+        sublayers,
+        start,
+        spread,
+        n_item,
+        n_dim,
+        list_length,
+        n_session,
+        p_pure=p_pure,
+        n_jobs=n_jobs,
+        seed=seed,
+    )
+
+    # data, patterns, and the parameters used to generate them
+    os.makedirs(out_dir, exist_ok=True)
+    data_file = os.path.join(out_dir, f'data.{data_format}')
+    task.write_events(data, data_file)
+    save_patterns(os.path.join(out_dir, 'patterns.hdf5'), patterns)
+    param_def.set_options(seed=seed)
+    param_def.to_json(os.path.join(out_dir, 'parameters.json'))
+    param = pd.DataFrame.from_dict(subj_param, orient='index')
+    param.index.rename('subject', inplace=True)
+    param.to_csv(os.path.join(out_dir, 'param.csv'))
+    with open(os.path.join(out_dir, 'design.json'), 'w') as f:
+        json.dump(
+            {
+                'n_subject': n_subject,
+                'n_list': n_list,
+                'list_length': list_length,
+                'n_session': n_session,
+                'p_pure': p_pure,
+                'n_item': n_item,
+                'n_dim': n_dim,
+                'n_events': len(data),
+            },
+            f,
+            indent=4,
+        )
+    print(f'Saved {len(data)} events to {data_file}.')
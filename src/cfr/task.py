@@ -3,15 +3,19 @@
 import os
 import glob
 import re
+import json
 import shutil
+from collections.abc import Mapping
 import numpy as np
 from scipy import io
 from scipy import stats
 import matplotlib.pyplot as plt
-from skimage import transform
+from PIL import Image
 import pandas as pd
+import h5py
+from joblib import Parallel, delayed
+import click
 from psifr import fr
-from cymr import network
 from wikivector import vector
 
 
@@ -41,6 +45,20 @@ def set_list_columns(data, columns):
     return modified
 
 
+def fill_list_columns(data, columns):
+    """Set columns that are defined for each list, for all lists at once."""
+    modified = data.sort_values(['subject', 'list'], kind='stable')
+    modified = modified.reset_index(drop=True)
+    grouped = modified.groupby(['subject', 'list'])
+    n_unique = grouped[columns].nunique()
+    multiple = n_unique.columns[(n_unique > 1).any()]
+    if len(multiple) > 0:
+        raise ValueError(f"Column {multiple[0]} has multiple values.")
+    for column in columns:
+        modified[column] = grouped[column].transform('first')
+    return modified
+
+
 def get_prev_category(category):
     """Given current category for a list, get previous category."""
     category = np.asarray(category)
@@ -69,10 +87,8 @@ def label_block_category(data):
         if not prev:
             continue
         labeled.loc[df.index, 'base'] = np.setdiff1d(ucat, [curr, prev])[0]
-    labeled['prev'] = labeled['prev'].astype('category')
-    labeled['base'] = labeled['base'].astype('category')
-    labeled['prev'][labeled['prev'] == ''] = np.nan
-    labeled['base'][labeled['base'] == ''] = np.nan
+    labeled['prev'] = labeled['prev'].replace('', np.nan).astype('category')
+    labeled['base'] = labeled['base'].replace('', np.nan).astype('category')
     return labeled
 
 
@@ -103,12 +119,130 @@ def label_block(data):
     return labeled
 
 
+def _min_int_dtype(values):
+    """Get the smallest signed integer type that can hold values."""
+    for dtype in [np.int8, np.int16, np.int32]:
+        info = np.iinfo(dtype)
+        if values.min() >= info.min and values.max() <= info.max:
+            return dtype
+    return np.int64
+
+
+def write_events(data, events_file):
+    """
+    Write events to a CSV or compact NPZ file.
+
+    In NPZ files, integer-valued numeric columns are stored using the
+    smallest integer type that holds them. Other columns, such as item
+    strings, are stored as integer codes with an array of categories.
+    The original type of each column is stored and restored on reading.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Events to write.
+
+    events_file : str
+        Path to file to write. The format is determined by the
+        extension (.csv or .npz).
+    """
+    if str(events_file).endswith('.csv'):
+        data.to_csv(events_file, index=False)
+        return
+
+    arrays = {
+        'columns': np.asarray(data.columns, dtype=str),
+        'dtypes': np.asarray([str(dtype) for dtype in data.dtypes], dtype=str),
+    }
+    for column in data.columns:
+        x = data[column]
+        if pd.api.types.is_bool_dtype(x):
+            arrays[column] = x.to_numpy(dtype=bool)
+        elif pd.api.types.is_numeric_dtype(x):
+            values = x.to_numpy()
+            missing = np.isnan(values)
+            present = values[~missing]
+            if len(present) > 0 and np.all(present == np.round(present)):
+                # integer values, with missing values flagged separately
+                dtype = _min_int_dtype(present)
+                values = np.where(missing, 0, values).astype(dtype)
+                if missing.any():
+                    arrays[f'{column}__missing'] = missing
+            arrays[column] = values
+        else:
+            cat = pd.Categorical(x)
+            arrays[column] = cat.codes
+            arrays[f'{column}__categories'] = np.asarray(cat.categories, dtype=str)
+    np.savez(events_file, **arrays)
+
+
+def read_events(events_file, categorical=False):
+    """
+    Read events from a CSV or NPZ file.
+
+    Parameters
+    ----------
+    events_file : str
+        Path to a file written by write_events.
+
+    categorical : bool, optional
+        If true, coded columns in NPZ files are returned as categorical
+        columns. Otherwise, columns in NPZ files have the type they had
+        when written.
+
+    Returns
+    -------
+    data : pandas.DataFrame
+        Events.
+    """
+    if not str(events_file).endswith('.npz'):
+        return pd.read_csv(events_file)
+
+    with np.load(events_file, allow_pickle=False) as f:
+        d = {}
+        dtypes = {}
+        if 'dtypes' in f:
+            dtypes = dict(zip(f['columns'], f['dtypes']))
+        for column in f['columns']:
+            cat_key = f'{column}__categories'
+            missing_key = f'{column}__missing'
+            if cat_key in f:
+                codes = f[column]
+                if categorical:
+                    d[column] = pd.Categorical.from_codes(codes, f[cat_key])
+                    dtypes.pop(column, None)
+                else:
+                    categories = np.append(f[cat_key].astype(object), np.nan)
+                    d[column] = categories[codes]
+            elif missing_key in f:
+                x = f[column].astype(float)
+                x[f[missing_key]] = np.nan
+                d[column] = x
+            else:
+                d[column] = f[column]
+    data = pd.DataFrame(d)
+    if dtypes:
+        data = data.astype(dtypes)
+    return data
+
+
+def read_event_columns(events_file):
+    """Read the column names of an events file without reading the events."""
+    if not str(events_file).endswith('.npz'):
+        return pd.read_csv(events_file, nrows=0).columns.tolist()
+
+    with np.load(events_file, allow_pickle=False) as f:
+        return f['columns'].tolist()
+
+
 def read_study_recall(csv_file, block=True, block_category=True):
-    """Read study and recall data."""
-    if not os.path.exists(csv_file):
+    """Read study and recall data from a CSV or NPZ file or a DataFrame."""
+    if isinstance(csv_file, pd.DataFrame):
+        data = csv_file.copy()
+    elif not os.path.exists(csv_file):
         raise ValueError(f'Data file does not exist: {csv_file}')
-
-    data = pd.read_csv(csv_file)
+    else:
+        data = read_events(csv_file)
     if 'category' in data.columns:
         data = data.astype({'category': 'category'})
         data.category = data.category.cat.as_ordered()
@@ -128,8 +262,7 @@ def read_study_recall(csv_file, block=True, block_category=True):
     for field in fields:
         if field in data:
             list_keys += [field]
-    data = data.groupby(['subject', 'list']).apply(set_list_columns, list_keys)
-    data = data.reset_index(drop=True)
+    data = fill_list_columns(data, list_keys)
     return data
 
 
@@ -197,25 +330,207 @@ def read_similarity(sim_file):
     return sim
 
 
+class IndexPattern:
+    """
+    Binary pattern defined by matching row and column codes.
+
+    Element (i, j) is 1 if row i has the same code as column j, and 0
+    otherwise. This represents localist (identity), category (one-hot),
+    and same-category similarity patterns without storing the dense
+    matrix. Indexing returns a dense array, so models only expand the
+    rows they use.
+
+    Parameters
+    ----------
+    row_codes : numpy.ndarray
+        Code for each row.
+
+    col_codes : numpy.ndarray
+        Code for each column.
+
+    dtype : numpy.dtype, optional
+        Data type of expanded arrays.
+    """
+
+    ndim = 2
+
+    def __init__(self, row_codes, col_codes, dtype=float):
+        self.row_codes = np.asarray(row_codes)
+        self.col_codes = np.asarray(col_codes)
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def identity(cls, n, dtype=float):
+        """Localist pattern with one unit per item."""
+        return cls(np.arange(n), np.arange(n), dtype)
+
+    @classmethod
+    def one_hot(cls, codes, n_code=None, dtype=float):
+        """Pattern with one unit for each code, such as a category."""
+        if n_code is None:
+            n_code = np.max(codes) + 1
+        return cls(codes, np.arange(n_code), dtype)
+
+    @property
+    def shape(self):
+        return len(self.row_codes), len(self.col_codes)
+
+    def __len__(self):
+        return len(self.row_codes)
+
+    def __repr__(self):
+        return f'IndexPattern(shape={self.shape}, dtype={self.dtype})'
+
+    def similarity(self):
+        """Dot product similarity between rows."""
+        if len(np.unique(self.col_codes)) != len(self.col_codes):
+            raise ValueError('Similarity requires unique column codes.')
+        if not np.isin(self.row_codes, self.col_codes).all():
+            raise ValueError('Similarity requires a matching column for each row.')
+        return IndexPattern(self.row_codes, self.row_codes, self.dtype)
+
+    def _expand(self, rows, cols=slice(None)):
+        """Expand rows and columns of the pattern to a dense array."""
+        return np.equal.outer(self.row_codes[rows], self.col_codes[cols]).astype(
+            self.dtype
+        )
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        rows, cols = key
+        if isinstance(rows, slice) or np.ndim(rows) < 2:
+            if isinstance(cols, slice) or np.ndim(rows) == 0:
+                return self._expand(rows, cols)
+            # paired row and column indices
+            return np.equal(self.row_codes[rows], self.col_codes[cols]).astype(
+                self.dtype
+            )
+        # indices from np.ix_
+        return self._expand(np.ravel(rows), np.ravel(cols))
+
+    def toarray(self):
+        """Expand the full pattern to a dense array."""
+        return self._expand(slice(None))
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.toarray()
+        return array if dtype is None else array.astype(dtype)
+
+
+def save_patterns(h5_file, items, dtype=np.float32, block_size=1024, **kwargs):
+    """
+    Write patterns and similarity matrices to HDF5.
+
+    Writes the format of :code:`cymr.cmr.save_patterns`, with two
+    changes to reduce file size and loading time. Dense patterns and
+    their similarity matrices are stored as float32 by default, and
+    IndexPattern patterns are stored as codes only. Files without
+    IndexPattern patterns can still be read by cymr.
+
+    Parameters
+    ----------
+    h5_file : str
+        Path to hdf5 file to save patterns in.
+
+    items : list of str
+        Item strings corresponding to the patterns.
+
+    dtype : numpy.dtype, optional
+        Data type to store dense patterns in.
+
+    block_size : int, optional
+        Number of rows of similarity matrices to calculate at once.
+
+    Additional keyword arguments set named feature vectors. Each must
+    be an IndexPattern or an array with shape [items x units].
+    """
+    n_item = len(items)
+    with h5py.File(h5_file, 'w') as f:
+        dt = h5py.string_dtype()
+        f.create_dataset('items', data=np.asarray(items, dtype=object), dtype=dt)
+        features = np.asarray(list(kwargs.keys()), dtype=object)
+        f.create_dataset('features', data=features, dtype=dt)
+        for name, pattern in kwargs.items():
+            if isinstance(pattern, IndexPattern):
+                pattern.similarity()
+                f.create_dataset(f'index/{name}/rows', data=pattern.row_codes)
+                f.create_dataset(f'index/{name}/cols', data=pattern.col_codes)
+                continue
+
+            vectors = np.asarray(pattern, dtype=dtype)
+            f.create_dataset('vector/' + name, data=vectors)
+            sim = f.create_dataset('similarity/' + name, (n_item, n_item), dtype=dtype)
+            for start in range(0, n_item, block_size):
+                stop = min(start + block_size, n_item)
+                sim[start:stop] = np.dot(vectors[start:stop], vectors.T)
+
+
+def load_patterns(h5_file, features=None, dense=False):
+    """
+    Load patterns from an HDF5 file.
+
+    Parameters
+    ----------
+    h5_file : str
+        Path to file saved with save_patterns or
+        :code:`cymr.cmr.save_patterns`.
+
+    features : list of str, optional
+        Names of features to load. Default is to load all features.
+
+    dense : bool, optional
+        If true, expand IndexPattern patterns to dense arrays.
+
+    Returns
+    -------
+    patterns : dict of (str: dict of (str: numpy.array))
+        Loaded patterns in the format of :code:`cymr.cmr.load_patterns`.
+        Localist and category patterns may be IndexPattern objects.
+    """
+    with h5py.File(h5_file, 'r') as f:
+        patterns = {
+            'items': np.array(f['items'].asstr()[()].tolist()),
+            'vector': {},
+            'similarity': {},
+        }
+        if features is None:
+            features = f['features'].asstr()[()].tolist()
+
+        for name in features:
+            if f'index/{name}' in f:
+                vector = IndexPattern(
+                    f[f'index/{name}/rows'][()], f[f'index/{name}/cols'][()]
+                )
+                similarity = vector.similarity()
+                if dense:
+                    vector = vector.toarray()
+                    similarity = similarity.toarray()
+            else:
+                vector = f['vector/' + name][()]
+                similarity = f['similarity/' + name][()]
+            patterns['vector'][name] = vector
+            patterns['similarity'][name] = similarity
+    return patterns
+
+
 def save_patterns_sem(use_file, h5_file):
     """Read wiki2USE data and write semantic patterns."""
     patterns, items = vector.load_vectors(use_file)
 
     # localist patterns
-    loc_patterns = np.eye(len(items))
+    loc_patterns = IndexPattern.identity(len(items))
 
     # category patterns
     category = np.repeat(['cel', 'loc', 'obj'], 256)
-    cat_patterns = np.zeros((len(items), 3))
-    cat_names = np.unique(category)
-    for i in range(3):
-        cat_patterns[category == cat_names[i], i] = 1
+    cat_names, cat_codes = np.unique(category, return_inverse=True)
+    cat_patterns = IndexPattern.one_hot(cat_codes, len(cat_names))
 
     # use vectors
     use_z = stats.zscore(patterns, axis=1) / np.sqrt(patterns.shape[1])
 
     # write to standard format hdf5 file
-    network.save_patterns(h5_file, items, loc=loc_patterns, cat=cat_patterns, use=use_z)
+    save_patterns(h5_file, items, loc=loc_patterns, cat=cat_patterns, use=use_z)
 
 
 def read_pool_cfr(image_dir):
@@ -249,43 +564,456 @@ def read_pool_cfr(image_dir):
     return pool
 
 
-def save_pool_images(pool, image_dir):
+def normalize_item_names(items):
+    """Normalize item names for matching across files."""
+    items = pd.Series(items, dtype=object)
+    return items.str.strip().str.replace(r'\s+', ' ', regex=True).str.upper()
+
+
+def sort_pool(pool, items, strict=False):
+    """
+    Sort a pool to match a list of items.
+
+    Items are matched by name, ignoring case and extra whitespace.
+
+    Parameters
+    ----------
+    pool : pandas.DataFrame
+        Pool with an item column.
+
+    items : list of str
+        Item names in the desired order.
+
+    strict : bool, optional
+        If True, raise an error if any pool items are not in the list.
+        Otherwise, unmatched pool items are kept after the matched
+        items, in their original order.
+
+    Returns
+    -------
+    sorted_pool : pandas.DataFrame
+        Pool rows in the order of items.
+    """
+    pool_names = pd.Index(normalize_item_names(pool['item']))
+    if pool_names.has_duplicates:
+        duplicates = pool.loc[pool_names.duplicated(keep=False), 'item']
+        raise ValueError(f'Duplicate items in pool: {", ".join(duplicates)}')
+
+    item_names = normalize_item_names(items)
+    ind = pool_names.get_indexer(item_names)
+    if (ind < 0).any():
+        missing = pd.Series(items, dtype=object)[ind < 0]
+        raise ValueError(f'Items not found in pool: {", ".join(missing)}')
+
+    extra = np.setdiff1d(np.arange(len(pool)), ind)
+    if strict and len(extra) > 0:
+        unmatched = pool['item'].iloc[extra]
+        raise ValueError(f'Pool items not found in list: {", ".join(unmatched)}')
+    return pool.iloc[np.concatenate([ind, extra])].reset_index(drop=True)
+
+
+def save_pool_images(pool, image_dir, n_jobs=8):
     """Save pool images in standard format."""
-    if not os.path.exists(image_dir):
-        os.makedirs(image_dir)
+    for category in pool['category'].unique():
+        os.makedirs(os.path.join(image_dir, category), exist_ok=True)
+
+    # copying is limited by file I/O, so use threads
+    new_paths = pool_image_files(pool, image_dir)
+    Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(shutil.copy2)(old_path, new_path)
+        for old_path, new_path in zip(pool['filepath'], new_paths)
+    )
+
+
+def pool_image_files(pool, image_dir):
+    """Get the standard-format image file for each item in a pool."""
+    return [
+        os.path.join(image_dir, category, item + '.jpg')
+        for item, category in zip(pool['item'], pool['category'])
+    ]
+
+
+def resized_shape(shape, size=None, rescale=None):
+    """
+    Get the shape of an image after resizing.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Height and width of the image.
+
+    size : int, optional
+        Size of a square box to fit the image in, preserving aspect
+        ratio (as with ImageMagick :code:`-resize 300x300`).
+
+    rescale : float, optional
+        Factor to scale the image by, if size is not specified.
+
+    Returns
+    -------
+    new_shape : tuple of int
+        Height and width of the resized image.
+    """
+    height, width = shape
+    if size is not None:
+        scale = min(size / height, size / width)
+    elif rescale is not None:
+        scale = rescale
+    else:
+        return height, width
+    return max(1, round(height * scale)), max(1, round(width * scale))
+
+
+def read_image(image_file, shape=None):
+    """Read an image as a uint8 RGB array, optionally resized to a shape."""
+    with Image.open(image_file) as im:
+        im = im.convert('RGB')
+        if shape is not None and (im.height, im.width) != tuple(shape):
+            im = im.resize((shape[1], shape[0]), Image.LANCZOS)
+        return np.asarray(im, dtype=np.uint8)
+
+
+def _resize_images(image_files, out_files, size, rescale, quality):
+    """Resize a chunk of image files."""
+    for image_file, out_file in zip(image_files, out_files):
+        with Image.open(image_file) as im:
+            shape = resized_shape((im.height, im.width), size, rescale)
+        image = read_image(image_file, shape)
+        Image.fromarray(image).save(out_file, quality=quality)
+
+
+def _chunks(n, n_jobs):
+    """Split indices into chunks for parallel jobs."""
+    n_chunk = min(n, max(1, n_jobs) * 4)
+    return [c for c in np.array_split(np.arange(n), n_chunk) if len(c) > 0]
+
+
+def resize_images(
+    image_files, out_files, size=None, rescale=None, n_jobs=1, quality=95
+):
+    """
+    Resize image files in parallel.
+
+    Parameters
+    ----------
+    image_files : list of str
+        Paths to images to resize.
+
+    out_files : list of str
+        Paths to write resized images to.
+
+    size : int, optional
+        Size of a box to fit each image in; see resized_shape.
+
+    rescale : float, optional
+        Factor to scale images by, if size is not specified.
+
+    n_jobs : int, optional
+        Number of processes to use.
+
+    quality : int, optional
+        JPEG quality of resized images.
+    """
+    for out_dir in {os.path.dirname(out_file) for out_file in out_files}:
+        os.makedirs(out_dir, exist_ok=True)
+    Parallel(n_jobs=n_jobs)(
+        delayed(_resize_images)(
+            [image_files[i] for i in chunk],
+            [out_files[i] for i in chunk],
+            size,
+            rescale,
+            quality,
+        )
+        for chunk in _chunks(len(image_files), n_jobs)
+    )
+
+
+def _cache_images(images_file, image_files, index, shapes):
+    """Decode and resize a chunk of images into a cache array."""
+    images = np.load(images_file, mmap_mode='r+')
+    for image_file, i, (height, width) in zip(image_files, index, shapes):
+        images[i, :height, :width] = read_image(image_file, (height, width))
+    images.flush()
+
+
+def _cache_files(pool, image_dir):
+    """Get the sorted list of source files that an image cache depends on."""
+    if 'filepath' in pool:
+        return sorted(os.path.abspath(f) for f in pool['filepath'])
+    image_files = glob.glob(os.path.join(image_dir, '*', '*.jpg'))
+    return sorted(os.path.relpath(f, image_dir) for f in image_files)
+
+
+def build_image_cache(pool, image_dir, cache_dir, size=None, rescale=None, n_jobs=1):
+    """
+    Cache pool images in one memory-mapped array.
 
-    categories = pool['category'].unique()
-    sub_dir = {}
-    for category in categories:
-        sub_dir[category] = os.path.join(image_dir, category)
-        if not os.path.exists(sub_dir[category]):
-            os.makedirs(sub_dir[category])
+    Images are decoded and resized in parallel and written to a uint8
+    [items x height x width x 3] array, padded to the largest image.
+    An index records the item, category, shape, and source file of
+    each image.
 
-    for i, item in pool.iterrows():
-        old_path = item['filepath']
-        new_path = os.path.join(sub_dir[item['category']], item['item'] + '.jpg')
-        shutil.copy2(old_path, new_path)
+    Parameters
+    ----------
+    pool : pandas.DataFrame
+        Pool with item and category columns. If there is a filepath
+        column, images are read from those files; otherwise, they are
+        read from image_dir in standard format.
 
+    image_dir : str
+        Path to images in standard format, as written by
+        save_pool_images.
 
-def load_pool_images(pool, image_dir, rescale=None):
-    """Load pool images."""
+    cache_dir : str
+        Path to directory to write the cache to.
+
+    size : int, optional
+        Size of a box to fit each image in; see resized_shape.
+
+    rescale : float, optional
+        Factor to scale images by, if size is not specified.
+
+    n_jobs : int, optional
+        Number of processes to use.
+    """
+    if 'filepath' in pool:
+        image_files = pool['filepath'].tolist()
+    else:
+        image_files = pool_image_files(pool, image_dir)
+    for image_file in image_files:
+        if not os.path.exists(image_file):
+            raise IOError(f'Image file does not exist: {image_file}')
+
+    # get output shapes from the image headers
+    shapes = []
+    for image_file in image_files:
+        with Image.open(image_file) as im:
+            shapes.append(resized_shape((im.height, im.width), size, rescale))
+    shapes = np.array(shapes, dtype=int)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    images_file = os.path.join(cache_dir, 'images.npy')
+    index_file = os.path.join(cache_dir, 'index.csv')
+    if os.path.exists(index_file):
+        os.remove(index_file)
+    max_height, max_width = shapes.max(0)
+    images = np.lib.format.open_memmap(
+        images_file,
+        mode='w+',
+        dtype=np.uint8,
+        shape=(len(image_files), int(max_height), int(max_width), 3),
+    )
+    del images
+    Parallel(n_jobs=n_jobs)(
+        delayed(_cache_images)(
+            images_file, [image_files[i] for i in chunk], chunk, shapes[chunk]
+        )
+        for chunk in _chunks(len(image_files), n_jobs)
+    )
+
+    # the index is written last and marks the cache as complete
+    info = {'size': size, 'rescale': rescale, 'files': _cache_files(pool, image_dir)}
+    with open(os.path.join(cache_dir, 'info.json'), 'w') as f:
+        json.dump(info, f)
+    index = pd.DataFrame(
+        {
+            'item': pool['item'].to_numpy(),
+            'category': pool['category'].to_numpy(),
+            'height': shapes[:, 0],
+            'width': shapes[:, 1],
+            'filepath': [os.path.abspath(f) for f in image_files],
+            'mtime_ns': [os.stat(f).st_mtime_ns for f in image_files],
+        }
+    )
+    index.to_csv(index_file, index=False)
+
+
+def image_cache_valid(pool, image_dir, cache_dir, size=None, rescale=None):
+    """
+    Check if an image cache has current images for all items in a pool.
+
+    A cache is out of date if it was built with a different size or
+    rescaling, if image files have been added to or removed from the
+    image directory, or if any cached image file has been modified.
+
+    Parameters
+    ----------
+    pool : pandas.DataFrame
+        Pool with item and category columns, and optionally a filepath
+        column; see build_image_cache.
+
+    image_dir : str
+        Path to images in standard format.
+
+    cache_dir : str
+        Path to the image cache.
+
+    size : int, optional
+        Size the cache must have been built with.
+
+    rescale : float, optional
+        Rescaling the cache must have been built with.
+
+    Returns
+    -------
+    valid : bool
+        True if the cache can be used for the pool.
+    """
+    index_file = os.path.join(cache_dir, 'index.csv')
+    info_file = os.path.join(cache_dir, 'info.json')
+    if not os.path.exists(index_file) or not os.path.exists(info_file):
+        return False
+    with open(info_file, 'r') as f:
+        info = json.load(f)
+    files = _cache_files(pool, image_dir)
+    if info != {'size': size, 'rescale': rescale, 'files': files}:
+        return False
+    index = pd.read_csv(index_file).set_index('item')
+    if not pool['item'].isin(index.index).all():
+        return False
+    cached = index.loc[pool['item']]
+    for image_file, mtime in zip(cached['filepath'], cached['mtime_ns']):
+        if not os.path.exists(image_file) or os.stat(image_file).st_mtime_ns != mtime:
+            return False
+    return True
+
+
+class PoolImages(Mapping):
+    """
+    Pool images read on demand from an image cache.
+
+    Maps item names to float RGB arrays scaled from 0 to 1, as returned
+    by load_pool_images. The cache is memory-mapped, so only accessed
+    images are read into memory.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path to a cache written by build_image_cache.
+
+    items : list of str, optional
+        Items to include. Default is all cached items.
+    """
+
+    def __init__(self, cache_dir, items=None):
+        self.cache_dir = cache_dir
+        self.index = pd.read_csv(os.path.join(cache_dir, 'index.csv'))
+        self.index['position'] = np.arange(len(self.index))
+        self.index = self.index.set_index('item')
+        if items is not None:
+            self.index = self.index.loc[list(items)]
+        self._images = None
+
+    @property
+    def images(self):
+        """Memory-mapped array of all cached images."""
+        if self._images is None:
+            images_file = os.path.join(self.cache_dir, 'images.npy')
+            self._images = np.load(images_file, mmap_mode='r')
+        return self._images
+
+    def raw(self, item):
+        """Get an image as a uint8 array."""
+        position, height, width = self.index.loc[item, ['position', 'height', 'width']]
+        return self.images[position, :height, :width]
+
+    def __getitem__(self, item):
+        if item not in self.index.index:
+            raise KeyError(item)
+        return self.raw(item) / 255
+
+    def __iter__(self):
+        return iter(self.index.index)
+
+    def __len__(self):
+        return len(self.index)
+
+
+def load_pool_images(pool, image_dir, rescale=None, cache_dir=None, n_jobs=1):
+    """
+    Load pool images.
+
+    Parameters
+    ----------
+    pool : pandas.DataFrame
+        Pool with item and category columns.
+
+    image_dir : str
+        Path to images in standard format.
+
+    rescale : float, optional
+        Factor to scale images by.
+
+    cache_dir : str, optional
+        Path to an image cache. If specified, images are loaded on
+        demand from the cache, which is built first if it is missing
+        or out of date.
+
+    n_jobs : int, optional
+        Number of processes to use when building a cache.
+
+    Returns
+    -------
+    images : dict or PoolImages
+        Float RGB array for each item, with values from 0 to 1. Images
+        are resized by read_image whether or not a cache is used.
+    """
     if not os.path.exists(image_dir):
         raise IOError(f'Image directory does not exist: {image_dir}')
 
+    if cache_dir is not None:
+        if not image_cache_valid(pool, image_dir, cache_dir, rescale=rescale):
+            build_image_cache(
+                pool[['item', 'category']],
+                image_dir,
+                cache_dir,
+                rescale=rescale,
+                n_jobs=n_jobs,
+            )
+        return PoolImages(cache_dir, pool['item'])
+
+    # resize as when building a cache, so images match either way
     images = {}
-    for i, item in pool.iterrows():
-        image_file = os.path.join(image_dir, item['category'], item['item'] + '.jpg')
-        image = plt.imread(image_file)
-        if len(image.shape) == 2:
-            image = np.tile(image[:, :, None], 3)
-        image = np.asarray(image, dtype=float) / 255
-
-        if rescale is not None:
-            new_shape = np.array(image.shape).copy()
-            new_shape[:2] = new_shape[:2] * rescale
-            rescaled = transform.resize(image, new_shape)
-        else:
-            rescaled = np.asarray(image, dtype=float)
-
-        images[item['item']] = rescaled
+    for item, image_file in zip(pool['item'], pool_image_files(pool, image_dir)):
+        with Image.open(image_file) as im:
+            shape = resized_shape((im.height, im.width), rescale=rescale)
+        images[item] = read_image(image_file, shape) / 255
     return images
+
+
+def read_image_dir(image_dir):
+    """Read a pool of images in standard format from category directories."""
+    items = []
+    categories = []
+    for cat_dir in sorted(os.listdir(image_dir)):
+        cat_path = os.path.join(image_dir, cat_dir)
+        if not os.path.isdir(cat_path):
+            continue
+        for image_file in sorted(glob.glob(os.path.join(cat_path, '*.jpg'))):
+            items.append(os.path.splitext(os.path.basename(image_file))[0])
+            categories.append(cat_dir)
+    return pd.DataFrame({'item': items, 'category': categories})
+
+
+@click.command()
+@click.argument("src_dir", type=click.Path(exists=True, file_okay=False))
+@click.argument("dest_dir", type=click.Path())
+@click.option(
+    "--size", "-s", type=int, default=300, help="size of box to fit images in"
+)
+@click.option(
+    "--cache-dir", "-c", type=click.Path(), help="also cache resized images here"
+)
+@click.option(
+    "--n-jobs", "-j", type=int, default=1, help="number of parallel jobs to use"
+)
+def resize_pool_images(src_dir, dest_dir, size, cache_dir, n_jobs):
+    """Downsample images in category directories of SRC_DIR to DEST_DIR."""
+    pool = read_image_dir(src_dir)
+    image_files = pool_image_files(pool, src_dir)
+    out_files = pool_image_files(pool, dest_dir)
+    print(f'Resizing {len(pool)} images to fit in {size}x{size}.')
+    resize_images(image_files, out_files, size=size, n_jobs=n_jobs)
+    if cache_dir is not None:
+        print(f'Caching images in {cache_dir}.')
+        build_image_cache(pool, dest_dir, cache_dir, n_jobs=n_jobs)
@@ -0,0 +1,198 @@
+"""Test running batches of commands."""
+
+import os
+import shlex
+import sqlite3
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from cfr import batch
+
+
+def test_plan_jobs():
+    """Order planned commands by model directory."""
+    commands = [
+        'cfr-plot-fit -e png data.csv patterns.hdf5 fits/v1/cmr_fcf-loc',
+        'cfr-sim-cmr data.csv patterns.hdf5 fits/v1/cmr_fcf-loc -r 10',
+        'cfr-fit-cmr data.csv patterns.hdf5 loc none fits/v1/cmr_fcf-loc '
+        '--no-sublayers -t 0.000010 -n 1 -j 4 -r 1',
+        'cfr-fit-cmr data.csv patterns.hdf5 cat none fits/v1/cmr_fcf-cat '
+        '--no-sublayers -t 0.000010 -n 1 -j 2 -r 1',
+        'cfr-plot-fit data.csv patterns.hdf5 fits/v1/cmr_fcf-cat',
+    ]
+    jobs = batch.plan_jobs(commands)
+    assert jobs['n_jobs'].tolist() == [1, 1, 4, 2, 1]
+    assert jobs['depends'].tolist() == [[1], [2], [], [], [3]]
+
+
+def test_plan_command_paths(tmp_path, monkeypatch):
+    """Quote paths with spaces in planned commands."""
+    study_dir = tmp_path / 'my studies'
+    (study_dir / 'cfr').mkdir(parents=True)
+    (study_dir / 'cfr' / 'cfr_data.csv').write_text('')
+    (study_dir / 'cfr' / 'cfr_patterns.hdf5').write_text('')
+    monkeypatch.setenv('STUDYDIR', str(study_dir))
+    command = batch.command_fit_cmr('cfr', 'v1', 'loc', 'none', False, None, None)
+    program, model_dir, n_jobs = batch.parse_plan_command(command)
+    assert program == 'cfr-fit-cmr'
+    assert model_dir == str(study_dir / 'cfr' / 'fits' / 'v1' / 'cmr_fcf-loc')
+
+
+def test_run_plan(tmp_path):
+    """Run jobs after their dependencies and resume a plan."""
+    out_file = tmp_path / 'out.txt'
+    commands = [
+        f'sh -c "echo first >> {out_file}"',
+        'false',
+    ]
+    db_file = tmp_path / 'plan.db'
+    status = batch.run_plan(commands, db_file, n_cores=2)
+    assert status.tolist() == ['done', 'failed']
+
+    # finished jobs are not run again
+    status = batch.run_plan(commands, db_file, n_cores=2)
+    assert status.tolist() == ['done', 'failed']
+    assert out_file.read_text() == 'first\n'
+    con = sqlite3.connect(db_file)
+    rows = con.execute('SELECT status, returncode FROM jobs').fetchall()
+    assert rows == [('done', 0), ('failed', 1)]
+
+
+def test_run_plan_error(tmp_path, monkeypatch):
+    """Record a job as failed if running it raises an error."""
+
+    def run_command(command, log_file=None):
+        raise ValueError('No closing quotation')
+
+    monkeypatch.setattr(batch, 'run_command', run_command)
+    db_file = tmp_path / 'plan.db'
+    status = batch.run_plan(['true', 'false'], db_file, n_cores=1)
+    assert status.tolist() == ['failed', 'failed']
+    con = sqlite3.connect(db_file)
+    rows = con.execute('SELECT status FROM jobs').fetchall()
+    assert rows == [('failed',), ('failed',)]
+
+
+def test_run_command(tmp_path, monkeypatch):
+    """Run a command with and without resource usage."""
+    command = f'{shlex.quote(sys.executable)} -c "import sys; sys.exit(3)"'
+    log_file = tmp_path / 'log.txt'
+    returncode, runtime, max_rss = batch.run_command(command, log_file)
+    assert returncode == 3
+    assert runtime > 0
+    if hasattr(os, 'wait4'):
+        assert max_rss > 0
+
+    monkeypatch.delattr(os, 'wait4', raising=False)
+    returncode, runtime, max_rss = batch.run_command(command, log_file)
+    assert (returncode, max_rss) == (3, None)
+
+
+def test_stage_key(tmp_path):
+    """Change stage keys when input files or options change."""
+    data_file = tmp_path / 'data.csv'
+    data_file.write_text('subject,list\n1,1\n')
+    fig_dir = tmp_path / 'figs'
+    fig_dir.mkdir()
+    (fig_dir / 'spc.svg').write_text('<svg/>')
+
+    hashes = {}
+    key = batch.stage_key([data_file, fig_dir], {'ext': 'svg'}, hashes)
+    assert batch.stage_key([data_file, fig_dir], {'ext': 'svg'}, hashes) == key
+    assert batch.stage_key([data_file, fig_dir], {'ext': 'png'}, hashes) != key
+
+    (fig_dir / 'spc.svg').write_text('<svg></svg>')
+    assert batch.stage_key([data_file, fig_dir], {'ext': 'svg'}, hashes) != key
+
+
+def write_xval_split(split_dir, folds, subjects, n_rep=2):
+    """Write results of a cross-validation split."""
+    split_dir.mkdir()
+    (split_dir / 'parameters.json').write_text('{}')
+    (split_dir / 'log_xval.txt').write_text(f'{split_dir.name}\n')
+    index = pd.MultiIndex.from_product(
+        [folds, subjects, range(n_rep)], names=['fold', 'subject', 'rep']
+    )
+    search = pd.DataFrame({'logl': -np.arange(len(index)) / 3}, index=index)
+    search.to_csv(split_dir / 'xval_search.csv')
+    xval = search.groupby(['fold', 'subject']).max()
+    xval['logl_test'] = xval['logl'] / 2
+    xval.to_csv(split_dir / 'xval.csv')
+    return search.reset_index(), xval.reset_index()
+
+
+def test_join_xval(tmp_path):
+    """Merge cross-validation splits and append new splits."""
+    search1, xval1 = write_xval_split(tmp_path / 's1', [1, 2], [1, 3, 10])
+    search2, xval2 = write_xval_split(tmp_path / 's2', [1, 2], [2, 4])
+    out_dir = tmp_path / 'joined'
+    batch.join_xval_splits(out_dir, [tmp_path / 's1', tmp_path / 's2'])
+    expected = pd.concat([search1, search2]).sort_values(['fold', 'subject', 'rep'])
+    search = pd.read_csv(out_dir / 'xval_search.csv')
+    pd.testing.assert_frame_equal(search, expected.reset_index(drop=True))
+    assert (out_dir / 'log_xval.txt').read_text() == 's1\ns2\n'
+
+    # new folds are added to the end, and new subjects are merged
+    write_xval_split(tmp_path / 's3', [3], [1, 2, 3, 4, 10])
+    batch.join_xval_splits(out_dir, [tmp_path / 's3'], append=True)
+    write_xval_split(tmp_path / 's4', [1, 2, 3], [5])
+    missing = batch.join_xval_splits(out_dir, [tmp_path / 's4'], append=True)
+    assert missing.empty
+    xval = pd.read_csv(out_dir / 'xval.csv')
+    assert len(xval) == 3 * 6
+    assert xval.set_index(['fold', 'subject']).index.is_monotonic_increasing
+
+
+def test_join_xval_invalid(tmp_path):
+    """Check for duplicate and missing units when joining splits."""
+    write_xval_split(tmp_path / 's1', [1, 2], [1, 2])
+    write_xval_split(tmp_path / 's2', [2], [2, 3])
+    out_dir = tmp_path / 'joined'
+    with pytest.raises(ValueError, match='Duplicate'):
+        batch.join_xval_splits(out_dir, [tmp_path / 's1', tmp_path / 's2'])
+    assert not (out_dir / 'xval_search.csv').exists()
+
+    batch.join_xval_splits(out_dir, [tmp_path / 's1'])
+    with pytest.raises(ValueError, match='Duplicate'):
+        batch.join_xval_splits(out_dir, [tmp_path / 's2'], append=True)
+    assert len(pd.read_csv(out_dir / 'xval.csv')) == 4
+
+    # neither output changes if only the second merge fails
+    write_xval_split(tmp_path / 's5', [3], [1, 2])
+    xval = pd.read_csv(tmp_path / 's5' / 'xval.csv')
+    xval.iloc[[0, 0, 1]].to_csv(tmp_path / 's5' / 'xval.csv', index=False)
+    with pytest.raises(ValueError, match='Duplicate'):
+        batch.join_xval_splits(out_dir, [tmp_path / 's5'], append=True)
+    assert len(pd.read_csv(out_dir / 'xval_search.csv')) == 8
+    assert not list(out_dir.glob('*.tmp'))
+
+    write_xval_split(tmp_path / 's3', [1], [3])
+    with pytest.raises(ValueError, match='missing'):
+        batch.join_xval_splits(out_dir, [tmp_path / 's3'], append=True, strict=True)
+    assert len(pd.read_csv(out_dir / 'xval.csv')) == 4
+    missing = batch.join_xval_splits(out_dir, [tmp_path / 's3'], append=True)
+    assert list(missing.itertuples(index=False, name=None)) == [(2, 3)]
+
+
+def test_join_xval_unsorted(tmp_path):
+    """Join unsorted splits written by older versions of xval_cmr."""
+    search1, xval1 = write_xval_split(tmp_path / 's1', [1, 2], [1, 2])
+    search2, xval2 = write_xval_split(tmp_path / 's2', [1, 2], [3])
+    search1.iloc[::-1].to_csv(tmp_path / 's1' / 'xval_search.csv', index=False)
+    xval1.iloc[::-1].to_csv(tmp_path / 's1' / 'xval.csv', index=False)
+    out_dir = tmp_path / 'joined'
+    batch.join_xval_splits(out_dir, [tmp_path / 's1', tmp_path / 's2'])
+    expected = pd.concat([search1, search2]).sort_values(['fold', 'subject', 'rep'])
+    search = pd.read_csv(out_dir / 'xval_search.csv')
+    pd.testing.assert_frame_equal(search, expected.reset_index(drop=True))
+
+    # an unsorted joined output is sorted when merging new splits into it
+    xval = pd.read_csv(out_dir / 'xval.csv')
+    xval.iloc[::-1].to_csv(out_dir / 'xval.csv', index=False)
+    write_xval_split(tmp_path / 's3', [1, 2], [4])
+    missing = batch.join_xval_splits(out_dir, [tmp_path / 's3'], append=True)
+    assert missing.empty
+    xval = pd.read_csv(out_dir / 'xval.csv')
+    assert len(xval) == 2 * 4
+    assert xval.set_index(['fold', 'subject']).index.is_monotonic_increasing
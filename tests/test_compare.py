@@ -0,0 +1,79 @@
+"""Test model comparison statistics."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from cfr import framework
+from cfr import compare
+
+
+@pytest.fixture()
+def fits():
+    """Fit results for three models and eight subjects."""
+    rng = np.random.default_rng(1)
+    models = ['A', 'B', 'C']
+    subjects = np.arange(1, 9)
+    index = pd.MultiIndex.from_product([models, subjects], names=['model', 'subject'])
+    logl = rng.normal(-100, 5, size=len(index))
+    logl[8:16] += 20
+    res = pd.DataFrame(
+        {'logl': logl, 'n': 100, 'k': np.repeat([3, 4, 5], 8)}, index=index
+    )
+    return res
+
+
+def test_model_comp_weights(fits):
+    """Calculate Akaike weights for each subject."""
+    res = framework.model_comp_weights(fits)
+    pivot = res.reset_index().pivot(index='subject', columns='model', values='aic')
+    expected = framework.waic(pivot.to_numpy())
+    np.testing.assert_allclose(res['waic'].to_numpy(), expected.T.ravel())
+    np.testing.assert_allclose(res.groupby('subject')['waic'].sum(), 1)
+
+
+def test_stat_matrix(fits):
+    """Arrange results with multiple folds as an array."""
+    folds = pd.concat([fits, fits], keys=[1, 2], names=['fold'])
+    folds = folds.reset_index('fold').sample(frac=1, random_state=1)
+    values, subjects, models = compare.stat_matrix(folds, 'logl', ['C', 'A'])
+    np.testing.assert_array_equal(models, ['C', 'A'])
+    np.testing.assert_array_equal(subjects, np.arange(1, 9))
+    np.testing.assert_allclose(values[:, 1], fits.loc['A', 'logl'] * 2)
+
+
+def test_bootstrap_mean():
+    """Bootstrap means over subjects."""
+    x = np.column_stack([np.arange(10.0), np.ones(10)])
+    boot = compare.bootstrap_mean(x, n_boot=2000, seed=1, chunk_size=300)
+    assert boot.shape == (2000, 2)
+    np.testing.assert_allclose(boot[:, 1], 1)
+    assert abs(boot[:, 0].mean() - 4.5) < 0.1
+    lower, upper = compare.percentile_ci(boot)
+    assert lower[0] < 4.5 < upper[0]
+
+
+def test_bms():
+    """Estimate model frequencies and exceedance probabilities."""
+    lme = np.zeros((20, 2))
+    lme[:, 0] = 10
+    alpha, g, bor = compare.bms(lme)
+    np.testing.assert_allclose(alpha, [21, 1], atol=1e-3)
+    assert bor < 0.01
+    xp = compare.exceedance_prob(alpha, seed=1)
+    assert xp[0] > 0.99
+
+    # no difference between models
+    alpha, g, bor = compare.bms(np.zeros((20, 2)))
+    np.testing.assert_allclose(alpha, [11, 11])
+    assert bor > 0.5
+
+
+def test_compare_models(fits):
+    """Compare models on AIC."""
+    comp = compare.compare_models(fits, n_boot=500, n_sample=1000, seed=1)
+    assert comp.index.tolist() == ['A', 'B', 'C']
+    assert comp['aic'].idxmin() == 'B'
+    assert comp.loc['B', 'diff'] == 0
+    assert comp['pxp'].idxmax() == 'B'
+    np.testing.assert_allclose(comp['waic'].sum(), 1)
+    assert np.all(comp['aic_lower'] < comp['aic'])
@@ -0,0 +1,50 @@
+"""Test embedding items as patterns."""
+
+import numpy as np
+import pytest
+from cfr import embed
+from cfr import task
+
+
+class CountingEncoder(embed.HashingEncoder):
+    """Hashing encoder that records the items it embeds."""
+
+    def __init__(self):
+        super().__init__(n_dim=16)
+        self.embedded = []
+
+    def __call__(self, items):
+        self.embedded.extend(items)
+        return super().__call__(items)
+
+
+def test_embed_items_cache(tmp_path):
+    """Embed only items that are not already cached."""
+    encoder = CountingEncoder()
+    cache_file = tmp_path / 'cache.hdf5'
+    items = ['apple', 'banana', 'cherry']
+    expected = encoder(items)
+    encoder.embedded = []
+
+    vectors = embed.embed_items(items[:2], encoder, cache_file, batch_size=1)
+    np.testing.assert_allclose(vectors, expected[:2])
+    assert encoder.embedded == ['apple', 'banana']
+
+    vectors = embed.embed_items(items[::-1], encoder, cache_file)
+    np.testing.assert_allclose(vectors, expected[::-1])
+    assert encoder.embedded == ['apple', 'banana', 'cherry']
+
+    with pytest.raises(ValueError, match='not hash'):
+        embed.EmbeddingCache(cache_file, 'hash')
+
+
+def test_embed_patterns(tmp_path):
+    """Write patterns in the standard format."""
+    items = ['apple', 'banana', 'cherry', 'date', 'elderberry']
+    h5_file = tmp_path / 'patterns.hdf5'
+    embed.embed_patterns(h5_file, items, embed.HashingEncoder(), block_size=2)
+    patterns = task.load_patterns(h5_file, dense=True)
+    assert patterns['items'].tolist() == items
+    use = patterns['vector']['use']
+    np.testing.assert_allclose(patterns['similarity']['use'], use @ use.T, atol=1e-5)
+    np.testing.assert_array_equal(patterns['similarity']['loc'], np.eye(len(items)))
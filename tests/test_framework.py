@@ -1,6 +1,12 @@
 """Test code implementing the model framework."""
 
+import numpy as np
+import pandas as pd
+from click.testing import CliRunner
+from psifr import fr
+from cymr import cmr
 from cfr import framework
+from cfr import task
 
 
 def test_weight_param1():
@@ -172,3 +178,363 @@ def test_intercept_param_with_item_weights():
     wp = framework.model_variant(['loc', 'cat'], ['use'], sublayers=True, intercept=True)
     assert 'Aff' in wp.free
     assert wp.weights['ff'][('task', 'item')] == 'Aff + Dff * (use)'
+
+
+def test_list_ranks():
+    """Split training folds for subjects with different list counts."""
+    data = pd.DataFrame(
+        {'subject': [1, 1, 1, 1, 1, 2, 2, 2], 'list': [1, 1, 2, 3, 4, 5, 7, 7]}
+    )
+    list_rank = framework.list_ranks(data)
+    np.testing.assert_array_equal(list_rank, [0, 0, 1, 2, 3, 0, 1, 1])
+
+    # folds are interleaved over each subject's lists
+    list_fold = np.tile([1, 2], 2)
+    train_data = data[list_fold[list_rank] != 1]
+    assert train_data['list'].tolist() == [2, 4, 7, 7]
+
+
+def test_population_param():
+    """Evaluate dependent parameters for a population of candidates."""
+    wp = framework.model_variant(['loc', 'cat'], None, sublayers=False)
+    var_names = list(wp.free.keys())
+    population = np.array(
+        [[wp.free[name][0] for name in var_names], [0.5] * len(var_names)]
+    ).T
+    param_list = framework.population_param(wp, population, var_names)
+    assert len(param_list) == 2
+    for x, param in zip(population.T, param_list):
+        expected = wp.fixed.copy()
+        expected.update(dict(zip(var_names, x)))
+        expected = wp.eval_dependent(expected)
+        assert param.keys() == expected.keys()
+        for name, val in expected.items():
+            np.testing.assert_allclose(param[name], val)
+
+
+def test_restarts_converged():
+    """Check convergence of repeated searches."""
+    assert not framework.restarts_converged([-10.0, -12.0], 2, 0.01)
+    assert framework.restarts_converged([-10.0, -12.0, -10.005], 2, 0.01)
+    assert not framework.restarts_converged([-10.0], 2, 0.01)
+
+
+class FixedSearchModel(framework.CFRModel):
+    """Model with predetermined search results."""
+
+    def __init__(self, logl):
+        self.logl = logl
+        self.n_run = {}
+
+    def _run_fit_subject(self, data, subject, *args, **kwargs):
+        rep = self.n_run.get(subject, 0)
+        self.n_run[subject] = rep + 1
+        return {'x': rep, 'logl': self.logl[subject][rep], 'n': 10, 'k': 1}
+
+
+def test_fit_indiv_adaptive():
+    """Stop searches for a subject after the best fit is reproduced."""
+    data = pd.DataFrame({'subject': [1, 2]})
+    logl = {1: [-10.0, -10.0, -9.0, -9.0], 2: [-5.0, -6.0, -4.0, -4.0]}
+    model = FixedSearchModel(logl)
+    results = model.fit_indiv(data, None, n_jobs=1, n_rep=4, n_converge=2)
+    assert model.n_run == {1: 2, 2: 4}
+    assert results.index.tolist() == [(1, 0), (1, 1), (2, 0), (2, 1), (2, 2), (2, 3)]
+
+
+def test_map_fit_param():
+    """Map parameters from a related model onto free parameters."""
+    parent = framework.model_variant(['loc', 'cat'], None, sublayers=True)
+    param = parent.eval_dependent(
+        {**parent.fixed, **{name: 0.5 for name in parent.free.keys()}}
+    )
+    param['B_enc'] = 0.8
+
+    # sublayer copies of a parameter start from the base value
+    child = framework.model_variant(
+        ['loc', 'cat'], None, sublayers=True, sublayer_param=['B_enc', 'Lcf']
+    )
+    start = framework.map_fit_param(param, child)
+    assert start['B_enc_loc'] == 0.8
+    assert start['B_enc_cat'] == 0.8
+    assert start['Lcf_loc_raw'] == 0.5
+    assert set(start.keys()) == set(child.free.keys())
+
+    # base parameter starts from the mean of sublayer values
+    start = framework.map_fit_param({'B_enc_loc': 0.2, 'B_enc_cat': 0.4}, parent)
+    np.testing.assert_allclose(start['B_enc'], 0.3)
+
+
+def test_init_population():
+    """Sample an initial population around starting parameters."""
+    wp = framework.model_variant(['loc', 'cat'], None, sublayers=False)
+    rng = np.random.default_rng(1)
+    population = framework.init_population(wp, {'P1': 2.0}, 20, 0.1, rng)
+    var_names = list(wp.free.keys())
+    assert population.shape == (20, len(var_names))
+    assert population[0, var_names.index('P1')] == 2.0
+    lower = np.array([wp.free[name][0] for name in var_names])
+    upper = np.array([wp.free[name][1] for name in var_names])
+    assert np.all(population >= lower) and np.all(population <= upper)
+
+
+class QuadraticModel(framework.CFRModel):
+    """Model with a smooth likelihood surface."""
+
+    def prepare_sim(self, data, study_keys=None, recall_keys=None):
+        return {}, {}
+
+    def likelihood_subject(self, study, recall, param, param_def, patterns=None):
+        logl = -((param['x'] - 0.3) ** 2) - (param['y'] - 0.7) ** 2
+        return logl, 10
+
+
+def test_search_subject_hybrid():
+    """Refine a loose global search with a local search."""
+    param_def = framework.WeightParameters()
+    param_def.set_free(x=[0, 1], y=[0, 1])
+    data = pd.DataFrame({'subject': [1]})
+    model = QuadraticModel()
+    param, logl, n, k, trace = model.search_subject(
+        data, param_def, method='hybrid', n_local=2, seed=1
+    )
+    np.testing.assert_allclose([param['x'], param['y']], [0.3, 0.7], atol=1e-4)
+    assert logl >= trace['logl_global']
+    assert trace['logl_local'] == logl
+    assert trace['nfev_local'] > 0
+    assert (n, k) == (10, 2)
+
+
+def test_fit_family():
+    """Fit multiple variants in one pool of searches."""
+    full = framework.WeightParameters()
+    full.set_free(x=[0, 1], y=[0, 1])
+    fixed = framework.WeightParameters()
+    fixed.set_free(x=[0, 1])
+    fixed.set_fixed(y=0.5)
+    data = pd.DataFrame({'subject': [1, 2]})
+    model = QuadraticModel()
+    family = model.fit_family(
+        data,
+        {'full': full, 'fixed': fixed},
+        n_rep=2,
+        seeds={'full': 1, 'fixed': 1},
+        tol=0.0001,
+    )
+    assert family['full'].index.tolist() == [(1, 0), (1, 1), (2, 0), (2, 1)]
+    np.testing.assert_allclose(family['fixed']['y'], 0.5)
+    assert (family['full']['k'] == 2).all() and (family['fixed']['k'] == 1).all()
+    assert not framework.worker_inputs()
+
+    # same results as fitting each variant separately
+    results = model.fit_indiv(data, fixed, n_rep=2, seed=1, tol=0.0001)
+    fit_cols = ['x', 'y', 'logl', 'n', 'k']
+    pd.testing.assert_frame_equal(results[fit_cols], family['fixed'][fit_cols])
+
+
+def test_worker_pool():
+    """Share inputs with tasks only while a pool is running."""
+    with framework.worker_pool(1, data=[1, 2]) as executor:
+        assert executor is None
+        assert framework.worker_inputs() == {'data': [1, 2]}
+    assert not framework.worker_inputs()
+
+    with framework.worker_pool(2, data=[1, 2]) as executor:
+        assert executor.submit(framework.worker_inputs).result() == {'data': [1, 2]}
+        assert not framework.worker_inputs()
+
+
+def sim_setup():
+    """Set up a small simulation with two subjects and two lists."""
+    items = np.array([f'item{i}' for i in range(8)])
+    patterns = {'items': items, 'vector': {'loc': np.eye(8)}}
+    param_def = framework.model_variant(['loc'])
+    param = param_def.fixed.copy()
+    param.update({name: np.mean(bounds) for name, bounds in param_def.free.items()})
+    data = pd.DataFrame(
+        {
+            'subject': np.repeat([1, 2], 8),
+            'list': np.tile(np.repeat([1, 2], 4), 2),
+            'trial_type': 'study',
+            'position': np.tile(np.arange(1, 5), 4),
+            'item': np.tile(items, 2),
+            'item_index': np.tile(np.arange(8), 2),
+        }
+    )
+    subj_param = {1: param, 2: param}
+    return data, param_def, patterns, subj_param
+
+
+def test_simulate_fit_jobs():
+    """Simulate the same data regardless of the number of jobs."""
+    data, param_def, patterns, subj_param = sim_setup()
+    sim1 = framework.simulate_fit(data, param_def, patterns, subj_param, 3, 1, 42)
+    sim2 = framework.simulate_fit(data, param_def, patterns, subj_param, 3, 2, 42)
+    pd.testing.assert_frame_equal(sim1, sim2)
+    assert sim1.groupby('subject')['list'].max().tolist() == [6, 6]
+
+
+def test_spawn_seed():
+    """Spawn the same seed sequence for a unit in any order."""
+    seed = np.random.SeedSequence(42)
+    child = seed.spawn(2)[1].spawn(4)[3]
+    unit = framework.spawn_seed(42, 1, 3)
+    np.testing.assert_array_equal(unit.generate_state(4), child.generate_state(4))
+    other = framework.spawn_seed(42, 3, 1)
+    assert not np.array_equal(unit.generate_state(4), other.generate_state(4))
+
+    # string identifiers give stable, distinct seeds
+    named = framework.spawn_seed(42, 'LTP093', 3)
+    same = framework.spawn_seed(42, np.str_('LTP093'), 3)
+    np.testing.assert_array_equal(named.generate_state(4), same.generate_state(4))
+    assert not np.array_equal(named.generate_state(4), unit.generate_state(4))
+
+
+def test_fit_cmr_seed(tmp_path, monkeypatch):
+    """Only use and record a seed if one is specified."""
+    data, param_def, patterns, subj_param = sim_setup()
+    sim = framework.simulate_fit(data, param_def, patterns, subj_param, 1, 1, 1)
+    data_file = tmp_path / 'data.csv'
+    sim.to_csv(data_file, index=False)
+    patterns_file = tmp_path / 'patterns.hdf5'
+    task.save_patterns(patterns_file, patterns['items'], **patterns['vector'])
+
+    seeds = []
+
+    def fit_indiv(self, data, param_def, *args, seed=None, **kwargs):
+        seeds.append(seed)
+        index = pd.MultiIndex.from_tuples([(1, 0), (2, 0)], names=['subject', 'rep'])
+        return pd.DataFrame({'logl': [-10.0, -12.0]}, index=index)
+
+    monkeypatch.setattr(framework.CFRModel, 'fit_indiv', fit_indiv)
+    runner = CliRunner()
+    for name, options in [('default', []), ('seeded', ['--seed', '1'])]:
+        args = [str(data_file), str(patterns_file), 'loc', 'none']
+        args += [str(tmp_path / name), '-r', '0', *options]
+        result = runner.invoke(framework.fit_cmr, args)
+        assert result.exit_code == 0, result.output
+    assert seeds[0] is None
+    assert isinstance(seeds[1], np.random.SeedSequence)
+    param_def = cmr.read_config(tmp_path / 'default' / 'parameters.json')
+    assert 'seed' not in param_def.options
+    param_def = cmr.read_config(tmp_path / 'seeded' / 'parameters.json')
+    assert param_def.options['seed'] == 1
+
+
+def test_simulate_fit_random_state():
+    """Simulate without changing the global random state."""
+    data, param_def, patterns, subj_param = sim_setup()
+    np.random.seed(1)
+    expected = np.random.random_sample(3)
+    np.random.seed(1)
+    framework.simulate_fit(data, param_def, patterns, subj_param, 1, 1, 1)
+    np.testing.assert_array_equal(np.random.random_sample(3), expected)
+
+
+def test_likelihood_lists():
+    """Evaluate likelihood for test lists using prepared data."""
+    data, param_def, patterns, subj_param = sim_setup()
+    sim = framework.simulate_fit(data, param_def, patterns, subj_param, 2, 1, 1)
+    model = framework.CFRModel()
+    prepared = model.prepare_subjects(sim)
+    lists = {1: np.array([2, 4]), 2: np.array([1])}
+    stats = model.likelihood_lists(prepared, subj_param, param_def, patterns, lists)
+
+    test_data = sim[(sim['list'].isin([2, 4]) & (sim['subject'] == 1))]
+    test_data = pd.concat(
+        [test_data, sim[(sim['list'] == 1) & (sim['subject'] == 2)]]
+    )
+    expected = model.likelihood(test_data, {}, subj_param, param_def, patterns=patterns)
+    np.testing.assert_allclose(stats['logl'], expected['logl'])
+    np.testing.assert_array_equal(stats['n'], expected['n'])
+
+
+def test_likelihood_population():
+    """Evaluate a population of parameter sets from prepared lists."""
+    data, param_def, patterns, subj_param = sim_setup()
+    sim = framework.simulate_fit(data, param_def, patterns, subj_param, 1, 1, 1)
+    model = framework.CFRModel()
+    study, recall = model.prepare_sim(sim[sim['subject'] == 1])
+    var_names = list(param_def.free.keys())
+    rng = np.random.default_rng(1)
+    lower = np.array([param_def.free[name][0] for name in var_names])
+    upper = np.array([param_def.free[name][1] for name in var_names])
+    population = rng.uniform(lower, upper, (4, len(var_names))).T
+    logl, n = model.likelihood_population(
+        study, recall, population, param_def, patterns, var_names
+    )
+    for i, x in enumerate(population.T):
+        param = param_def.fixed.copy()
+        param.update(dict(zip(var_names, x)))
+        param = param_def.eval_dependent(param)
+        param = param_def.eval_dynamic(param, study, recall)
+        expected = model.likelihood_subject(study, recall, param, param_def, patterns)
+        np.testing.assert_allclose(logl[i], expected[0])
+        assert n[i] == expected[1]
+
+
+def test_search_subject_vectorized():
+    """Search with a vectorized differential evolution."""
+    data, param_def, patterns, subj_param = sim_setup()
+    sim = framework.simulate_fit(data, param_def, patterns, subj_param, 1, 1, 1)
+    model = framework.CFRModel()
+    subject_data = sim[sim['subject'] == 1]
+    kwargs = {'maxiter': 2, 'popsize': 2, 'polish': False, 'seed': 1}
+    param, logl, n, k, trace = model.search_subject(
+        subject_data, param_def, patterns, vectorized=True, **kwargs
+    )
+    assert set(param_def.free.keys()) <= set(param.keys())
+    np.testing.assert_allclose(logl, trace['logl_global'])
+    assert k == len(param_def.free)
+
+
+def test_read_model_sims_lazy(tmp_path):
+    """Calculate statistics one source at a time."""
+    data, param_def, patterns, subj_param = sim_setup()
+    data['session'] = 1
+    data_file = tmp_path / 'data.csv'
+    framework.simulate_fit(data, param_def, patterns, subj_param, 1, 1, 1).to_csv(
+        data_file, index=False
+    )
+    for i, model in enumerate(['model1', 'model2']):
+        (tmp_path / model).mkdir()
+        sim = framework.simulate_fit(data, param_def, patterns, subj_param, 2, 1, i)
+        sim.to_csv(tmp_path / model / 'sim.csv', index=False)
+    models = ['model1', 'model2']
+    full = framework.read_model_sims(data_file, tmp_path, models, ['m1', 'm2'])
+    lazy = framework.read_model_sims(
+        data_file, tmp_path, models, ['m1', 'm2'], lazy=True, cache_size=2
+    )
+    assert lazy.names == ['m1', 'm2', 'Data']
+    pd.testing.assert_frame_equal(lazy.to_frame(), full)
+
+    # statistics match, and recently used sources are kept
+    expected = full.groupby('source').apply(fr.spc)
+    pd.testing.assert_frame_equal(lazy.groupby('source').apply(fr.spc), expected)
+    assert lazy.misses == 5 and lazy.hits == 1
+    lazy['m2']
+    assert lazy.hits == 2
+
+
+def test_index_fit_dir(tmp_path):
+    """Read model specs and fits from a fit index."""
+    param_def = framework.model_variant(['loc'])
+    spec_files = {'m1': 'parameters.json', 'm2': 'xval_parameters.json'}
+    for model, spec_file in spec_files.items():
+        (tmp_path / model).mkdir()
+        param_def.to_json(tmp_path / model / spec_file)
+        fit = pd.DataFrame({'subject': [1, 2], 'logl': [-10.5, -12.25], 'k': 9})
+        fit.to_csv(tmp_path / model / 'fit.csv', index=False)
+    index = framework.index_fit_dir(tmp_path)
+    assert index['models']['m2']['spec_file'] == 'xval_parameters.json'
+    models = ['m1', 'm2']
+    for read in [framework.read_model_specs, framework.read_model_fits]:
+        expected = read(tmp_path, models)
+        pd.testing.assert_frame_equal(read(tmp_path, models, index=index), expected)
+
+    # changed files are read again when updating the index
+    fit = pd.DataFrame({'subject': [1, 2], 'logl': [-1.0, -2.0], 'k': 9})
+    fit.to_csv(tmp_path / 'm2' / 'fit.csv', index=False)
+    framework.index_fit_dir(tmp_path)
+    res = framework.read_model_fits(tmp_path, models, index=True)
+    assert res.loc['m2', 'logl'].tolist() == [-1.0, -2.0]
@@ -121,3 +121,23 @@ def test_class(patterns):
         ]
     )
     np.testing.assert_allclose(evidence, expected, atol=0.0001)
+
+
+@pytest.mark.parametrize('multi_class', ['auto', 'multinomial', 'ovr'])
+def test_class_logreg(patterns, multi_class):
+    """Test classification with each multi-class strategy."""
+    trials = pd.DataFrame({'list': patterns['chunks'], 'category': patterns['labels']})
+    evidence = decode.classify_patterns(
+        trials, patterns['vectors'], clf='logreg', multi_class=multi_class
+    )
+    assert evidence.shape == (12, 3)
+    np.testing.assert_allclose(evidence.sum(axis=1), 1)
+
+
+def test_class_logreg_invalid(patterns):
+    """Test that an unknown multi-class strategy is rejected."""
+    trials = pd.DataFrame({'list': patterns['chunks'], 'category': patterns['labels']})
+    with pytest.raises(ValueError, match='multi-class'):
+        decode.classify_patterns(
+            trials, patterns['vectors'], clf='logreg', multi_class='crammer'
+        )
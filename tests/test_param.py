@@ -1,5 +1,7 @@
 """Test code defining CMR parameters."""
 
+import numpy as np
+from cymr.cmr import CMRParameters
 from cfr import framework
 
 
@@ -113,3 +115,51 @@ def test_item_weights():
     assert wp.weights['ff'] == {
         ('task', 'item'): 'Dff * (s_loc * loc + s_cat * cat + s_use * use)',
     }
+
+
+def test_linear_weight_terms():
+    """Decompose weight expressions into scaled patterns."""
+    features = ['loc', 'cat', 'use']
+    terms = framework.linear_weight_terms('Dfc * w_loc * loc', features)
+    assert terms == [('Dfc * w_loc', 'loc')]
+    terms = framework.linear_weight_terms(
+        'Aff + Dff * (s_loc * loc + s_cat * cat)', features
+    )
+    assert terms == [('Aff', None), ('Dff * s_loc', 'loc'), ('Dff * s_cat', 'cat')]
+    assert framework.linear_weight_terms('Aff * ones(loc.shape)', features) is None
+    assert framework.linear_weight_terms('loc * cat', features) is None
+
+
+def test_eval_weights_basis():
+    """Weights evaluated from a basis match expression evaluation."""
+    wp = framework.model_variant(['loc', 'cat'], ['loc', 'cat'], intercept=True)
+    rng = np.random.default_rng(42)
+    patterns = {
+        'vector': {'loc': np.eye(6), 'cat': rng.random((6, 2))},
+        'similarity': {'loc': np.eye(6), 'cat': rng.random((6, 6))},
+    }
+    param = wp.eval_dependent(
+        {'Lfc': 0.6, 'Lcf': 0.3, 'Dff': 2, 'Aff': 0.1, 'w0': 0.3, 's0': 0.6}
+    )
+    item_index = np.array([4, 0, 2])
+    expected = CMRParameters.eval_weights(wp, patterns, param, item_index)
+    actual = wp.eval_weights(patterns, param, item_index)
+    for connect, regions in expected.items():
+        for region, mat in regions.items():
+            np.testing.assert_allclose(actual[connect][region], mat)
+
+
+def test_eval_weights_basis_patterns():
+    """Update the basis when patterns change."""
+    wp = framework.WeightParameters()
+    region = (('task', 'item'), ('task', 'item'))
+    wp.set_weights('fc', {region: 'loc + cat'})
+    param = {'cat': 0.5}
+    patterns = {'vector': {'loc': np.eye(4), 'cat': np.ones((4, 4))}}
+    actual = wp.eval_weights(patterns, param)
+    np.testing.assert_allclose(actual['fc'][region], np.eye(4) + 1)
+
+    # cat is a parameter for patterns without a cat feature
+    patterns = {'vector': {'loc': np.eye(3)}}
+    actual = wp.eval_weights(patterns, param)
+    np.testing.assert_allclose(actual['fc'][region], np.eye(3) + 0.5)
@@ -0,0 +1,40 @@
+"""Test profiling of fitting runs."""
+
+import pandas as pd
+from cfr import framework
+from cfr import profiling
+
+
+class QuadraticModel(framework.CFRModel):
+    """Model with a smooth likelihood surface."""
+
+    def prepare_sim(self, data, study_keys=None, recall_keys=None):
+        return {}, {}
+
+    def likelihood_subject(self, study, recall, param, param_def, patterns=None):
+        return -((param['x'] - 0.3) ** 2) - (param['y'] - 0.7) ** 2, 10
+
+
+def test_fit_profile(tmp_path):
+    """Profile searches for individual subjects."""
+    param_def = framework.WeightParameters()
+    param_def.set_free(x=[0, 1], y=[0, 1])
+    data = pd.DataFrame({'subject': [1, 2]})
+    profile = profiling.RunProfile('test', n_jobs=1)
+    with profile.stage('fit_indiv'):
+        QuadraticModel().fit_indiv(data, param_def, n_rep=2, tol=0.01, profile=profile)
+
+    profile_file = tmp_path / 'profile.json'
+    profile.save(profile_file)
+    prof = profiling.read_profile(profile_file)
+    assert len(prof['units']) == 4
+    assert set(prof['subjects'].keys()) == {'1', '2'}
+    assert prof['subjects']['1']['n_search'] == 2
+    assert prof['searches']['nfev'] == sum(u['nfev'] for u in prof['units'])
+    assert 0 < prof['workers']['utilization'] <= 1
+    assert prof['peak_rss_mb']['main'] > 0
+    assert prof['stages']['fit_indiv'] <= prof['total_time']
+
+    summary = profiling.profile_summary([prof, prof], ['a', 'b'])
+    assert summary.index.tolist() == ['a', 'b']
+    assert summary.loc['a', 'n_search'] == 4
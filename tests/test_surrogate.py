@@ -0,0 +1,50 @@
+"""Test surrogate model searches."""
+
+import numpy as np
+import pytest
+from cfr import surrogate
+
+
+def quadratic(points):
+    """Peaked function of two parameters."""
+    return -((points[:, 0] - 0.3) ** 2) - (points[:, 1] - 0.7) ** 2
+
+
+@pytest.mark.parametrize('method', ['gp', 'rf'])
+def test_emulate_search(method):
+    """Search for the peak of a function using a surrogate."""
+    bounds = {'a': (0, 1), 'b': (0, 1)}
+    res = surrogate.emulate_search(
+        quadratic, bounds, n_init=16, n_iter=2, n_propose=4, method=method, seed=1
+    )
+    assert res['points'].shape == (24, 2)
+    assert res['values'].shape == (24, 1)
+    np.testing.assert_array_equal(np.bincount(res['iteration']), [16, 4, 4])
+
+    # proposed points should be near the peak
+    best = res['points'][np.argmax(res['values'][:, 0])]
+    np.testing.assert_allclose(best, [0.3, 0.7], atol=0.15)
+
+    # pruned bounds should contain the peak
+    pruned = surrogate.prune_bounds(res['model'], bounds, seed=1)
+    assert pruned['a'][0] < 0.3 < pruned['a'][1]
+    assert pruned['b'][1] - pruned['b'][0] < 1
+
+
+def test_surrogate_report():
+    """Compare surrogate predictions to full evaluations."""
+    rng = np.random.default_rng(1)
+    points = rng.uniform(size=(32, 2))
+    model = surrogate.fit_surrogate(points, quadratic(points), 'gp', seed=1)
+    test_points = rng.uniform(size=(8, 2))
+    report = surrogate.surrogate_report(model, test_points, quadratic(test_points), 1)
+    assert report['r2'] > 0.99
+    assert report['best_test_found']
+    assert report['speedup'] > 1
+
+
+def test_fill_missing():
+    """Fill undefined statistics."""
+    values = np.array([[1, np.nan, np.nan], [3, 2, np.nan]])
+    filled = surrogate.fill_missing(values)
+    np.testing.assert_array_equal(filled, [[1, 2, 0], [3, 2, 0]])
@@ -0,0 +1,62 @@
+"""Test running parameter sweeps."""
+
+import numpy as np
+from click.testing import CliRunner
+from cfr import sweep
+
+
+def test_grid_points():
+    """Define points on a parameter grid."""
+    points, shape, coords = sweep.grid_points({'a': [1, 2, 3], 'b': [10, 20]})
+    assert shape == (3, 2)
+    np.testing.assert_array_equal(points[:3], [[1, 10], [1, 20], [2, 10]])
+    np.testing.assert_array_equal(coords['b'], [10, 20])
+
+
+def test_sweep_spec_sample(tmp_path):
+    """Require specs that match the sampling method."""
+    (tmp_path / 'data.csv').write_text('')
+    (tmp_path / 'patterns.hdf5').write_text('')
+    args = [str(tmp_path / f) for f in ['data.csv', 'patterns.hdf5', '.', 'sweep']]
+    runner = CliRunner()
+
+    # ranges on a grid need a number of points
+    result = runner.invoke(sweep.sweep_cmr, args + ['-p', 'B_enc=0:1'])
+    assert result.exit_code == 2
+    assert 'B_enc=0:1:11' in result.output
+
+    # sampling needs ranges
+    for spec in ['B_enc=0.2,0.4,0.6', 'B_enc=0.5', 'B_enc=0:1:11']:
+        options = ['-p', spec, '--sample', 'lhs']
+        result = runner.invoke(sweep.sweep_cmr, args + options)
+        assert result.exit_code == 2
+        assert 'B_enc=0:1' in result.output
+
+
+def test_sample_points():
+    """Sample points within parameter bounds."""
+    bounds = {'a': (0, 1), 'b': (10, 20)}
+    points = sweep.sample_points(bounds, 8, 'lhs', seed=1)
+    assert points.shape == (8, 2)
+    assert np.all((points[:, 1] >= 10) & (points[:, 1] <= 20))
+
+    # one sample in each of 8 bins for each parameter
+    bins = np.floor(points[:, 0] * 8)
+    np.testing.assert_array_equal(np.sort(bins), np.arange(8))
+
+
+def test_sweep_frame():
+    """Convert sweep results to long format."""
+    results = {
+        'param_names': np.array(['a', 'b']),
+        'param_a': np.array([[1, 1], [2, 2]]),
+        'param_b': np.array([[10, 20], [10, 20]]),
+        'spc': np.arange(12).reshape((2, 2, 3)),
+        'spc_input': np.array([1, 2, 3]),
+        'cat_crp': np.array([[0.1, 0.2], [0.3, 0.4]]),
+    }
+    frame = sweep.sweep_frame(results, 'spc')
+    assert frame.shape == (12, 4)
+    assert frame.iloc[4].tolist() == [1, 20, 2, 4]
+    frame = sweep.sweep_frame(results, 'cat_crp')
+    assert frame['cat_crp'].tolist() == [0.1, 0.2, 0.3, 0.4]
@@ -0,0 +1,38 @@
+"""Test generating synthetic datasets."""
+
+import numpy as np
+import pandas as pd
+from cfr import synthetic
+from cfr import task
+
+
+def test_make_study():
+    """Make lists with category blocks and no repeated items."""
+    pool, patterns = synthetic.make_pool(n_item=64, n_dim=20, seed=1)
+    assert patterns['vector']['use'].shape == (192, 20)
+    study = synthetic.make_study(pool, 2, 4, block_len=(2, 6), seed=1)
+    assert len(study) == 2 * 4 * 24
+    assert not study.duplicated(['subject', 'item']).any()
+
+    # the last block of a list may be cut short
+    labeled = task.label_block(study)
+    assert labeled['block_len'].max() <= 6
+    assert labeled.query('block < n_block')['block_len'].min() >= 2
+
+
+def test_generate_dataset():
+    """Generate the same readable dataset from the same seed."""
+    kwargs = {'n_item': 64, 'n_dim': 20, 'n_session': 2, 'seed': 1}
+    data, patterns, param_def, subj_param = synthetic.generate_dataset(2, 6, **kwargs)
+    data2, _, _, _ = synthetic.generate_dataset(2, 6, **kwargs)
+    pd.testing.assert_frame_equal(data, data2)
+    assert list(subj_param.keys()) == [1, 2]
+
+    recall = data.query('trial_type == "recall"')
+    assert recall['item_index'].notna().all()
+    np.testing.assert_array_equal(
+        patterns['items'][recall['item_index']], recall['item']
+    )
+    merged = task.read_free_recall(data)
+    assert merged['session'].unique().tolist() == [1, 2]
+    assert merged['recall'].any()
@@ -0,0 +1,206 @@
+"""Test reading and writing free recall data."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from cfr import task
+
+
+def test_read_study_recall():
+    """Fill list columns and label category blocks."""
+    data = pd.DataFrame(
+        {
+            'subject': [1, 1, 1, 1, 1, 1, 1],
+            'list': [1, 1, 1, 1, 1, 1, 1],
+            'trial_type': ['study'] * 6 + ['recall'],
+            'position': [1, 2, 3, 4, 5, 6, 1],
+            'item': ['a', 'b', 'c', 'd', 'e', 'f', 'c'],
+            'category': ['cel', 'cel', 'loc', 'loc', 'obj', 'obj', 'loc'],
+            'session': [1, 1, 1, 1, 1, 1, np.nan],
+        }
+    )
+    observed = task.read_study_recall(data)
+    np.testing.assert_array_equal(observed['subject'], 1)
+    np.testing.assert_array_equal(observed['list'], 1)
+    np.testing.assert_array_equal(observed['session'], 1)
+
+    # no previous or baseline category in the first block
+    study = observed.query('trial_type == "study"')
+    assert study['prev'].isna().tolist() == [True, True, False, False, False, False]
+    assert study['base'].isna().tolist() == [True, True, False, False, False, False]
+    np.testing.assert_array_equal(study['prev'].iloc[2:], ['cel', 'cel', 'loc', 'loc'])
+    np.testing.assert_array_equal(study['base'].iloc[2:], ['obj', 'obj', 'cel', 'cel'])
+
+
+def test_write_events_npz(tmp_path):
+    """Read the same events from NPZ and CSV files."""
+    data = pd.DataFrame(
+        {
+            'subject': [1, 1, 1, 1],
+            'list': [1, 1, 1, 1],
+            'trial_type': ['study', 'study', 'recall', 'recall'],
+            'position': [1, 2, 1, 2],
+            'item': ['absinthe', 'hollandaise', 'hollandaise', np.nan],
+            'session': [1.0, 1.0, np.nan, np.nan],
+            'item_index': [0.0, 1.0, 1.0, np.nan],
+            'prob': [0.5, 0.25, 0.125, 0.0],
+            'onset': [0.0, 1.0, 2.0, 3.0],
+        }
+    )
+    csv_file = tmp_path / 'sim.csv'
+    npz_file = tmp_path / 'sim.npz'
+    task.write_events(data, csv_file)
+    task.write_events(data, npz_file)
+    expected = task.read_events(csv_file)
+    observed = task.read_events(npz_file)
+    pd.testing.assert_frame_equal(observed, expected, check_dtype=False)
+
+    # original column types are restored
+    pd.testing.assert_frame_equal(observed, data)
+
+    # integer codes are stored in compact types
+    with np.load(npz_file) as f:
+        assert f['subject'].dtype == np.int8
+        assert f['item'].dtype == np.int8
+        assert f['item_index'].dtype == np.int8
+
+    observed = task.read_events(npz_file, categorical=True)
+    assert isinstance(observed['item'].dtype, pd.CategoricalDtype)
+
+
+def test_load_pool_images_cache(tmp_path):
+    """Load pool images from a memory-mapped cache."""
+    from PIL import Image
+
+    rng = np.random.default_rng(1)
+    pool = pd.DataFrame(
+        {'item': ['Ann', 'Eiffel Tower', 'Mug'], 'category': ['cel', 'loc', 'obj']}
+    )
+    image_dir = tmp_path / 'images'
+    shapes = [(40, 30), (30, 40), (20, 20)]
+    for (item, category), shape in zip(pool.to_numpy(), shapes):
+        (image_dir / category).mkdir(parents=True)
+        image = rng.integers(0, 256, (*shape, 3), dtype=np.uint8)
+        Image.fromarray(image).save(image_dir / category / f'{item}.jpg')
+    gray = rng.integers(0, 256, shapes[2], dtype=np.uint8)
+    Image.fromarray(gray).save(image_dir / 'obj' / 'Mug.jpg')
+
+    # cached images match images loaded directly
+    expected = task.load_pool_images(pool, image_dir)
+    cache_dir = tmp_path / 'cache'
+    observed = task.load_pool_images(pool, image_dir, cache_dir=cache_dir)
+    assert isinstance(observed, task.PoolImages)
+    assert list(observed) == pool['item'].tolist()
+    for item in pool['item']:
+        assert observed[item].dtype == expected[item].dtype
+        np.testing.assert_array_equal(observed[item], expected[item])
+
+    # rescaled images are resized the same way with and without a cache
+    expected = task.load_pool_images(pool, image_dir, rescale=0.35)
+    rescaled_dir = tmp_path / 'rescaled'
+    observed = task.load_pool_images(
+        pool, image_dir, rescale=0.35, cache_dir=rescaled_dir
+    )
+    for item in pool['item']:
+        assert observed[item].shape == expected[item].shape
+        assert observed[item].dtype == expected[item].dtype
+        np.testing.assert_array_equal(observed[item], expected[item])
+    assert task.image_cache_valid(pool, image_dir, cache_dir)
+    assert not task.image_cache_valid(pool, image_dir, cache_dir, size=10)
+
+    # adding or removing images invalidates the cache
+    extra_file = image_dir / 'obj' / 'Cup.jpg'
+    Image.fromarray(np.zeros((10, 10, 3), dtype=np.uint8)).save(extra_file)
+    assert not task.image_cache_valid(pool, image_dir, cache_dir)
+    observed = task.load_pool_images(pool, image_dir, cache_dir=cache_dir)
+    assert task.image_cache_valid(pool, image_dir, cache_dir)
+    extra_file.unlink()
+    assert not task.image_cache_valid(pool, image_dir, cache_dir)
+
+    # resized images fit in the box, preserving aspect ratio
+    dest_dir = tmp_path / 'resized'
+    files = task.pool_image_files(pool, image_dir)
+    out_files = task.pool_image_files(pool, dest_dir)
+    task.resize_images(files, out_files, size=10)
+    resized = task.load_pool_images(pool, dest_dir)
+    assert [resized[item].shape[:2] for item in pool['item']] == [
+        (10, 8),
+        (8, 10),
+        (10, 10),
+    ]
+
+
+def test_sort_pool():
+    """Sort a pool to match a list of item names."""
+    pool = pd.DataFrame(
+        {
+            'item': ['Ann Smith', 'Eiffel Tower', 'mug'],
+            'category': ['cel', 'loc', 'obj'],
+        }
+    )
+    sorted_pool = task.sort_pool(pool, ['MUG', 'ann  smith', 'Eiffel Tower '])
+    assert sorted_pool['item'].tolist() == ['mug', 'Ann Smith', 'Eiffel Tower']
+    assert sorted_pool['category'].tolist() == ['obj', 'cel', 'loc']
+
+    with pytest.raises(ValueError, match='not found in pool: teapot'):
+        task.sort_pool(pool, ['mug', 'Ann Smith', 'Eiffel Tower', 'teapot'])
+    # unmatched pool items are kept at the end unless strict
+    sorted_pool = task.sort_pool(pool, ['Eiffel Tower'])
+    assert sorted_pool['item'].tolist() == ['Eiffel Tower', 'Ann Smith', 'mug']
+    with pytest.raises(ValueError, match='not found in list: mug'):
+        task.sort_pool(pool, ['Ann Smith', 'Eiffel Tower'], strict=True)
+
+
+def test_index_pattern():
+    """Index into implicit patterns as dense arrays."""
+    codes = np.array([0, 0, 1, 2, 1])
+    cat = task.IndexPattern.one_hot(codes)
+    dense = (codes[:, None] == np.arange(3)).astype(float)
+    sim = cat.similarity()
+    dense_sim = dense @ dense.T
+    index = np.array([3, 0, 2])
+    np.testing.assert_array_equal(np.asarray(cat), dense)
+    np.testing.assert_array_equal(cat[index, :], dense[index, :])
+    np.testing.assert_array_equal(cat[:, [2, 0]], dense[:, [2, 0]])
+    np.testing.assert_array_equal(cat[1], dense[1])
+    ix = np.ix_(index, index)
+    np.testing.assert_array_equal(sim[ix], dense_sim[ix])
+    np.testing.assert_array_equal(sim[index, [1, 2, 4]], dense_sim[index, [1, 2, 4]])
+
+
+def test_save_patterns(tmp_path):
+    """Evaluate the same likelihood with compact and dense patterns."""
+    from cymr import cmr
+    from cfr import framework
+    from cfr import synthetic
+
+    data, patterns, param_def, subj_param = synthetic.generate_dataset(
+        2, 4, n_item=32, n_dim=20, seed=1
+    )
+    h5_file = tmp_path / 'patterns.hdf5'
+    synthetic.save_patterns(h5_file, patterns)
+    compact = task.load_patterns(h5_file)
+    assert isinstance(compact['vector']['loc'], task.IndexPattern)
+    assert compact['vector']['use'].dtype == np.float32
+
+    dense = task.load_patterns(h5_file, dense=True)
+    for layer in ['vector', 'similarity']:
+        for name, mat in dense[layer].items():
+            np.testing.assert_allclose(mat, patterns[layer][name], atol=1e-6)
+
+    param_def = framework.model_variant(['loc', 'cat', 'use'], ['use'])
+    param = param_def.fixed.copy()
+    param.update({name: np.mean(bounds) for name, bounds in param_def.free.items()})
+    model = cmr.CMR()
+    expected = model.likelihood(data, param, param_def=param_def, patterns=dense)
+    observed = model.likelihood(data, param, param_def=param_def, patterns=compact)
+    np.testing.assert_allclose(observed['logl'], expected['logl'])
+
+
+def test_read_event_columns(tmp_path):
+    """Read column names from event files."""
+    data = pd.DataFrame({'subject': [1, 1], 'item': ['absinthe', 'hollandaise']})
+    for ext in ['csv', 'npz']:
+        events_file = tmp_path / f'events.{ext}'
+        task.write_events(data, events_file)
+        assert task.read_event_columns(events_file) == ['subject', 'item']